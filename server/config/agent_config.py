@@ -8,6 +8,7 @@ class ModelConfig(BaseModel):
     provider: str = Field(default="", description="模型提供商")
     model: str = Field(default="", description="模型名称")
     config: Dict[str, Any] = Field(default={"temperature": 0.7, "max_tokens": 2048}, description="模型参数配置")
+    context_window: int = Field(default=0, description="模型上下文窗口的 token 数，0 表示使用系统默认值")
 
 # 知识库检索配置
 class RetrievalConfig(BaseModel):
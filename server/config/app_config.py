@@ -60,6 +60,50 @@ class AppConfig(BaseSettings):
     enable_web_search: bool = Field(default=False, description="是否开启网页搜索")
     enable_knowledge_base: bool = Field(default=True, description="是否开启知识库")
     enable_agent_management: bool = Field(default=True, description="是否开启智能体管理")
+
+    # 知识库检索缓存配置
+    retrieval_cache_ttl: int = Field(default=600, description="检索结果缓存过期时间（秒），0 表示关闭缓存")
+    retrieval_cache_size: int = Field(default=2048, description="检索结果缓存的最大条目数")
+
+    # 文档解析进程配置
+    parsing_timeout: int = Field(default=600, description="单个文档解析的超时时间（秒），超时后结束解析进程")
+    parsing_memory_limit_mb: int = Field(default=2048, description="单个解析进程的内存上限（MB），0 表示不限制")
+
+    # 智能体实例缓存配置
+    agent_cache_size: int = Field(default=64, description="缓存的智能体实例数量上限，超出时淘汰最久未使用的实例")
+    agent_cache_idle_timeout: int = Field(default=1800, description="智能体实例的空闲淘汰时间（秒），0 表示不按空闲时间淘汰")
+    agent_warmup_count: int = Field(default=10, description="启动时预热的常用智能体数量，0 表示不预热")
+    agent_context_window: int = Field(default=0, description="智能体默认的上下文窗口 token 数，超出时丢弃最早的对话轮次（不做摘要），0 表示不限制")
+    agent_tool_output_max_tokens: int = Field(default=4000, description="发送给模型的单条工具输出的 token 上限，0 表示不截断")
+    agent_tool_max_concurrency: int = Field(default=8, description="单轮对话中同时执行的工具调用数上限")
+    agent_tool_concurrency_per_tool: int = Field(default=4, description="同一个工具同时执行的调用数上限")
+    agent_tool_timeout: int = Field(default=60, description="单次工具调用的超时时间（秒），0 表示不限制")
+
+    # 工具结果缓存配置
+    tool_cache_size: int = Field(default=4096, description="缓存的工具调用结果数量上限")
+    tool_cache_policies: Dict[str, dict] = Field(
+        default_factory=lambda: {
+            # 知识库内容更新时清除对应检索工具的缓存；知识图谱的更新不会清除缓存，QueryKnowledgeGraph 默认不缓存
+            "retrieve_*": {"ttl": 300, "scope": "thread"},
+            "mcp:math_tools": {"ttl": 3600, "scope": "global"},
+            "mcp:text_tools": {"ttl": 3600, "scope": "global"},
+            "get_weather": {"ttl": 600, "scope": "global"},
+        },
+        description="工具结果缓存策略，键为工具名称、通配符或 mcp:<服务名称>，值为 {ttl, scope}，scope 可选 thread、user、global",
+    )
+
+    # 对话流式输出配置
+    chat_stream_format: str = Field(default="legacy", description="对话流的默认输出格式，legacy 每个 token 输出完整消息，delta 只输出增量；前端尚不支持 delta，默认保持 legacy")
+    chat_stream_coalesce_ms: int = Field(default=0, description="对话流合并 token 的时间窗口（毫秒），0 表示不合并")
+
+    # 智能体检查点存储配置
+    checkpointer_backend: str = Field(default="sqlite", description="检查点存储后端，sqlite 或 postgres")
+    checkpointer_uri: str = Field(default="", description="Postgres 连接地址，为空时读取 POSTGRES_URI 环境变量")
+    checkpointer_pool_size: int = Field(default=10, description="Postgres 检查点连接池大小")
+    checkpoint_keep_latest: int = Field(default=20, description="每个对话线程保留的最新检查点数量，0 表示全部保留")
+    checkpoint_archive_after_days: float = Field(default=0, description="对话线程空闲多少天后压缩归档，0 表示不归档")
+    checkpoint_maintenance_interval: int = Field(default=3600, description="检查点维护任务的执行间隔（秒），0 表示不执行")
+    checkpoint_vacuum_interval: int = Field(default=86400, description="检查点数据库 VACUUM 的间隔（秒），0 表示不执行")
     
     # Web搜索配置
     tavily_api_key: str = Field(default="", description="Tavily API Key")
@@ -1,4 +1,6 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,7 +12,30 @@ from utils.auth_middleware import is_public_path
 from src.utils.logging_config import logger
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from src.plugins import ocr
+    from src.agents.utils import aclose_http_clients
+    from src.agents.agent_manager import agent_manager
+    from src.agents.checkpointer import checkpointer_manager
+    from src.agents.checkpoint_maintenance import checkpoint_maintenance
+
+    # 按 OCR_PRELOAD 配置在后台预加载 OCR 模型，不阻塞服务启动
+    ocr.preload(background=True)
+    # 在后台预热常用的智能体，使部署后的首次对话不需要等待初始化
+    warmup_task = asyncio.create_task(agent_manager.warm_up())
+    # 定期清理旧检查点、归档空闲线程
+    checkpoint_maintenance.start()
+    yield
+    warmup_task.cancel()
+    await checkpoint_maintenance.stop()
+    ocr.shutdown()
+    await agent_manager.aclose()
+    await checkpointer_manager.aclose()
+    await aclose_http_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(router, prefix="/api")
 
 # CORS 设置
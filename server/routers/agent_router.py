@@ -311,6 +311,10 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest, background_ta
         session.commit()
         session.flush()
 
+        # 使已缓存的智能体实例失效，下次请求时按新配置创建
+        from src.agents.agent_manager import agent_manager
+        agent_manager.invalidate(agent_id)
+
         # 创建AgentConfig用于保存YAML文件
         try:
             # 从ORM模型转换为配置模型，确保字段一致性
@@ -360,6 +364,10 @@ async def delete_agent(agent_id: str, current_user: User = Depends(get_required_
         # 软删除
         agent.deleted_at = datetime.utcnow()
         agent.is_active = False
+        session.commit()
+
+        from src.agents.agent_manager import agent_manager
+        agent_manager.invalidate(agent_id)
 
         logger.info(f"用户 {current_user.username} 删除了智能体: {agent.name}")
 
@@ -1,20 +1,20 @@
 import os
-import json
 import asyncio
 import traceback
 import uuid
 import time
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.messages import HumanMessage
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from src import executor, config
+from src import executor, config as sys_config
 from src.core import HistoryManager
 from src.agents.agent_manager import agent_manager
 from src.models import select_model
 from src.utils.logging_config import logger
+from src.utils.stream_encoder import StreamEncoder
 from src.agents.tools_factory import get_all_tools
 from routers.auth_router import get_admin_user
 from utils.auth_middleware import get_required_user, get_db
@@ -73,20 +73,20 @@ async def chat_agent(
         }
     )
 
-    # 将meta和thread_id整合到config中
-    def make_chunk(content=None, **kwargs):
-
-        return (
-            json.dumps(
-                {"request_id": meta.get("request_id"), "response": content, **kwargs}, ensure_ascii=False
-            ).encode("utf-8")
-            + b"\n"
+    # 客户端可以通过 meta 选择流的格式和 token 合并窗口，delta 格式需要客户端显式选择
+    try:
+        encoder = StreamEncoder(
+            request_id=meta.get("request_id"),
+            format=meta.get("stream_format") or sys_config.chat_stream_format,
+            coalesce_ms=meta.get("stream_coalesce_ms", sys_config.chat_stream_coalesce_ms),
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     async def stream_messages():
 
         # 代表服务端已经收到了请求
-        yield make_chunk(status="init", meta=meta, msg=HumanMessage(content=query).model_dump())
+        yield encoder.chunk(status="init", meta=meta, msg=HumanMessage(content=query).model_dump())
 
         # 尝试获取智能体（预定义或自定义）
         agent = await agent_manager.aget_agent_by_identifier(agent_name)
@@ -101,14 +101,10 @@ async def chat_agent(
 
         runnable_config = {"configurable": {**config}}
 
-        async for msg, metadata in agent.stream_messages(messages, config_schema=runnable_config):
-            # logger.debug(f"msg: {msg.model_dump()}, metadata: {metadata}")
-            if isinstance(msg, AIMessageChunk):
-                yield make_chunk(content=msg.content, msg=msg.model_dump(), metadata=metadata, status="loading")
-            else:
-                yield make_chunk(msg=msg.model_dump(), metadata=metadata, status="loading")
+        async for data in encoder.encode_messages(agent.stream_messages(messages, config_schema=runnable_config)):
+            yield data
 
-        yield make_chunk(status="finished", meta=meta)
+        yield encoder.chunk(status="finished", meta=meta)
 
     return StreamingResponse(stream_messages(), media_type="application/json")
 
@@ -148,13 +144,21 @@ async def save_agent_config(agent_name: str, config: dict = Body(...), current_u
 
 
 @chat.get("/agent/{agent_name}/history")
-async def get_agent_history(agent_name: str, thread_id: str, current_user: User = Depends(get_required_user)):
-    """获取智能体历史消息（需要登录）"""
+async def get_agent_history(
+    agent_name: str,
+    thread_id: str,
+    offset: int = Query(0, ge=0, description="跳过最新的多少条消息"),
+    limit: int | None = Query(None, ge=1, description="返回的消息数量，为空时返回全部"),
+    current_user: User = Depends(get_required_user),
+):
+    """获取智能体历史消息（需要登录），从最新的消息开始分页"""
     # 获取Agent实例和配置类
     agent = await agent_manager.aget_agent_by_identifier(agent_name)
     # 获取历史消息
-    history = await agent.get_history(user_id=current_user.id, thread_id=thread_id)
-    return {"history": history}
+    history, total = await agent.get_history_page(
+        user_id=current_user.id, thread_id=thread_id, offset=offset, limit=limit
+    )
+    return {"history": history, "total": total, "offset": offset, "limit": limit}
 
 
 # ==================== 线程管理 API ====================
@@ -52,6 +52,10 @@ async def query_test(query: str = Body(...), meta: dict = Body(...), current_use
     result = await knowledge_base.aquery(query, **meta)
     return result
 
+@data.get("/query-cache/stats")
+async def get_query_cache_stats(current_user: User = Depends(get_admin_user)):
+    return knowledge_base.get_retrieval_cache_stats()
+
 @data.post("/add-files")
 async def add_files(db_id: str = Body(...), items: list[str] = Body(...), params: dict = Body(...), current_user: User = Depends(get_admin_user)):
     logger.debug(f"Add files/urls for db_id {db_id}: {items} {params=}")
@@ -1,14 +1,17 @@
+import asyncio
 import json
+import multiprocessing
 import os
 import tempfile
 from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 from io import StringIO
 
 import magic_pdf.model as model_config
 import uvicorn
 from fastapi import FastAPI, Form, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from loguru import logger
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.data.data_reader_writer import DataWriter, FileBasedDataWriter
@@ -16,7 +19,7 @@ from magic_pdf.data.data_reader_writer.s3 import S3DataReader, S3DataWriter
 from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
 from magic_pdf.data.read_api import read_local_images, read_local_office
 from magic_pdf.libs.config_reader import get_bucket_name, get_s3_config
-from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+from magic_pdf.model.doc_analyze_by_custom_model import batch_doc_analyze, doc_analyze
 from magic_pdf.operators.models import InferenceResult
 from magic_pdf.operators.pipes import PipeResult
 
@@ -28,6 +31,14 @@ pdf_extensions = [".pdf"]
 office_extensions = [".ppt", ".pptx", ".doc", ".docx"]
 image_extensions = [".png", ".jpg", ".jpeg"]
 
+# 批量解析配置：worker 进程数、每个推理批次的文档数、排队中的文档数上限
+BATCH_WORKERS = int(os.getenv("MINERU_BATCH_WORKERS", 1))
+BATCH_SIZE = int(os.getenv("MINERU_BATCH_SIZE", 4))
+MAX_QUEUED_DOCUMENTS = int(os.getenv("MINERU_MAX_QUEUED_DOCUMENTS", 64))
+
+_batch_pool: ProcessPoolExecutor | None = None
+_queued_documents = 0
+
 class MemoryDataWriter(DataWriter):
     def __init__(self):
         self.buffer = StringIO()
@@ -108,6 +119,25 @@ def init_writers(
     return writer, image_writer, file_bytes, file_extension
 
 
+def load_dataset(file_bytes: bytes, file_extension: str) -> PymuDocDataset | ImageDataset:
+    """Build a magic_pdf dataset from file content"""
+    if file_extension in pdf_extensions:
+        return PymuDocDataset(file_bytes)
+    elif file_extension in office_extensions:
+        # 需要使用office解析
+        temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(temp_dir, f"temp_file{file_extension}"), "wb") as f:
+            f.write(file_bytes)
+        return read_local_office(temp_dir)[0]
+    elif file_extension in image_extensions:
+        # 需要使用ocr解析
+        temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(temp_dir, f"temp_file{file_extension}"), "wb") as f:
+            f.write(file_bytes)
+        return read_local_images(temp_dir)[0]
+    raise ValueError(f"Unsupported file type: {file_extension}")
+
+
 def process_file(
     file_bytes: bytes,
     file_extension: str,
@@ -127,21 +157,7 @@ def process_file(
         Tuple[InferenceResult, PipeResult]: Returns inference result and pipeline result
     """
 
-    ds: PymuDocDataset | ImageDataset = None
-    if file_extension in pdf_extensions:
-        ds = PymuDocDataset(file_bytes)
-    elif file_extension in office_extensions:
-        # 需要使用office解析
-        temp_dir = tempfile.mkdtemp()
-        with open(os.path.join(temp_dir, f"temp_file.{file_extension}"), "wb") as f:
-            f.write(file_bytes)
-        ds = read_local_office(temp_dir)[0]
-    elif file_extension in image_extensions:
-        # 需要使用ocr解析
-        temp_dir = tempfile.mkdtemp()
-        with open(os.path.join(temp_dir, f"temp_file.{file_extension}"), "wb") as f:
-            f.write(file_bytes)
-        ds = read_local_images(temp_dir)[0]
+    ds = load_dataset(file_bytes, file_extension)
     infer_result: InferenceResult = None
     pipe_result: PipeResult = None
 
@@ -303,5 +319,138 @@ async def file_parse(
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+def _init_batch_worker():
+    model_config.__use_inside_model__ = True
+
+
+def _batch_parse_worker(documents: list[tuple[str, bytes, str]], parse_method: str) -> list[dict]:
+    """
+    Parse a group of documents in a worker process
+
+    Layout/OCR inference runs through `batch_doc_analyze`, so pages of different
+    documents share model batches.
+
+    Args:
+        documents: List of (file_name, file_bytes, file_extension)
+        parse_method: Parse method ('ocr', 'txt', 'auto')
+
+    Returns:
+        list[dict]: One result per document, with `md_content` or `error`
+    """
+    datasets, results = [], []
+    for file_name, file_bytes, file_extension in documents:
+        try:
+            datasets.append((file_name, load_dataset(file_bytes, file_extension)))
+        except Exception as e:
+            results.append({"file_name": file_name, "error": str(e)})
+
+    if not datasets:
+        return results
+
+    try:
+        infer_results = batch_doc_analyze([ds for _, ds in datasets], parse_method)
+    except Exception as e:
+        logger.exception(e)
+        return results + [{"file_name": file_name, "error": str(e)} for file_name, _ in datasets]
+
+    for (file_name, ds), infer_result in zip(datasets, infer_results):
+        md_content_writer = MemoryDataWriter()
+        try:
+            with tempfile.TemporaryDirectory() as image_dir:
+                image_writer = FileBasedDataWriter(image_dir)
+                use_ocr = parse_method == "ocr" or (
+                    parse_method == "auto" and ds.classify() == SupportedPdfParseMethod.OCR
+                )
+                if use_ocr:
+                    pipe_result = infer_result.pipe_ocr_mode(image_writer)
+                else:
+                    pipe_result = infer_result.pipe_txt_mode(image_writer)
+                pipe_result.dump_md(md_content_writer, "", "images")
+            results.append({"file_name": file_name, "md_content": md_content_writer.get_value()})
+        except Exception as e:
+            logger.exception(e)
+            results.append({"file_name": file_name, "error": str(e)})
+        finally:
+            md_content_writer.close()
+
+    return results
+
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """Worker processes are kept alive so models are loaded only once per worker"""
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ProcessPoolExecutor(
+            max_workers=BATCH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+        )
+    return _batch_pool
+
+
+@app.post(
+    "/batch_parse",
+    tags=["projects"],
+    summary="Parse several files, streaming markdown per document as NDJSON",
+)
+async def batch_parse(
+    files: list[UploadFile],
+    parse_method: str = Form("auto"),
+):
+    """
+    Parse several documents with model batching across documents.
+
+    Documents are split into groups of `MINERU_BATCH_SIZE` and processed by
+    `MINERU_BATCH_WORKERS` worker processes. Each finished document is emitted as
+    one JSON line: {"file_name": ..., "md_content": ...} or {"file_name": ..., "error": ...}.
+    Returns 429 when more than `MINERU_MAX_QUEUED_DOCUMENTS` documents are queued.
+    """
+    global _queued_documents
+
+    if not files:
+        return JSONResponse(content={"error": "No files provided"}, status_code=400)
+
+    if _queued_documents + len(files) > MAX_QUEUED_DOCUMENTS:
+        return JSONResponse(
+            content={"error": f"Too many queued documents, limit is {MAX_QUEUED_DOCUMENTS}"},
+            status_code=429,
+            headers={"Retry-After": "10"},
+        )
+
+    documents = []
+    for file in files:
+        documents.append((os.path.basename(file.filename).rsplit(".", 1)[0], await file.read(), os.path.splitext(file.filename)[1]))
+
+    loop = asyncio.get_running_loop()
+    pool = get_batch_pool()
+    groups = [documents[i : i + BATCH_SIZE] for i in range(0, len(documents), BATCH_SIZE)]
+    futures = [loop.run_in_executor(pool, _batch_parse_worker, group, parse_method) for group in groups]
+
+    def release(size):
+        def callback(_future):
+            global _queued_documents
+            _queued_documents -= size
+
+        return callback
+
+    # 每组完成或取消时释放排队名额，即使客户端在响应开始前断开也不会泄漏
+    _queued_documents += len(documents)
+    for future, group in zip(futures, groups):
+        future.add_done_callback(release(len(group)))
+
+    async def stream_results():
+        try:
+            for next_done in asyncio.as_completed(futures):
+                group_results = await next_done
+                for result in group_results:
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时取消尚未开始的任务
+            for future in futures:
+                future.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8888)
@@ -1,119 +1,282 @@
+import time
 import asyncio
+from collections import OrderedDict
+
+from src import config as sys_config
 from src.agents.chatbot_agent import ChatbotAgent
 from src.utils import logger
 from db_manager import DBManager
 
 
 class AgentManager:
-    def __init__(self):
-        self._instances = {}  # key: agent_id, value: agent实例
+    """智能体实例缓存
+
+    - 同一智能体并发的首次请求只创建一次实例
+    - 支持按 agent_id 或名称查找，名称作为 agent_id 的别名
+    - 按最近使用时间淘汰（数量上限、空闲时间），淘汰时关闭检查点数据库连接
+    - 智能体更新或删除后，通过 invalidate 使缓存失效，并在后台按新配置重新预热
+    - 启动时预热最常用的智能体
+    """
+
+    def __init__(self, max_size: int | None = None, idle_timeout: float | None = None):
+        self._instances: OrderedDict[str, ChatbotAgent] = OrderedDict()  # key: agent_id, value: agent实例
+        self._aliases: dict[str, str] = {}  # key: 智能体名称, value: agent_id
+        self._last_used: dict[str, float] = {}
+        self._pinned: set[str] = set()  # 预定义智能体，不参与淘汰
+        self._pending: dict[str, asyncio.Task] = {}
+        self._generations: dict[str, int] = {}
+        self._closing: set[asyncio.Task] = set()
+        self._warming: dict[str, asyncio.Task] = {}
+        self.max_size = max_size if max_size is not None else sys_config.agent_cache_size
+        self.idle_timeout = idle_timeout if idle_timeout is not None else sys_config.agent_cache_idle_timeout
         self.db_manager = DBManager()
 
     def register_agent(self, agent_class):
         """注册预定义智能体类并缓存实例，agent_class需有唯一name属性"""
         agent = agent_class()
         self._instances[agent.name] = agent
+        self._pinned.add(agent.name)
 
-    async def aget_agent(self, agent_id, **kwargs):
-        """异步获取智能体实例（先查缓存，无则查库并异步创建、缓存）"""
-        if agent_id in self._instances:
-            return self._instances[agent_id]
+    def _lookup(self, identifier):
+        """按 agent_id 或名称查找缓存，命中时更新最近使用时间"""
+        agent_id = identifier if identifier in self._instances else self._aliases.get(identifier)
+        if agent_id is None or agent_id not in self._instances:
+            return None
+        self._instances.move_to_end(agent_id)
+        self._last_used[agent_id] = time.monotonic()
+        return self._instances[agent_id]
 
-        from models.agent_models import CustomAgent as CustomAgentModel
-        from src.agents.chatbot_agent import ChatbotAgent
+    def _cache(self, agent_id, agent, name=None):
+        self._instances[agent_id] = agent
+        self._instances.move_to_end(agent_id)
+        self._last_used[agent_id] = time.monotonic()
+        if name and name != agent_id:
+            self._aliases[name] = agent_id
+        self._evict()
 
-        with self.db_manager.get_session_context() as session:
-            db_record = session.query(CustomAgentModel).filter(
-                CustomAgentModel.agent_id == agent_id,
-                CustomAgentModel.deleted_at.is_(None),
-                CustomAgentModel.is_active == True
-            ).first()
+    def _evict(self):
+        """从最久未使用的实例开始，淘汰超出数量上限或空闲超时的实例"""
+        now = time.monotonic()
+        for agent_id in list(self._instances):
+            if agent_id in self._pinned:
+                continue
+            over_size = len(self._instances) - len(self._pinned) > self.max_size
+            idle = self.idle_timeout and now - self._last_used.get(agent_id, now) > self.idle_timeout
+            if not (over_size or idle):
+                break
+            logger.info(f"淘汰智能体缓存: {agent_id}")
+            self._remove(agent_id)
 
-            if not db_record:
-                raise ValueError(f"智能体 {agent_id} 不存在")
+    def _remove(self, agent_id):
+        agent = self._instances.pop(agent_id, None)
+        self._last_used.pop(agent_id, None)
+        self._pinned.discard(agent_id)
+        for name in [name for name, target in self._aliases.items() if target == agent_id]:
+            del self._aliases[name]
+        if agent is not None:
+            self._close_agent(agent)
 
-        # 使用异步工厂创建实例
-        agent = await ChatbotAgent.create(agent_id=db_record.agent_id, config=db_record.to_chatbot_config())
-        self._instances[agent_id] = agent
-        return agent
+    def _close_agent(self, agent):
+        """在后台关闭智能体的连接，没有运行中的事件循环时由垃圾回收释放"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
 
-    def get_agent(self, agent_id, **kwargs):
-        """同步获取智能体实例（先查缓存，无则查库并缓存）。警告：可能不完全初始化。"""
-        logger.warning(f"正在同步获取智能体 {agent_id}，MCP工具可能无法加载。推荐使用 aget_agent。")
-        if agent_id in self._instances:
-            return self._instances[agent_id]
+        async def close():
+            try:
+                await agent.aclose()
+            except Exception as e:
+                logger.warning(f"关闭智能体 {getattr(agent, 'agent_id', agent.name)} 失败: {e}")
 
-        from models.agent_models import CustomAgent as CustomAgentModel
-        from src.agents.chatbot_agent import ChatbotAgent
+        task = loop.create_task(close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
 
-        with self.db_manager.get_session_context() as session:
-            db_record = session.query(CustomAgentModel).filter(
-                CustomAgentModel.agent_id == agent_id,
-                CustomAgentModel.deleted_at.is_(None),
-                CustomAgentModel.is_active == True
-            ).first()
+    def invalidate(self, identifier) -> bool:
+        """使智能体的缓存失效，正在创建中的实例也不会写入缓存"""
+        agent_id = self._aliases.get(identifier, identifier)
+        self._generations[agent_id] = self._generations.get(agent_id, 0) + 1
+        # 之后的请求不再等待按旧配置进行的创建任务
+        self._pending.pop(agent_id, None)
+        for name in [name for name, target in self._aliases.items() if target == agent_id]:
+            del self._aliases[name]
+        if agent_id not in self._instances:
+            return False
+        self._remove(agent_id)
+        logger.info(f"智能体缓存已失效: {agent_id}")
+        # 已缓存的智能体是常用的智能体，在后台按新配置重新预热
+        self._schedule_warm_up(agent_id)
+        return True
 
-            if not db_record:
-                raise ValueError(f"智能体 {agent_id} 不存在")
+    def get_popular_agent_ids(self, limit):
+        """按最近使用时间和消息数量排序，返回最常用的智能体 ID"""
+        from sqlalchemy import func
+        from models.agent_models import CustomAgent, AgentInstance
 
-            # 使用同步方法创建，可能不完整
-            agent = ChatbotAgent.from_db_record(db_record)
-            self._instances[agent_id] = agent
+        with self.db_manager.get_session_context() as session:
+            rows = (
+                session.query(AgentInstance.agent_id)
+                .join(CustomAgent, CustomAgent.agent_id == AgentInstance.agent_id)
+                .filter(CustomAgent.deleted_at.is_(None), CustomAgent.is_active == True)
+                .group_by(AgentInstance.agent_id)
+                .order_by(
+                    func.max(AgentInstance.last_used).desc(),
+                    func.sum(AgentInstance.message_count).desc(),
+                )
+                .limit(limit)
+                .all()
+            )
+            return [row.agent_id for row in rows]
+
+    async def _warm_up_agent(self, agent_id):
+        """创建智能体并编译图，同时打开检查点连接"""
+        try:
+            agent = await self._aget_or_create(agent_id)
+            if agent is not None:
+                await agent.get_graph()
             return agent
+        except Exception as e:
+            logger.warning(f"预热智能体 {agent_id} 失败: {e}")
+            return None
 
-    async def aget_agent_by_identifier(self, identifier, **kwargs):
-        """
-        异步根据标识符获取智能体（支持 agent_id 或 name，优先缓存，无则查库）
-        """
-        if identifier in self._instances:
-            return self._instances[identifier]
+    async def warm_up(self, limit: int | None = None, concurrency: int = 4):
+        """预热最常用的智能体，使首次对话不需要等待模型、工具和图的初始化"""
+        limit = sys_config.agent_warmup_count if limit is None else limit
+        limit = min(limit, self.max_size)
+        if limit <= 0:
+            return []
+
+        agent_ids = await asyncio.to_thread(self.get_popular_agent_ids, limit)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(agent_id):
+            async with semaphore:
+                return await self._warm_up_agent(agent_id)
+
+        start = time.monotonic()
+        agents = await asyncio.gather(*(warm(agent_id) for agent_id in agent_ids))
+        warmed = [agent.agent_id for agent in agents if agent is not None]
+        logger.info(f"预热了 {len(warmed)}/{len(agent_ids)} 个智能体，耗时 {time.monotonic() - start:.2f}s")
+        return warmed
+
+    def _schedule_warm_up(self, agent_id):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if (previous := self._warming.get(agent_id)) is not None:
+            previous.cancel()
 
+        task = loop.create_task(self._warm_up_agent(agent_id))
+        self._warming[agent_id] = task
+
+        def on_done(done):
+            if self._warming.get(agent_id) is done:
+                del self._warming[agent_id]
+
+        task.add_done_callback(on_done)
+
+    def _query_record(self, identifier, match_name=False):
+        """查询智能体记录，返回 (agent_id, name, config)，不存在时返回 None"""
         from models.agent_models import CustomAgent as CustomAgentModel
-        from src.agents.chatbot_agent import ChatbotAgent
+
+        condition = CustomAgentModel.agent_id == identifier
+        if match_name:
+            condition = condition | (CustomAgentModel.name == identifier)
 
         with self.db_manager.get_session_context() as session:
             db_record = session.query(CustomAgentModel).filter(
-                ((CustomAgentModel.agent_id == identifier) | (CustomAgentModel.name == identifier)),
+                condition,
                 CustomAgentModel.deleted_at.is_(None),
                 CustomAgentModel.is_active == True
             ).first()
 
             if not db_record:
                 return None
-                
+
             # 在会话关闭前获取所有需要的数据
-            agent_id = db_record.agent_id
-            config = db_record.to_chatbot_config()
+            return db_record.agent_id, db_record.name, db_record.to_chatbot_config()
 
-        # 使用异步工厂创建实例
-        agent = await ChatbotAgent.create(agent_id=agent_id, config=config)
-        self._instances[agent_id] = agent
+    async def _create_and_cache(self, agent_id, name, config):
+        generation = self._generations.get(agent_id, 0)
+        try:
+            # 使用异步工厂创建实例
+            agent = await ChatbotAgent.create(agent_id=agent_id, config=config)
+        finally:
+            if self._pending.get(agent_id) is asyncio.current_task():
+                del self._pending[agent_id]
+
+        if self._generations.get(agent_id, 0) == generation:
+            self._cache(agent_id, agent, name)
+        else:
+            logger.info(f"智能体 {agent_id} 在创建期间被修改，本次实例不写入缓存")
+        return agent
+
+    async def _aget_or_create(self, identifier, match_name=False):
+        if (agent := self._lookup(identifier)) is not None:
+            return agent
+        if (task := self._pending.get(self._aliases.get(identifier, identifier))) is not None:
+            return await asyncio.shield(task)
+
+        record = self._query_record(identifier, match_name=match_name)
+        if record is None:
+            return None
+
+        agent_id, name, config = record
+        if (agent := self._lookup(agent_id)) is not None:
+            if name:
+                self._aliases[name] = agent_id
+            return agent
+
+        # 并发的首次请求共享同一个创建任务，调用方取消时不影响创建
+        task = self._pending.get(agent_id)
+        if task is None:
+            task = asyncio.create_task(self._create_and_cache(agent_id, name, config))
+            self._pending[agent_id] = task
+        return await asyncio.shield(task)
+
+    async def aget_agent(self, agent_id, **kwargs):
+        """异步获取智能体实例（先查缓存，无则查库并异步创建、缓存）"""
+        agent = await self._aget_or_create(agent_id)
+        if agent is None:
+            raise ValueError(f"智能体 {agent_id} 不存在")
+        return agent
+
+    def get_agent(self, agent_id, **kwargs):
+        """同步获取智能体实例（先查缓存，无则查库并缓存）。警告：可能不完全初始化。"""
+        logger.warning(f"正在同步获取智能体 {agent_id}，MCP工具可能无法加载。推荐使用 aget_agent。")
+        agent = self._get_or_create(agent_id)
+        if agent is None:
+            raise ValueError(f"智能体 {agent_id} 不存在")
         return agent
 
+    async def aget_agent_by_identifier(self, identifier, **kwargs):
+        """
+        异步根据标识符获取智能体（支持 agent_id 或 name，优先缓存，无则查库）
+        """
+        return await self._aget_or_create(identifier, match_name=True)
+
     def get_agent_by_identifier(self, identifier, **kwargs):
         """
         同步根据标识符获取智能体（支持 agent_id 或 name，优先缓存，无则查库）。警告：可能不完全初始化。
         """
         logger.warning(f"正在同步获取智能体 {identifier}，MCP工具可能无法加载。推荐使用 aget_agent_by_identifier。")
-        if identifier in self._instances:
-            return self._instances[identifier]
-
-        from models.agent_models import CustomAgent as CustomAgentModel
-        from src.agents.chatbot_agent import ChatbotAgent
+        return self._get_or_create(identifier, match_name=True)
 
-        with self.db_manager.get_session_context() as session:
-            db_record = session.query(CustomAgentModel).filter(
-                ((CustomAgentModel.agent_id == identifier) | (CustomAgentModel.name == identifier)),
-                CustomAgentModel.deleted_at.is_(None),
-                CustomAgentModel.is_active == True
-            ).first()
+    def _get_or_create(self, identifier, match_name=False):
+        if (agent := self._lookup(identifier)) is not None:
+            return agent
 
-            if not db_record:
-                return None
+        record = self._query_record(identifier, match_name=match_name)
+        if record is None:
+            return None
 
-            agent = ChatbotAgent.from_db_record(db_record)
-            self._instances[db_record.agent_id] = agent
-            return agent
+        # 使用同步方法创建，可能不完整
+        agent_id, name, config = record
+        agent = ChatbotAgent(agent_id=agent_id, config=config)
+        self._cache(agent_id, agent, name)
+        return agent
 
     def get_agents(self):
         """获取所有已缓存的智能体实例"""
@@ -138,9 +301,36 @@ class AgentManager:
             agents = query.all()
             return [agent.to_dict(include_config=False) for agent in agents]
 
+    def get_cache_stats(self):
+        return {
+            "size": len(self._instances),
+            "max_size": self.max_size,
+            "idle_timeout": self.idle_timeout,
+            "pending": len(self._pending),
+            "aliases": len(self._aliases),
+        }
+
     def clear_cache(self):
-        self._instances.clear()
+        for agent_id in list(self._instances):
+            self._remove(agent_id)
+        self._aliases.clear()
         logger.info("智能体管理器缓存已清空")
 
+    async def aclose(self):
+        """关闭所有缓存的智能体，在服务退出时调用"""
+        for task in self._warming.values():
+            task.cancel()
+        agents = list(self._instances.values())
+        self._instances.clear()
+        self._aliases.clear()
+        self._last_used.clear()
+        for agent in agents:
+            try:
+                await agent.aclose()
+            except Exception as e:
+                logger.warning(f"关闭智能体 {agent.name} 失败: {e}")
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
 
-agent_manager = AgentManager()
\ No newline at end of file
+agent_manager = AgentManager()
@@ -2,14 +2,14 @@ import asyncio
 import os
 import uuid
 from typing import Any
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timezone
 
 import sqlite3
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver, aiosqlite
+from langgraph.prebuilt import tools_condition
 
 from src import config as sys_config
 from src.utils import logger
@@ -17,6 +17,13 @@ from src.agents.registry import State, BaseAgent
 from src.agents.utils import load_chat_model, get_cur_time_with_utc
 from src.agents.chatbot.configuration import ChatbotConfiguration
 from src.agents.tools_factory import get_all_tools
+from src.agents.checkpointer import get_checkpointer
+from src.core.context_window import ContextWindow
+from src.agents.tool_node import ParallelToolNode
+
+
+# 绑定工具后的模型缓存数量，超出后淘汰最久未使用的
+BOUND_MODEL_CACHE_SIZE = int(os.getenv("BOUND_MODEL_CACHE_SIZE", 32))
 
 
 class ChatbotAgent(BaseAgent):
@@ -28,6 +35,7 @@ class ChatbotAgent(BaseAgent):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.graph = None
+        self._bound_models: OrderedDict[tuple, tuple] = OrderedDict()
         self.workdir = Path(sys_config.storage_dir) / "agents" / self.name
         self.workdir.mkdir(parents=True, exist_ok=True)
 
@@ -43,10 +51,28 @@ class ChatbotAgent(BaseAgent):
             return []
         else:
             # 使用配置中指定的工具
-            tool_names = [tool for tool in platform_tools.keys() if tool in tools]
+            tool_names = [tool for tool in tools if tool in platform_tools]
             logger.info(f"使用工具: {tool_names}")
             return [platform_tools[tool] for tool in tool_names]
 
+    def _get_bound_model(self, provider: str, model_name: str, tools: list):
+        """从模型池获取模型并绑定工具，绑定结果按 (模型, 工具) 缓存，避免每轮对话重复构建"""
+        model = load_chat_model(provider=provider, model=model_name)
+        if not tools:
+            return model
+
+        # 缓存中同时保留模型和工具的引用，保证作为键的 id 在缓存期间不会被复用
+        key = (id(model), tuple(id(tool) for tool in tools))
+        if (cached := self._bound_models.get(key)) is not None:
+            self._bound_models.move_to_end(key)
+            return cached[-1]
+
+        bound_model = model.bind_tools(tools)
+        self._bound_models[key] = (model, tools, bound_model)
+        while len(self._bound_models) > BOUND_MODEL_CACHE_SIZE:
+            self._bound_models.popitem(last=False)
+        return bound_model
+
     async def llm_call(self, state: State, config: RunnableConfig = None) -> dict[str, Any]:
         """调用 llm 模型 - 异步版本以支持异步工具"""
         conf = self.config_schema.from_runnable_config(config, agent_name=self.name)
@@ -62,13 +88,15 @@ class ChatbotAgent(BaseAgent):
             provider = "deepseek"  # Default provider
             model_name = model_str
         
-        model = load_chat_model(provider=provider, model=model_name)
-
-        if tools := self._get_tools(conf.tools):
-            model = model.bind_tools(tools)
+        model = self._get_bound_model(provider, model_name, self._get_tools(conf.tools))
 
         # 使用异步调用
-        res = await model.ainvoke([{"role": "system", "content": system_prompt}, *state["messages"]])
+        window = ContextWindow.for_model(
+            context_window=sys_config.agent_context_window,
+            system_prompt=system_prompt,
+            max_tool_output_tokens=sys_config.agent_tool_output_max_tokens,
+        )
+        res = await model.ainvoke([{"role": "system", "content": system_prompt}, *window.fit(state["messages"])])
         return {"messages": [res]}
 
     async def get_graph(self, config_schema: RunnableConfig = None, **kwargs):
@@ -78,7 +106,7 @@ class ChatbotAgent(BaseAgent):
 
         workflow = StateGraph(State, config_schema=self.config_schema)
         workflow.add_node("chatbot", self.llm_call)
-        workflow.add_node("tools", ToolNode(tools=list(get_all_tools().values())))
+        workflow.add_node("tools", ParallelToolNode(list(get_all_tools().values())))
         workflow.add_edge(START, "chatbot")
         workflow.add_conditional_edges(
             "chatbot",
@@ -89,8 +117,7 @@ class ChatbotAgent(BaseAgent):
 
         # 创建数据库连接并确保设置 checkpointer
         try:
-            sqlite_checkpointer = AsyncSqliteSaver(await self.get_async_conn())
-            graph = workflow.compile(checkpointer=sqlite_checkpointer)
+            graph = workflow.compile(checkpointer=await get_checkpointer())
             self.graph = graph
             return graph
         except Exception as e:
@@ -100,13 +127,9 @@ class ChatbotAgent(BaseAgent):
             self.graph = graph
             return graph
 
-    async def get_async_conn(self) -> aiosqlite.Connection:
-        """获取异步数据库连接"""
-        return await aiosqlite.connect(os.path.join(self.workdir, "aio_history.db"))
-
-    async def get_aio_memory(self) -> AsyncSqliteSaver:
+    async def get_aio_memory(self):
         """获取异步存储实例"""
-        return AsyncSqliteSaver(await self.get_async_conn())
+        return await get_checkpointer()
 
 
 def main():
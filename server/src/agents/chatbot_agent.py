@@ -3,27 +3,62 @@ import traceback
 from typing import Any, Dict, List
 from pathlib import Path
 import yaml
-from dataclasses import dataclass, field
+from dataclasses import dataclass
+from collections import OrderedDict
 import asyncio
 
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver, aiosqlite
+from langgraph.prebuilt import tools_condition
 
 from src import config as sys_config
 from src.utils import logger
 from src.agents.registry import State, BaseAgent, Configuration
 from src.agents.utils import load_chat_model, get_cur_time_with_utc
-from src.agents.tools_factory import get_all_tools
+from src.agents.tools_factory import get_all_tools, get_multi_retriever_tool
+from src.agents.checkpointer import checkpointer_manager, get_checkpointer
+from src.core.context_window import ContextWindow
+from src.agents.tool_node import ParallelToolNode
 from db_manager import DBManager
 from models.agent_models import CustomAgent as CustomAgentModel
 from config.agent_config import AgentConfig, ModelConfig, KnowledgeConfig, McpConfig
 
 
+@dataclass(frozen=True, slots=True)
+class ChatbotRuntimeConfig:
+    """每轮对话使用的只读配置，由 ChatbotConfiguration.compile() 生成一次
+
+    系统提示词的前缀和上下文窗口预先计算好，每轮只需要拼接当前时间。
+    """
+
+    system_prompt: str
+    system_prompt_prefix: str
+    context_window: ContextWindow
+
+    @classmethod
+    def build(cls, system_prompt: str, llm_config: ModelConfig) -> "ChatbotRuntimeConfig":
+        prefix = f"{system_prompt} Now is "
+        context_window = ContextWindow.for_model(
+            context_window=llm_config.context_window or sys_config.agent_context_window,
+            max_output_tokens=(llm_config.config or {}).get("max_tokens") or 0,
+            # 时间戳的长度固定，用当前时间估算即可
+            system_prompt=prefix + get_cur_time_with_utc(),
+            max_tool_output_tokens=sys_config.agent_tool_output_max_tokens,
+        )
+        return cls(system_prompt=system_prompt, system_prompt_prefix=prefix, context_window=context_window)
+
+    def format_system_prompt(self) -> str:
+        return self.system_prompt_prefix + get_cur_time_with_utc()
+
+
 class ChatbotConfiguration(Configuration):
     """使用 AgentConfig 的智能体配置类"""
 
+    # 嵌套配置的类型，以字典赋值时在首次访问时转换并写回
+    NESTED_CONFIGS = {"llm_config": ModelConfig, "knowledge_config": KnowledgeConfig, "mcp_config": McpConfig}
+    # 缓存的运行时配置数量（默认配置和运行时覆盖的系统提示词各占一个）
+    RUNTIME_CACHE_SIZE = 8
+
     def __init__(self, agent_config: AgentConfig = None):
         from config.agent_config import AgentConfig as AC
 
@@ -94,28 +129,48 @@ class ChatbotConfiguration(Configuration):
         """转换为字典格式"""
         return self.agent_config.model_dump()
 
+    def compile(self, configurable: dict | None = None) -> ChatbotRuntimeConfig:
+        """生成每轮对话使用的只读配置，configurable 中的 system_prompt 可以覆盖默认提示词
+
+        结果按 (系统提示词, 上下文窗口, max_tokens) 缓存，嵌套配置被原地修改时也会重新生成。
+        """
+        system_prompt = (configurable or {}).get("system_prompt")
+        if system_prompt is None:
+            system_prompt = self.agent_config.system_prompt or ""
+        llm_config = self.llm_config
+        key = (system_prompt, llm_config.context_window, (llm_config.config or {}).get("max_tokens"))
+
+        runtimes = self.__dict__.get("_runtimes")
+        if runtimes is None:
+            runtimes = OrderedDict()
+            super().__setattr__("_runtimes", runtimes)
+        if (runtime := runtimes.get(key)) is not None:
+            runtimes.move_to_end(key)
+            return runtime
+
+        runtime = runtimes[key] = ChatbotRuntimeConfig.build(system_prompt, llm_config)
+        while len(runtimes) > self.RUNTIME_CACHE_SIZE:
+            runtimes.popitem(last=False)
+        return runtime
+
+    def invalidate(self):
+        """清除缓存的运行时配置"""
+        self.__dict__.pop("_runtimes", None)
+
     def __getattr__(self, name):
         """代理到 agent_config 的属性"""
         value = getattr(self.agent_config, name)
-        if name == "llm_config":
-            from config.agent_config import ModelConfig
-
-            if isinstance(value, dict):
-                return ModelConfig(**value)
-        elif name == "knowledge_config":
-            from config.agent_config import KnowledgeConfig
-
-            if isinstance(value, dict):
-                return KnowledgeConfig(**value)
-        elif name == "mcp_config":
-            from config.agent_config import McpConfig
-
-            if isinstance(value, dict):
-                return McpConfig(**value)
+        nested_cls = self.NESTED_CONFIGS.get(name)
+        if nested_cls is not None and isinstance(value, dict):
+            # 转换后写回 agent_config，之后的访问不再重复创建对象
+            value = nested_cls(**value)
+            setattr(self.agent_config, name, value)
         return value
 
     def __setattr__(self, name, value):
         """设置属性"""
+        # 配置变化后需要重新生成运行时配置
+        self.invalidate()
         if name == "agent_config":
             super().__setattr__(name, value)
         elif name in ["thread_id", "user_id"]:
@@ -203,10 +258,6 @@ class ChatbotAgent(BaseAgent):
         tools_config = self.config_schema.tools
         mcp_skills_config = self.config_schema.mcp_config.servers if self.config_schema.mcp_config.enabled else []
 
-        # 确保在 _aget_tools 之前，所有工具（包括知识库）已经被注册
-        # 这里可以加一个预加载或检查的步骤
-        get_all_tools()  # 确保知识库等工具已加载
-
         self.tools = await self._aget_tools(
             tools_config,
             mcp_skills_config,
@@ -239,8 +290,9 @@ class ChatbotAgent(BaseAgent):
 
     def reload_config(self):
         """重新加载配置"""
-        # 清除图缓存，强制重新构建
+        # 清除图缓存和运行时配置缓存，强制重新构建
         self.graph = None
+        self.config_schema.invalidate()
         # 重新初始化MCP连接配置
         self._init_mcp_connections()
         # 重新初始化模型和工具
@@ -299,7 +351,11 @@ class ChatbotAgent(BaseAgent):
         knowledge_dbs = (
             self.config_schema.knowledge_config.databases if self.config_schema.knowledge_config.enabled else []
         )
-        if knowledge_dbs:
+        if len(knowledge_dbs) > 1:
+            # 多个知识库合并为一个并发检索工具，减少模型的工具调用轮次
+            result_tools.append(get_multi_retriever_tool(knowledge_dbs))
+            logger.debug(f"添加多知识库检索工具: {knowledge_dbs}")
+        elif knowledge_dbs:
             for db_id in knowledge_dbs:
                 tool_name = f"retrieve_{db_id[:8]}"
                 if tool_name in platform_tools:
@@ -330,17 +386,15 @@ class ChatbotAgent(BaseAgent):
 
     async def llm_call(self, state: State, config: RunnableConfig = None) -> Dict[str, Any]:
         """调用LLM模型"""
-        # 合并配置：运行时配置可以覆盖默认配置
-        final_config = self.config_schema.to_dict()
-        if config and "configurable" in config:
-            final_config.update(config["configurable"])
+        # 运行时配置可以覆盖默认配置
+        runtime = self.config_schema.compile((config or {}).get("configurable"))
 
-        # 构建系统提示词
-        system_prompt = final_config.get("system_prompt", self.config_schema.system_prompt)
-        system_prompt = f"{system_prompt} Now is {get_cur_time_with_utc()}"
+        # 按模型的上下文窗口裁剪历史消息
+        messages = [{"role": "system", "content": runtime.format_system_prompt()}] + runtime.context_window.fit(
+            state["messages"]
+        )
 
         # 异步调用模型
-        messages = [{"role": "system", "content": system_prompt}] + state["messages"]
         try:
             # 使用预先加载和绑定的模型与工具
             result = await self.llm_with_tools.ainvoke(messages)
@@ -376,7 +430,7 @@ class ChatbotAgent(BaseAgent):
         workflow = StateGraph(State, config_schema=self.config_schema)
         workflow.add_node("llm", self.llm_call)
         if self.tools:
-            workflow.add_node("tools", ToolNode(tools=self.tools))
+            workflow.add_node("tools", ParallelToolNode(self.tools))
         workflow.add_edge(START, "llm")
         if self.tools:
             workflow.add_conditional_edges(
@@ -386,8 +440,7 @@ class ChatbotAgent(BaseAgent):
             workflow.add_edge("tools", "llm")
         workflow.add_edge("llm", END)
         try:
-            sqlite_checkpointer = AsyncSqliteSaver(await self.get_async_conn())
-            graph = workflow.compile(checkpointer=sqlite_checkpointer)
+            graph = workflow.compile(checkpointer=await get_checkpointer())
             self.graph = graph
             logger.info(f"智能体 {self.name} 图构建成功（带检查点）")
             return graph
@@ -397,16 +450,9 @@ class ChatbotAgent(BaseAgent):
             self.graph = graph
             return graph
 
-    async def get_async_conn(self):
-        """获取异步数据库连接"""
-        db_path = self.workdir / "checkpoint.db"
-        return await aiosqlite.connect(str(db_path))
-
     async def check_checkpointer(self) -> bool:
-        """检查检查点是否可用"""
-        conn = await self.get_async_conn()
-        await conn.close()
-        return True
+        """检查检查点是否可用，复用共享的 checkpointer，不会新建连接"""
+        return await checkpointer_manager.is_available()
 
     async def get_info(self):
         """获取智能体信息（无数据库依赖）"""
@@ -0,0 +1,409 @@
+import os
+import gzip
+import json
+import time
+import base64
+import sqlite3
+import asyncio
+import contextlib
+
+from src import config as sys_config
+from src.utils import logger
+from src.agents.checkpointer import checkpointer_manager
+
+
+# UUID v6 时间戳的起点（1582-10-15）与 Unix 时间戳的差值，单位 100ns
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+# 各后端中属于同一个线程的表
+SQLITE_TABLES = ("checkpoints", "writes")
+POSTGRES_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+# 各表的主键，归档后按主键删除已归档的行
+TABLE_KEYS = {
+    "checkpoints": ("thread_id", "checkpoint_ns", "checkpoint_id"),
+    "writes": ("thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"),
+    "checkpoint_writes": ("thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"),
+    "checkpoint_blobs": ("thread_id", "checkpoint_ns", "channel", "version"),
+}
+
+
+def checkpoint_timestamp(checkpoint_id: str) -> float:
+    """从 LangGraph 的检查点 ID（UUID v6）中解析创建时间"""
+    hex_id = checkpoint_id.replace("-", "")
+    timestamp = (int(hex_id[:12], 16) << 12) | int(hex_id[13:16], 16)
+    return (timestamp - _UUID_EPOCH_OFFSET) / 1e7
+
+
+def _encode_row(row: dict) -> dict:
+    return {key: {"b64": base64.b64encode(value).decode()} if isinstance(value, bytes | memoryview) else value
+            for key, value in row.items()}
+
+
+def _decode_row(row: dict) -> dict:
+    return {key: base64.b64decode(value["b64"]) if isinstance(value, dict) and "b64" in value else value
+            for key, value in row.items()}
+
+
+class CheckpointMaintenance:
+    """检查点维护任务
+
+    - 每个线程只保留最新的 keep_latest 个检查点，并删除对应的中间写入
+    - 空闲超过 archive_after_days 天的线程压缩归档到 archive_dir 后从数据库中删除，
+      再次访问时自动恢复
+    - 按 vacuum_interval 定期 VACUUM，回收删除后的磁盘空间
+
+    多个 API 进程共享同一个数据库时，通过文件锁保证同一时间只有一个进程执行维护。
+    """
+
+    def __init__(
+        self,
+        keep_latest: int | None = None,
+        archive_after_days: float | None = None,
+        interval: float | None = None,
+        vacuum_interval: float | None = None,
+        archive_dir: str | None = None,
+    ):
+        self.keep_latest = sys_config.checkpoint_keep_latest if keep_latest is None else keep_latest
+        self.archive_after_days = (
+            sys_config.checkpoint_archive_after_days if archive_after_days is None else archive_after_days
+        )
+        self.interval = sys_config.checkpoint_maintenance_interval if interval is None else interval
+        self.vacuum_interval = sys_config.checkpoint_vacuum_interval if vacuum_interval is None else vacuum_interval
+        self.archive_dir = archive_dir or os.path.join(sys_config.storage_dir, "agents", "checkpoint_archive")
+        self.lock_path = os.path.join(sys_config.storage_dir, "agents", "checkpoint_maintenance.lock")
+        self._last_vacuum = 0.0
+        self._task = None
+
+    @property
+    def backend(self):
+        return checkpointer_manager.backend
+
+    @property
+    def tables(self):
+        return POSTGRES_TABLES if self.backend == "postgres" else SQLITE_TABLES
+
+    def _archive_path(self, thread_id: str) -> str:
+        return os.path.join(self.archive_dir, thread_id[:2], f"{thread_id}.jsonl.gz")
+
+    # ==================== 调度 ====================
+
+    def start(self):
+        """在后台定期执行维护，interval 为 0 时不启动"""
+        if self.interval <= 0 or self._task is not None:
+            return None
+        self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Checkpoint maintenance failed: {e}")
+
+    async def run_once(self, vacuum: bool | None = None) -> dict | None:
+        """执行一次维护，其他进程正在维护时跳过并返回 None"""
+        lock_file = await asyncio.to_thread(self._try_lock)
+        if lock_file is None:
+            logger.debug("Checkpoint maintenance is running in another process, skipped")
+            return None
+
+        try:
+            if vacuum is None:
+                vacuum = self.vacuum_interval > 0 and time.time() - self._last_vacuum >= self.vacuum_interval
+
+            start = time.monotonic()
+            stats = {"pruned": await self.prune(), "archived": await self.archive_idle_threads()}
+            if vacuum:
+                await self.vacuum()
+                self._last_vacuum = time.time()
+            stats["vacuumed"] = bool(vacuum)
+            logger.info(f"Checkpoint maintenance finished in {time.monotonic() - start:.2f}s: {stats}")
+            return stats
+        finally:
+            lock_file.close()
+
+    def _try_lock(self):
+        try:
+            import fcntl
+        except ImportError:  # Windows 下不做跨进程互斥
+            return open(os.devnull, "w")
+
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        lock_file = open(self.lock_path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    # ==================== 数据库访问 ====================
+
+    async def _execute(self, func, *args):
+        """sqlite 使用独立的同步连接在线程中执行，不占用 checkpointer 的连接；postgres 使用连接池"""
+        if self.backend == "postgres":
+            pool = checkpointer_manager._resource
+            if pool is None:
+                await checkpointer_manager.get()
+                pool = checkpointer_manager._resource
+            async with pool.connection() as conn:
+                return await func(conn, *args)
+
+        def run():
+            conn = sqlite3.connect(checkpointer_manager.sqlite_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            try:
+                return func(conn, *args)
+            finally:
+                conn.close()
+
+        return await asyncio.to_thread(run)
+
+    async def _query(self, sql, params=()):
+        if self.backend == "postgres":
+            sql = sql.replace("?", "%s")
+
+            async def run(conn):
+                cursor = await conn.execute(sql, params)
+                return [dict(row) for row in await cursor.fetchall()] if cursor.description else cursor.rowcount
+
+            return await self._execute(run)
+
+        def run(conn):
+            cursor = conn.execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()] if cursor.description else cursor.rowcount
+
+        return await self._execute(run)
+
+    # ==================== 清理旧检查点 ====================
+
+    async def prune(self) -> int:
+        """每个线程只保留最新的 keep_latest 个检查点，返回删除的检查点数量"""
+        if self.keep_latest <= 0:
+            return 0
+
+        # 检查点 ID 是按时间递增的 UUID v6，可以直接按 ID 排序
+        deleted = await self._query(
+            """
+            DELETE FROM checkpoints WHERE (thread_id, checkpoint_ns, checkpoint_id) IN (
+                SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                    SELECT thread_id, checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                    ) AS rn FROM checkpoints
+                ) AS ranked WHERE rn > ?
+            )
+            """,
+            (self.keep_latest,),
+        )
+        if not deleted:
+            return 0
+
+        writes_table = "checkpoint_writes" if self.backend == "postgres" else "writes"
+        await self._query(
+            f"""
+            DELETE FROM {writes_table} WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c WHERE c.thread_id = {writes_table}.thread_id
+                AND c.checkpoint_ns = {writes_table}.checkpoint_ns AND c.checkpoint_id = {writes_table}.checkpoint_id
+            )
+            """
+        )
+        if self.backend == "postgres":
+            # postgres 后端的通道值按版本单独存储，删除不再被任何检查点引用的版本
+            await self._query(
+                """
+                DELETE FROM checkpoint_blobs b WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                )
+                """
+            )
+        return deleted
+
+    # ==================== 归档空闲线程 ====================
+
+    async def get_idle_threads(self, idle_seconds: float) -> list[str]:
+        rows = await self._query("SELECT thread_id, MAX(checkpoint_id) AS latest FROM checkpoints GROUP BY thread_id")
+        deadline = time.time() - idle_seconds
+        idle = []
+        for row in rows:
+            try:
+                if checkpoint_timestamp(row["latest"]) < deadline:
+                    idle.append(row["thread_id"])
+            except ValueError:
+                continue
+        return idle
+
+    async def archive_idle_threads(self) -> int:
+        if self.archive_after_days <= 0:
+            return 0
+        threads = await self.get_idle_threads(self.archive_after_days * 86400)
+        archived = 0
+        for thread_id in threads:
+            try:
+                await self.archive_thread(thread_id)
+                archived += 1
+            except Exception as e:
+                logger.warning(f"Failed to archive checkpoint thread {thread_id}: {e}")
+        if archived < len(threads):
+            logger.warning(f"Archived {archived} of {len(threads)} idle checkpoint threads, {len(threads) - archived} failed")
+        return archived
+
+    async def archive_thread(self, thread_id: str) -> str:
+        """将线程的全部检查点写入 gzip 压缩的 JSONL 文件，写入成功后从数据库中删除
+
+        只删除已写入归档的行，归档过程中新写入的检查点保留在数据库中，再次访问时与归档合并。
+        """
+        # 线程已有归档时先恢复，合并后重新归档，避免覆盖旧的归档文件
+        await self.restore_thread(thread_id)
+        path = self._archive_path(thread_id)
+        rows = {table: await self._query(f"SELECT * FROM {table} WHERE thread_id = ?", (thread_id,))
+                for table in self.tables}
+
+        await asyncio.to_thread(self._write_archive, path, rows)
+        await self._delete_rows(rows)
+        logger.debug(f"Archived checkpoint thread {thread_id} to {path}")
+        return path
+
+    @staticmethod
+    def _write_archive(path, rows: dict[str, list[dict]]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for table, table_rows in rows.items():
+                for row in table_rows:
+                    f.write(json.dumps({"table": table, "row": _encode_row(row)}, ensure_ascii=False, default=str))
+                    f.write("\n")
+        os.replace(tmp_path, path)
+
+    async def _delete_rows(self, rows: dict[str, list[dict]]):
+        """在一个事务中按主键删除 {表: [行]}
+
+        postgres 的通道值可能被归档后新写入的检查点继续引用，只删除不再被引用的版本。
+        """
+        placeholder = "%s" if self.backend == "postgres" else "?"
+        statements = []
+        for table, table_rows in rows.items():
+            if not table_rows:
+                continue
+            key = TABLE_KEYS[table]
+            sql = f"DELETE FROM {table} WHERE " + " AND ".join(f"{column} = {placeholder}" for column in key)
+            if table == "checkpoint_blobs":
+                sql += (
+                    " AND NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = checkpoint_blobs.thread_id"
+                    " AND c.checkpoint_ns = checkpoint_blobs.checkpoint_ns"
+                    " AND c.checkpoint -> 'channel_versions' ->> checkpoint_blobs.channel = checkpoint_blobs.version)"
+                )
+            statements.append((sql, [tuple(row[column] for column in key) for row in table_rows]))
+
+        if self.backend == "postgres":
+
+            async def run(conn):
+                async with conn.transaction(), conn.cursor() as cursor:
+                    for sql, params in statements:
+                        await cursor.executemany(sql, params)
+
+            return await self._execute(run)
+
+        def run(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    conn.executemany(sql, params)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return await self._execute(run)
+
+    def is_archived(self, thread_id: str) -> bool:
+        return os.path.exists(self._archive_path(thread_id))
+
+    async def restore_thread(self, thread_id: str) -> bool:
+        """从归档文件恢复线程，恢复后删除归档文件"""
+        path = self._archive_path(thread_id)
+        if not os.path.exists(path):
+            return False
+
+        def read():
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        try:
+            records = await asyncio.to_thread(read)
+        except FileNotFoundError:
+            # 并发的恢复请求已经完成恢复并删除了归档文件
+            return True
+
+        # 按表和列分组，在一个事务中批量写入
+        groups: dict[tuple, list[tuple]] = {}
+        for record in records:
+            row = _decode_row(record["row"])
+            if self.backend == "postgres":
+                # jsonb 字段需要以 JSON 字符串写入
+                row = {key: json.dumps(value) if isinstance(value, dict | list) else value for key, value in row.items()}
+            groups.setdefault((record["table"], tuple(row)), []).append(tuple(row.values()))
+
+        await self._insert_many(groups)
+        # 并发恢复同一个线程时写入都会被忽略，归档文件可能已被另一个请求删除
+        with contextlib.suppress(FileNotFoundError):
+            await asyncio.to_thread(os.remove, path)
+        logger.info(f"Restored checkpoint thread {thread_id} from {path}")
+        return True
+
+    async def _insert_many(self, groups: dict[tuple, list[tuple]]):
+        """在一个事务中批量插入 {(表, 列): [行]}，已存在的行忽略"""
+
+        def statement(table, columns, placeholder):
+            values = ", ".join(placeholder for _ in columns)
+            if self.backend == "postgres":
+                return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values}) ON CONFLICT DO NOTHING"
+            return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+        if self.backend == "postgres":
+
+            async def run(conn):
+                async with conn.transaction(), conn.cursor() as cursor:
+                    for (table, columns), rows in groups.items():
+                        await cursor.executemany(statement(table, columns, "%s"), rows)
+
+            return await self._execute(run)
+
+        def run(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for (table, columns), rows in groups.items():
+                    conn.executemany(statement(table, columns, "?"), rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return await self._execute(run)
+
+    # ==================== 回收空间 ====================
+
+    async def vacuum(self):
+        if self.backend == "postgres":
+            for table in self.tables:
+                await self._query(f"VACUUM ANALYZE {table}")
+            return
+
+        def run(conn):
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        await self._execute(run)
+
+
+checkpoint_maintenance = CheckpointMaintenance()
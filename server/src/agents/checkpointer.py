@@ -0,0 +1,151 @@
+import os
+import glob
+import asyncio
+
+from src import config as sys_config
+from src.utils import logger
+
+
+# 历史版本中每个智能体单独的检查点数据库，首次启动共享数据库时导入
+LEGACY_CHECKPOINT_FILES = ("checkpoint.db", "aio_history.db")
+# 导入时显式列出列名，不依赖旧数据库中列的顺序
+LEGACY_CHECKPOINT_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+LEGACY_WRITE_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value"
+
+
+class CheckpointerManager:
+    """智能体共享的检查点存储
+
+    进程内所有智能体共用一个 checkpointer，线程按 thread_id 区分，检查点元数据中记录 agent_id。
+
+    - sqlite: storage/agents/checkpoints.db，进程内共用一个 aiosqlite 连接（不是连接池），
+      WAL 模式，多个 API 进程可以同时读写
+    - postgres: 使用连接池，需要安装可选依赖 postgres（langgraph-checkpoint-postgres、psycopg[pool]）
+    """
+
+    def __init__(self, backend: str | None = None, uri: str | None = None, pool_size: int | None = None):
+        self.backend = backend or sys_config.checkpointer_backend
+        self.uri = uri or sys_config.checkpointer_uri or os.getenv("CHECKPOINTER_URI") or os.getenv("POSTGRES_URI", "")
+        self.pool_size = pool_size or sys_config.checkpointer_pool_size
+        self.sqlite_path = os.path.join(sys_config.storage_dir, "agents", "checkpoints.db")
+        self._checkpointer = None
+        self._resource = None  # sqlite 连接或 postgres 连接池
+        self._lock = None
+
+    async def get(self):
+        """获取共享的 checkpointer，首次调用时创建连接并初始化表结构"""
+        if self._checkpointer is not None:
+            return self._checkpointer
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._checkpointer is None:
+                if self.backend == "postgres":
+                    self._checkpointer = await self._create_postgres()
+                elif self.backend == "sqlite":
+                    self._checkpointer = await self._create_sqlite()
+                else:
+                    raise ValueError(f"Unknown checkpointer backend: {self.backend}")
+                logger.info(f"Checkpointer initialized with {self.backend} backend")
+        return self._checkpointer
+
+    async def is_available(self) -> bool:
+        try:
+            await self.get()
+            return True
+        except Exception as e:
+            logger.warning(f"Checkpointer is not available: {e}")
+            return False
+
+    async def _create_sqlite(self):
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver, aiosqlite
+
+        os.makedirs(os.path.dirname(self.sqlite_path), exist_ok=True)
+        conn = await aiosqlite.connect(self.sqlite_path)
+        try:
+            # WAL 模式下读写互不阻塞，busy_timeout 让多个进程的写入排队而不是直接失败
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute("PRAGMA busy_timeout=10000")
+            checkpointer = AsyncSqliteSaver(conn)
+            await checkpointer.setup()
+            await self._import_legacy_sqlite(conn)
+        except BaseException:
+            await conn.close()
+            raise
+
+        self._resource = conn
+        return checkpointer
+
+    async def _import_legacy_sqlite(self, conn):
+        """导入各智能体目录下旧的检查点数据库，每个文件只导入一次"""
+        await conn.execute("CREATE TABLE IF NOT EXISTS legacy_checkpoint_imports (path TEXT PRIMARY KEY)")
+        agents_dir = os.path.dirname(self.sqlite_path)
+        for name in LEGACY_CHECKPOINT_FILES:
+            for path in glob.glob(os.path.join(agents_dir, "*", name)):
+                async with conn.execute("SELECT 1 FROM legacy_checkpoint_imports WHERE path = ?", (path,)) as cursor:
+                    if await cursor.fetchone():
+                        continue
+                try:
+                    await conn.execute("ATTACH DATABASE ? AS legacy", (path,))
+                    try:
+                        await conn.execute(
+                            f"INSERT OR IGNORE INTO checkpoints ({LEGACY_CHECKPOINT_COLUMNS}) "
+                            f"SELECT {LEGACY_CHECKPOINT_COLUMNS} FROM legacy.checkpoints"
+                        )
+                        await conn.execute(
+                            f"INSERT OR IGNORE INTO writes ({LEGACY_WRITE_COLUMNS}) SELECT {LEGACY_WRITE_COLUMNS} FROM legacy.writes"
+                        )
+                        await conn.execute("INSERT INTO legacy_checkpoint_imports (path) VALUES (?)", (path,))
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+                    finally:
+                        await conn.execute("DETACH DATABASE legacy")
+                    logger.info(f"Imported legacy checkpoints from {path}")
+                except Exception as e:
+                    logger.warning(f"Failed to import legacy checkpoints from {path}: {e}")
+
+    async def _create_postgres(self):
+        try:
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        except ImportError as e:
+            raise ImportError(
+                "Postgres checkpointer requires `langgraph-checkpoint-postgres` and `psycopg[pool]`"
+            ) from e
+
+        if not self.uri:
+            raise ValueError("Postgres checkpointer requires checkpointer_uri or the POSTGRES_URI environment variable")
+
+        pool = AsyncConnectionPool(
+            conninfo=self.uri,
+            max_size=self.pool_size,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False,
+        )
+        await pool.open()
+        try:
+            checkpointer = AsyncPostgresSaver(pool)
+            await checkpointer.setup()
+        except BaseException:
+            await pool.close()
+            raise
+
+        self._resource = pool
+        return checkpointer
+
+    async def aclose(self):
+        resource, self._resource, self._checkpointer = self._resource, None, None
+        if resource is not None:
+            await resource.close()
+
+
+checkpointer_manager = CheckpointerManager()
+
+
+async def get_checkpointer():
+    return await checkpointer_manager.get()
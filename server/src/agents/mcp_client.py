@@ -6,6 +6,7 @@ import traceback
 import importlib
 import platform
 from src.utils import logger
+from src.agents.tool_cache import tool_result_cache
 from config.mcp_server_config import MCPConfigManager
 
 
@@ -229,7 +230,7 @@ class MCPClient:
                 try:
                     tools = await self.get_mcp_tools(server_name=skill_name)
                     if tools:
-                        all_tools.extend(tools)
+                        all_tools.extend(tool_result_cache.wrap_tools(tools, server_name=skill_name))
                         logger.info(f"成功加载MCP技能 '{skill_name}' 的 {len(tools)} 个工具，可用工具: {', '.join([getattr(tool, 'name', str(tool)) for tool in tools])}")
                     else:
                         logger.warning(f"无法加载MCP技能 '{skill_name}' 的工具")
@@ -239,7 +240,7 @@ class MCPClient:
             return all_tools
         
         # 否则返回所有可用的MCP工具
-        return await self.get_mcp_tools()
+        return tool_result_cache.wrap_tools(await self.get_mcp_tools())
 
     async def get_available_mcp_tools(self) -> Dict[str, Any]:
         """获取所有可用的MCP工具信息（按服务器分组）"""
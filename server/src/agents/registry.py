@@ -9,7 +9,7 @@ from abc import abstractmethod
 from dataclasses import dataclass, fields, field, asdict
 
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, ToolMessage
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph.message import add_messages
 
@@ -163,17 +163,53 @@ class BaseAgent:
                 raise ValueError(f"没有配置{requirement} 环境变量，请在 server/.env 文件中配置，并重新启动服务")
         return True
 
+    def _with_agent_id(self, config_schema: RunnableConfig | None) -> RunnableConfig:
+        """在运行配置中加入 agent_id，检查点元数据会记录 configurable 中的字段，用于按智能体查询线程"""
+        config_schema = dict(config_schema or {})
+        configurable = dict(config_schema.get("configurable") or {})
+        configurable.setdefault("agent_id", getattr(self, "agent_id", None) or self.name)
+        config_schema["configurable"] = configurable
+        return config_schema
+
     async def stream_values(self, messages: list[str], config_schema: RunnableConfig = None, **kwargs):
         graph = await self.get_graph()
+        config_schema = self._with_agent_id(config_schema)
         logger.debug(f"stream_values: {config_schema}")
         for event in graph.astream({"messages": messages}, stream_mode="values", config=config_schema):
             yield event["messages"]
 
+    async def _restore_archived_thread(self, thread_id):
+        """空闲线程可能已经被归档，继续对话或查看历史前先恢复"""
+        from src.agents.checkpoint_maintenance import checkpoint_maintenance
+
+        if thread_id and checkpoint_maintenance.is_archived(thread_id):
+            await checkpoint_maintenance.restore_thread(thread_id)
+
     async def stream_messages(self, messages: list[str], config_schema: RunnableConfig = None, **kwargs):
         graph = await self.get_graph()
+        config_schema = self._with_agent_id(config_schema)
+        await self._restore_archived_thread(config_schema["configurable"].get("thread_id"))
         logger.debug(f"stream_messages: {config_schema}")
 
-        async for msg, metadata in graph.astream({"messages": messages}, stream_mode="messages", config=config_schema):
+        # 工具节点在每个工具完成时通过 custom 流提前返回结果，节点结束后 messages 流中的同一条消息不再重复返回
+        streamed_ids = set()
+        async for mode, payload in graph.astream(
+            {"messages": messages}, stream_mode=["messages", "custom"], config=config_schema
+        ):
+            if mode == "custom":
+                if isinstance(payload, dict) and isinstance(payload.get("tool_message"), ToolMessage):
+                    msg = payload["tool_message"]
+                    streamed_ids.add(msg.id)
+                    yield msg, {
+                        "langgraph_node": "tools",
+                        "partial": True,
+                        "cache_hit": bool(msg.response_metadata.get("cache_hit")),
+                    }
+                continue
+
+            msg, metadata = payload
+            if msg.id is not None and msg.id in streamed_ids:
+                continue
             yield msg, metadata
 
     async def check_checkpointer(self):
@@ -183,32 +219,48 @@ class BaseAgent:
             return False
         return True
 
-    async def get_history(self, user_id, thread_id) -> list[dict]:
-        """获取历史消息"""
+    async def get_history(self, user_id, thread_id, offset=0, limit=None) -> list[dict]:
+        """获取历史消息，offset 和 limit 从最新的消息往前计算，返回结果按时间顺序排列"""
+        history, _ = await self.get_history_page(user_id, thread_id, offset=offset, limit=limit)
+        return history
+
+    async def get_history_page(self, user_id, thread_id, offset=0, limit=None) -> tuple[list[dict], int]:
+        """分页获取历史消息，返回 (当前页的消息, 消息总数)
+
+        检查点中的消息列表是一个整体，仍会读取并反序列化线程的全部消息，分页只减少转换和返回的数据量。
+        """
         try:
             app = await self.get_graph()
 
             if not await self.check_checkpointer():
-                return []
+                return [], 0
 
             config = {"configurable": {"thread_id": thread_id, "user_id": user_id}}
+            await self._restore_archived_thread(thread_id)
             state = await app.aget_state(config)
 
+            messages = state.values.get("messages", []) if state else []
+            total = len(messages)
+            end = max(total - offset, 0)
+            start = 0 if limit is None else max(end - limit, 0)
+
             result = []
-            if state:
-                messages = state.values.get("messages", [])
-                for msg in messages:
-                    if hasattr(msg, "model_dump"):
-                        msg_dict = msg.model_dump()  # 转换成字典
-                    else:
-                        msg_dict = dict(msg) if hasattr(msg, "__dict__") else {"content": str(msg)}
-                    result.append(msg_dict)
+            for msg in messages[start:end]:
+                if hasattr(msg, "model_dump"):
+                    msg_dict = msg.model_dump()  # 转换成字典
+                else:
+                    msg_dict = dict(msg) if hasattr(msg, "__dict__") else {"content": str(msg)}
+                result.append(msg_dict)
 
-            return result
+            return result, total
 
         except Exception as e:
             logger.error(f"获取智能体 {self.name} 历史消息出错: {e}")
-            return []
+            return [], 0
+
+    async def aclose(self):
+        """释放智能体持有的资源，从缓存中移除时调用。检查点连接由所有智能体共享，不在这里关闭"""
+        self.graph = None
 
     @abstractmethod
     async def get_graph(self, **kwargs) -> CompiledStateGraph:
@@ -0,0 +1,174 @@
+import json
+from fnmatch import fnmatchcase
+from typing import Any
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from src import config as sys_config
+from src.utils import logger
+from src.utils.cache import TTLCache
+
+
+TOOL_CACHE_SCOPES = ("thread", "user", "global")
+
+
+def canonical_args(args) -> str:
+    """将工具参数转为稳定的字符串：字典按键排序，字符串去除首尾空白"""
+
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(key): normalize(item) for key, item in value.items()}
+        if isinstance(value, list | tuple):
+            return [normalize(item) for item in value]
+        if isinstance(value, str):
+            return value.strip()
+        return value
+
+    return json.dumps(normalize(args), sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """工具调用结果缓存
+
+    缓存策略在 config.tool_cache_policies 中按工具名称配置，未配置的工具不缓存：
+    - 键为工具名称或通配符（如 retrieve_*），MCP 工具也可以用 mcp:<服务名称> 按服务配置
+    - 值为 {"ttl": 过期时间（秒）, "scope": 共享范围}，scope 可选 thread、user、global
+    """
+
+    def __init__(self, policies: dict[str, dict] | None = None, maxsize: int | None = None):
+        self.policies = sys_config.tool_cache_policies if policies is None else policies
+        self._cache = TTLCache(maxsize=maxsize or sys_config.tool_cache_size)
+
+    def get_policy(self, tool_name: str, server_name: str | None = None) -> dict | None:
+        candidates = [tool_name] + ([f"mcp:{server_name}"] if server_name else [])
+        for candidate in candidates:
+            if candidate in self.policies:
+                return self.policies[candidate]
+        for pattern, policy in self.policies.items():
+            if any(fnmatchcase(candidate, pattern) for candidate in candidates):
+                return policy
+        return None
+
+    def wrap(self, tool: BaseTool, server_name: str | None = None) -> BaseTool:
+        """为配置了缓存策略的工具套上缓存层，其他工具原样返回"""
+        if isinstance(tool, CachedTool):
+            return tool
+        policy = self.get_policy(tool.name, server_name)
+        if not policy or policy.get("ttl", 0) <= 0:
+            return tool
+
+        scope = policy.get("scope", "thread")
+        if scope not in TOOL_CACHE_SCOPES:
+            logger.warning(f"Unknown tool cache scope {scope} for {tool.name}, fallback to thread")
+            scope = "thread"
+
+        return CachedTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            response_format=tool.response_format,
+            wrapped=tool,
+            ttl=policy["ttl"],
+            scope=scope,
+            cache=self,
+        )
+
+    def wrap_tools(self, tools, server_name: str | None = None):
+        if isinstance(tools, dict):
+            return {name: self.wrap(tool, server_name) for name, tool in tools.items()}
+        return [self.wrap(tool, server_name) for tool in tools]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl=ttl)
+
+    def invalidate_tools(self, *patterns: str) -> int:
+        """删除工具名称匹配任一名称或通配符的缓存结果，返回删除数量"""
+        return self._cache.invalidate(lambda key: any(fnmatchcase(key[0], pattern) for pattern in patterns))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class CachedTool(BaseTool):
+    """带结果缓存的工具，参数结构与原工具相同，命中缓存时在 ToolMessage 的 response_metadata 中标记 cache_hit"""
+
+    wrapped: BaseTool
+    ttl: float
+    scope: str
+    cache: Any
+
+    def _cache_key(self, args, config: RunnableConfig | None, as_message: bool):
+        configurable = (config or {}).get("configurable", {})
+        if self.scope == "global":
+            scope_id = ""
+        else:
+            scope_id = configurable.get(f"{self.scope}_id")
+            if not scope_id:
+                return None
+        return (self.name, self.scope, scope_id, canonical_args(args), as_message)
+
+    def _lookup(self, input, config):
+        as_message = isinstance(input, dict) and input.get("type") == "tool_call"
+        args = input["args"] if as_message else input
+        key = self._cache_key(args, config, as_message)
+        if key is None:
+            return None, None
+
+        cached = self.cache.get(key)
+        if cached is None:
+            return key, None
+        if as_message:
+            content, artifact = cached
+            return key, ToolMessage(
+                content=content,
+                artifact=artifact,
+                name=self.name,
+                tool_call_id=input["id"],
+                response_metadata={"cache_hit": True, "cache_scope": self.scope},
+            )
+        return key, cached
+
+    def _store(self, key, result):
+        if key is None:
+            return
+        if isinstance(result, ToolMessage):
+            # 出错的结果不缓存
+            if result.status == "error":
+                return
+            self.cache.set(key, (result.content, result.artifact), self.ttl)
+        else:
+            self.cache.set(key, result, self.ttl)
+
+    def invoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        key, cached = self._lookup(input, config)
+        if cached is not None:
+            return cached
+        result = self.wrapped.invoke(input, config, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def ainvoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        key, cached = self._lookup(input, config)
+        if cached is not None:
+            return cached
+        result = await self.wrapped.ainvoke(input, config, **kwargs)
+        self._store(key, result)
+        return result
+
+    def _run(self, *args, **kwargs):
+        return self.wrapped.invoke(kwargs)
+
+    async def _arun(self, *args, **kwargs):
+        return await self.wrapped.ainvoke(kwargs)
+
+
+tool_result_cache = ToolResultCache()
@@ -0,0 +1,141 @@
+import uuid
+import asyncio
+import weakref
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+from src import config as sys_config
+from src.utils import logger
+
+
+# 同步工具在独立的线程池中执行，不占用事件循环，也不挤占默认线程池
+_sync_tool_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="sync-tool")
+
+
+def _is_async_tool(tool: BaseTool) -> bool:
+    # 带缓存的工具按被包装的工具判断
+    tool = getattr(tool, "wrapped", tool)
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def _get_stream_writer():
+    """获取 LangGraph 的 custom 流写入函数，不在流式执行中时返回 None"""
+    try:
+        from langgraph.config import get_stream_writer
+
+        return get_stream_writer()
+    except Exception:
+        return None
+
+
+class ParallelToolNode:
+    """并发执行模型在同一轮返回的多个工具调用
+
+    - 全局和单个工具分别限制并发数
+    - 每次调用有超时时间，超时后取消调用并返回错误信息给模型
+    - 同步工具放到线程池中执行
+    - 每个工具完成后立即通过 custom 流返回结果，不需要等待其他工具
+
+    Args:
+        tools: 可调用的工具列表
+        max_concurrency: 同时执行的工具调用总数上限
+        per_tool_concurrency: 单个工具同时执行的调用数上限，可以传入 {工具名: 上限} 单独设置
+        timeout: 单次调用的超时时间（秒），0 表示不限制
+    """
+
+    name = "tools"
+
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        max_concurrency: int | None = None,
+        per_tool_concurrency: int | dict[str, int] | None = None,
+        timeout: float | None = None,
+    ):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency or sys_config.agent_tool_max_concurrency
+        self.default_per_tool_limit = sys_config.agent_tool_concurrency_per_tool
+        self.per_tool_limits = {}
+        if isinstance(per_tool_concurrency, dict):
+            self.per_tool_limits = per_tool_concurrency
+        elif per_tool_concurrency:
+            self.default_per_tool_limit = per_tool_concurrency
+        self.timeout = sys_config.agent_tool_timeout if timeout is None else timeout
+        # 信号量绑定事件循环，按循环分别创建，循环结束后释放
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str | None, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self, tool_name: str | None) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            # 等待过的信号量会引用所在的循环，已关闭循环的条目不会被自动回收，这里主动清理
+            for closed_loop in [item for item in self._semaphores.keys() if item.is_closed()]:
+                self._semaphores.pop(closed_loop, None)
+            self._semaphores[loop] = {}
+
+        semaphores = self._semaphores[loop]
+        if tool_name not in semaphores:
+            if tool_name is None:
+                limit = self.max_concurrency
+            else:
+                limit = self.per_tool_limits.get(tool_name, self.default_per_tool_limit)
+            semaphores[tool_name] = asyncio.Semaphore(limit)
+        return semaphores[tool_name]
+
+    async def __call__(self, state: dict, config: RunnableConfig) -> dict:
+        message = next((msg for msg in reversed(state["messages"]) if isinstance(msg, AIMessage)), None)
+        tool_calls = message.tool_calls if message is not None else []
+        if not tool_calls:
+            return {"messages": []}
+
+        writer = _get_stream_writer()
+        results = await asyncio.gather(*(self._run_tool_call(tool_call, config, writer) for tool_call in tool_calls))
+        return {"messages": list(results)}
+
+    async def _run_tool_call(self, tool_call: dict, config: RunnableConfig, writer) -> ToolMessage:
+        result = await self._execute(tool_call, config)
+        # 每个工具结果都带有 id，流式输出时可以据此去重
+        if not result.id:
+            result.id = str(uuid.uuid4())
+        if writer is not None:
+            writer({"tool_message": result, "tool_call_id": tool_call["id"]})
+        return result
+
+    async def _execute(self, tool_call: dict, config: RunnableConfig) -> ToolMessage:
+        name = tool_call["name"]
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            return self._error_message(tool_call, f"工具 {name} 不存在，可用的工具：{', '.join(self.tools_by_name)}")
+
+        call = {**tool_call, "type": "tool_call"}
+        # 先获取单个工具的信号量，等待中的调用不占用全局名额
+        async with self._semaphore(name), self._semaphore(None):
+            try:
+                if _is_async_tool(tool):
+                    invocation = tool.ainvoke(call, config)
+                else:
+                    loop = asyncio.get_running_loop()
+                    invocation = loop.run_in_executor(_sync_tool_executor, functools.partial(tool.invoke, call, config))
+                result = await asyncio.wait_for(invocation, self.timeout or None)
+            except asyncio.TimeoutError:
+                # 协程工具会被取消；线程中的同步工具无法中断，只是不再等待其结果
+                logger.warning(f"Tool {name} timed out after {self.timeout}s")
+                return self._error_message(tool_call, f"工具 {name} 执行超时（{self.timeout} 秒）")
+            except Exception as e:
+                logger.error(f"Tool {name} failed: {e}")
+                return self._error_message(tool_call, f"工具 {name} 执行出错: {e}")
+
+        if isinstance(result, ToolMessage):
+            return result
+        return ToolMessage(content=str(result), name=name, tool_call_id=tool_call["id"])
+
+    @staticmethod
+    def _error_message(tool_call: dict, content: str) -> ToolMessage:
+        return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"], status="error")
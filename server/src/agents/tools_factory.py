@@ -1,5 +1,7 @@
 import json
 import asyncio
+import threading
+from types import MappingProxyType
 from collections.abc import Callable
 from typing import Any
 
@@ -9,6 +11,7 @@ from langchain_core.tools import StructuredTool
 from src import knowledge_base
 from src.utils import logger
 from src.agents.function_tool import _TOOLS_REGISTRY
+from src.agents.tool_cache import tool_result_cache
 
 
 class KnowledgeRetrieverModel(BaseModel):
@@ -20,41 +23,170 @@ class KnowledgeRetrieverModel(BaseModel):
     )
 
 
-def get_all_tools():
-    """获取所有工具"""
-    tools = _TOOLS_REGISTRY.copy()
+class MultiKnowledgeRetrieverModel(KnowledgeRetrieverModel):
+    db_ids: list[str] | None = Field(
+        default=None,
+        description="需要检索的知识库ID列表，为空时检索全部可用的知识库。",
+    )
 
-    # 获取所有知识库
-    for db_Id, retrieve_info in knowledge_base.get_retrievers().items():
-        name = f"retrieve_{db_Id[:8]}"  # Deepseek does not support non-alphanumeric characters in tool names
-        description = (
-            f"使用 {retrieve_info['name']} 知识库进行检索。\n"
-            f"下面是这个知识库的描述：\n{retrieve_info['description']}"
-        )
 
-        # 创建异步工具，确保正确处理异步检索器
-        async def async_retriever_wrapper(query_text: str, db_id=db_Id):
-            """异步检索器包装函数"""
-            retriever = retrieve_info["retriever"]
-            try:
-                if asyncio.iscoroutinefunction(retriever):
-                    result = await retriever(query_text)
-                else:
-                    result = retriever(query_text)
-                return result
-            except Exception as e:
-                logger.error(f"Error in retriever {db_id}: {e}")
-                return f"检索失败: {str(e)}"
-
-        # 使用 StructuredTool.from_function 创建异步工具
-        tools[name] = StructuredTool.from_function(
-            coroutine=async_retriever_wrapper,
-            name=name,
-            description=description,
-            args_schema=KnowledgeRetrieverModel,  # 指定为协程
-        )
+MULTI_RETRIEVER_TOOL_NAME = "retrieve_knowledge_bases"
+
+
+def _retriever_tool_name(db_id: str) -> str:
+    return f"retrieve_{db_id[:8]}"  # Deepseek does not support non-alphanumeric characters in tool names
+
+
+def _invalidate_retriever_results(db_id: str):
+    """知识库内容变化时，清除对应检索工具和多知识库检索工具的缓存结果"""
+    tool_result_cache.invalidate_tools(_retriever_tool_name(db_id), MULTI_RETRIEVER_TOOL_NAME)
+
+
+knowledge_base.retrieval_cache.add_invalidation_listener(_invalidate_retriever_results)
+
+
+def _retriever_description(db_id: str, meta: dict) -> str:
+    return f"使用 {meta['name']} 知识库进行检索。\n下面是这个知识库的描述：\n{meta['description']}"
+
+
+def _build_retriever_tool(db_id: str, name: str, retrieve_info: dict) -> StructuredTool:
+    """创建单个知识库的检索工具，检索器通过参数绑定，避免闭包引用循环变量"""
+    retriever = retrieve_info["retriever"]
+
+    async def async_retriever_wrapper(query_text: str):
+        """异步检索器包装函数"""
+        try:
+            if asyncio.iscoroutinefunction(retriever):
+                result = await retriever(query_text)
+            else:
+                result = retriever(query_text)
+            return result
+        except Exception as e:
+            logger.error(f"Error in retriever {db_id}: {e}")
+            return f"检索失败: {str(e)}"
+
+    return StructuredTool.from_function(
+        coroutine=async_retriever_wrapper,
+        name=name,
+        description=_retriever_description(db_id, retrieve_info),
+        args_schema=KnowledgeRetrieverModel,
+    )
+
+
+def _build_multi_retriever_tool(scope: list[str], databases_meta: dict) -> StructuredTool:
+    kb_desc = "\n".join(
+        f"- {db_id}: {databases_meta[db_id]['name']}，{databases_meta[db_id]['description']}" for db_id in scope
+    )
+    description = f"同时在多个知识库中检索，并返回合并、去重后的结果。\n可用的知识库：\n{kb_desc}"
+
+    async def multi_retriever(query_text: str, db_ids: list[str] | None = None):
+        """并发检索多个知识库"""
+        selected = [db_id for db_id in (db_ids or scope) if db_id in scope] or scope
+        try:
+            return await knowledge_base.aquery_multi(query_text, db_ids=selected)
+        except Exception as e:
+            logger.error(f"Error in multi retriever {selected}: {e}")
+            return f"检索失败: {str(e)}"
+
+    return StructuredTool.from_function(
+        coroutine=multi_retriever,
+        name=MULTI_RETRIEVER_TOOL_NAME,
+        description=description,
+        args_schema=MultiKnowledgeRetrieverModel,
+    )
+
+
+class ToolRegistry:
+    """带版本号的工具注册表
+
+    知识库检索工具按知识库的 (名称, 描述) 缓存，每次获取时只对比元数据，
+    仅为新建、修改过的知识库重新创建工具，并移除已删除知识库的工具。
+    工具集合发生变化时版本号加一，对外提供只读的工具映射。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kb_tools: dict[str, tuple[tuple, StructuredTool]] = {}
+        self._multi_tools: dict[tuple, StructuredTool] = {}
+        self._builtin_key: tuple = ()
+        self._tools: MappingProxyType = MappingProxyType({})
+        self.version = 0
+
+    @staticmethod
+    def _kb_signatures() -> dict[str, tuple]:
+        return {db_id: (meta["name"], meta["description"]) for db_id, meta in knowledge_base.databases_meta.items()}
+
+    def refresh(self) -> MappingProxyType:
+        """与知识库元数据同步，没有变化时直接返回当前的工具映射"""
+        signatures = self._kb_signatures()
+        builtin_key = tuple((name, id(tool)) for name, tool in _TOOLS_REGISTRY.items())
+
+        with self._lock:
+            changed = [db_id for db_id, sig in signatures.items() if self._kb_tools.get(db_id, (None,))[0] != sig]
+            removed = [db_id for db_id in self._kb_tools if db_id not in signatures]
+            if not changed and not removed and builtin_key == self._builtin_key:
+                return self._tools
+
+            retrievers = knowledge_base.get_retrievers() if changed else {}
+            for db_id in removed:
+                del self._kb_tools[db_id]
+            for db_id in changed:
+                tool = tool_result_cache.wrap(_build_retriever_tool(db_id, _retriever_tool_name(db_id), retrievers[db_id]))
+                self._kb_tools[db_id] = (signatures[db_id], tool)
+            if changed or removed:
+                self._multi_tools.clear()
+
+            # 检索工具创建时已套上缓存层，未变化的知识库沿用同一个工具对象
+            tools = tool_result_cache.wrap_tools(dict(_TOOLS_REGISTRY))
+            tools.update({tool.name: tool for _, tool in self._kb_tools.values()})
+            # 多个知识库时，额外提供一个可并发检索多个知识库的工具
+            if len(signatures) > 1:
+                tools[MULTI_RETRIEVER_TOOL_NAME] = self._get_multi_tool(list(signatures))
+
+            self._builtin_key = builtin_key
+            self._tools = MappingProxyType(tools)
+            self.version += 1
+            logger.debug(f"Tool registry v{self.version}: rebuilt {len(changed)} KB tools, removed {len(removed)}")
+            return self._tools
+
+    def _get_multi_tool(self, scope: list[str]) -> StructuredTool:
+        key = tuple(scope)
+        if key not in self._multi_tools:
+            self._multi_tools[key] = tool_result_cache.wrap(
+                _build_multi_retriever_tool(scope, knowledge_base.databases_meta)
+            )
+        return self._multi_tools[key]
+
+    def get_multi_tool(self, db_ids: list[str] | None = None) -> StructuredTool:
+        self.refresh()
+        with self._lock:
+            scope = [db_id for db_id in (db_ids or self._kb_tools) if db_id in self._kb_tools]
+            return self._get_multi_tool(scope)
+
+    def get(self, name: str):
+        return self.refresh().get(name)
+
+
+tool_registry = ToolRegistry()
+
+
+def get_multi_retriever_tool(db_ids: list[str] | None = None) -> StructuredTool:
+    """获取同时检索多个知识库的工具，同一检索范围的工具会被复用
+
+    Args:
+        db_ids: 工具可检索的知识库范围，为空时为全部知识库
+    """
+    return tool_registry.get_multi_tool(db_ids)
+
+
+def get_all_tools() -> MappingProxyType:
+    """获取所有工具，返回只读映射，只在知识库变化时重新创建检索工具"""
+    return tool_registry.refresh()
+
 
-    return tools
+def get_tool(name: str):
+    """按名称获取工具，不存在时返回 None"""
+    return tool_registry.get(name)
 
 
 class BaseToolOutput:
@@ -1,7 +1,13 @@
 from datetime import datetime, timezone
 import asyncio
 import os
+import json
+import threading
 import traceback
+import weakref
+from collections import OrderedDict
+
+import httpx
 
 from src import config
 from src.utils import logger, get_docker_safe_url
@@ -13,31 +19,98 @@ from langchain_core.messages import AIMessageChunk, ToolMessage
 from pydantic import SecretStr
 
 
-def load_chat_model(provider: str, model: str, **kwargs) -> BaseChatModel:
-    """
-    Load a chat model from provider and model configuration.
-    
-    Args:
-        provider: 模型提供商 (如 "zhipu", "openai", "deepseek" 等)
-        model: 模型名称 (如 "glm-4-plus", "gpt-4", "deepseek-chat" 等)
-        **kwargs: 额外的配置参数，包括：
-            - model_parameters: 模型参数
+# 同一个服务地址的所有模型共享一个 HTTP 连接池
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_MODEL_POOL_SIZE = int(os.getenv("LLM_MODEL_POOL_SIZE", 256))
+
+_http_clients: dict[str, tuple[httpx.Client, httpx.AsyncClient]] = {}
+_model_pool: OrderedDict[tuple, BaseChatModel] = OrderedDict()
+_pool_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """在每个事件循环中分别创建连接池的 AsyncClient
+
+    httpx.AsyncClient 的连接绑定创建时的事件循环，而池中的模型既会在服务主循环中使用，
+    也会在同步代码的 asyncio.run 中使用。这里在每个事件循环中延迟创建各自的客户端，
+    请求转发给当前循环的客户端，已关闭循环的客户端在下次创建时丢弃。
     """
-    model_parameters = kwargs.get("model_parameters", {})
 
-    if provider == "custom":
-        from langchain_openai import ChatOpenAI
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client_kwargs = kwargs
+        self._loop_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _current_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop)
+        if client is None or client.is_closed:
+            for closed_loop in [item for item in self._loop_clients.keys() if item.is_closed()]:
+                self._loop_clients.pop(closed_loop, None)
+            client = self._loop_clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+        return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._current_client().send(request, **kwargs)
+
+    async def aclose(self):
+        """关闭当前事件循环的客户端"""
+        client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+        await super().aclose()
+
+
+def get_http_clients(base_url: str) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """获取服务地址对应的 (同步, 异步) HTTP 客户端，保持长连接，安装了 h2 时启用 HTTP/2"""
+    with _pool_lock:
+        if base_url not in _http_clients:
+            limits = httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            )
+            timeout = httpx.Timeout(600, connect=10)
+            http2 = _http2_available()
+            _http_clients[base_url] = (
+                httpx.Client(limits=limits, timeout=timeout, http2=http2),
+                LoopLocalAsyncClient(limits=limits, timeout=timeout, http2=http2),
+            )
+            logger.debug(f"Created HTTP client for {base_url} (http2={http2})")
+        return _http_clients[base_url]
+
 
+async def aclose_http_clients():
+    """关闭共享的 HTTP 客户端，在服务退出时调用"""
+    with _pool_lock:
+        clients = list(_http_clients.values())
+        _http_clients.clear()
+        _model_pool.clear()
+    for client, async_client in clients:
+        client.close()
+        await async_client.aclose()
+
+
+def _resolve_model(provider: str, model: str) -> tuple[str, str, str]:
+    """解析模型的 (模型名称, api_key, base_url)"""
+    if provider == "custom":
         model_info = get_custom_model(model)
         api_key = model_info.get("api_key") or "custom_model"
         base_url = get_docker_safe_url(model_info["api_base"])
         model_name = model_info.get("name") or "custom_model"
-        return ChatOpenAI(
-            model=model_name,
-            api_key=SecretStr(api_key),
-            base_url=base_url,
-            **model_parameters
-        )
+        return model_name, api_key, base_url
 
     model_info = config.model_names.get(provider, None)
     if model_info is None:
@@ -48,7 +121,12 @@ def load_chat_model(provider: str, model: str, **kwargs) -> BaseChatModel:
     if not api_key:
         raise ValueError(f"API key not found for provider {provider}. Please set the {model_info.env[0]} environment variable or configure it in the private config file.")
     
-    base_url = get_docker_safe_url(model_info.base_url)
+    return model, api_key, get_docker_safe_url(model_info.base_url)
+
+
+def _create_chat_model(provider: str, model: str, api_key: str, base_url: str, model_parameters: dict) -> BaseChatModel:
+    http_client, http_async_client = get_http_clients(base_url)
+    client_kwargs = {"http_client": http_client, "http_async_client": http_async_client}
 
     if provider in ["deepseek", "dashscope"]:
         from langchain_deepseek import ChatDeepSeek
@@ -58,6 +136,7 @@ def load_chat_model(provider: str, model: str, **kwargs) -> BaseChatModel:
             api_key=SecretStr(api_key),
             base_url=base_url,
             api_base=base_url,
+            **client_kwargs,
             **model_parameters
         )
 
@@ -68,23 +147,56 @@ def load_chat_model(provider: str, model: str, **kwargs) -> BaseChatModel:
             model=model,
             api_key=SecretStr(api_key),
             base_url=base_url,
+            **client_kwargs,
             **model_parameters
         )
 
     else:
-        try:  # 其他模型，默认使用OpenAIBase, like openai, zhipuai
+        try:  # 其他模型，默认使用OpenAIBase, like openai, zhipuai, custom
             from langchain_openai import ChatOpenAI
 
             return ChatOpenAI(
                 model=model,
                 api_key=SecretStr(api_key),
                 base_url=base_url,
+                **client_kwargs,
                 **model_parameters
             )
         except Exception as e:
             raise ValueError(f"Model provider {provider} load failed, {e} \n {traceback.format_exc()}")
 
 
+def load_chat_model(provider: str, model: str, **kwargs) -> BaseChatModel:
+    """
+    Load a chat model from provider and model configuration.
+
+    相同 (provider, base_url, api_key, 模型参数) 的模型从模型池中复用，
+    同一服务地址的模型共享 HTTP 连接池。模型实例不可修改，绑定工具请使用 bind_tools。
+    
+    Args:
+        provider: 模型提供商 (如 "zhipu", "openai", "deepseek" 等)
+        model: 模型名称 (如 "glm-4-plus", "gpt-4", "deepseek-chat" 等)
+        **kwargs: 额外的配置参数，包括：
+            - model_parameters: 模型参数
+    """
+    model_parameters = kwargs.get("model_parameters") or {}
+    model_name, api_key, base_url = _resolve_model(provider, model)
+
+    key = (provider, model_name, base_url, api_key, json.dumps(model_parameters, sort_keys=True, default=str))
+    with _pool_lock:
+        if (chat_model := _model_pool.get(key)) is not None:
+            _model_pool.move_to_end(key)
+            return chat_model
+
+    chat_model = _create_chat_model(provider, model_name, api_key, base_url, model_parameters)
+    with _pool_lock:
+        chat_model = _model_pool.setdefault(key, chat_model)
+        _model_pool.move_to_end(key)
+        while len(_model_pool) > LLM_MODEL_POOL_SIZE:
+            _model_pool.popitem(last=False)
+    return chat_model
+
+
 async def agent_cli(agent: BaseAgent, config: RunnableConfig | None = None):
     config = config or {}
     if "configurable" not in config:
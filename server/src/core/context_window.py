@@ -0,0 +1,161 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.core.text_splitter import TokenEstimator
+
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# token 数缓存的条目数，以及需要缓存的最短文本长度，更短的文本直接计算
+TOKEN_CACHE_SIZE = 16384
+TOKEN_CACHE_MIN_CHARS = 256
+
+_estimator = TokenEstimator()
+_token_cache: OrderedDict[bytes, int] = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def count_text_tokens(text: str) -> int:
+    """估算文本的 token 数
+
+    长文本的结果按文本摘要缓存（不保留文本本身），历史消息在每轮对话中只需要计算一次。
+    """
+    if not text:
+        return 0
+    if len(text) < TOKEN_CACHE_MIN_CHARS:
+        return int(_estimator.count(text)) + 1
+
+    key = hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    with _token_cache_lock:
+        if (tokens := _token_cache.get(key)) is not None:
+            _token_cache.move_to_end(key)
+            return tokens
+
+    tokens = int(_estimator.count(text)) + 1
+    with _token_cache_lock:
+        _token_cache[key] = tokens
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def _message_role(message) -> str:
+    if isinstance(message, dict):
+        return message.get("role", "")
+    return {"human": "user", "ai": "assistant"}.get(message.type, message.type)
+
+
+def _message_content(message):
+    return message.get("content", "") if isinstance(message, dict) else message.content
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # 多模态消息只统计文本部分
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content or [])
+
+
+def _tool_calls(message) -> list:
+    if isinstance(message, dict):
+        return message.get("tool_calls") or []
+    return getattr(message, "tool_calls", None) or []
+
+
+def count_message_tokens(message) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_text_tokens(_content_text(_message_content(message)))
+    for tool_call in _tool_calls(message):
+        args = tool_call.get("args", tool_call.get("function", {}).get("arguments", ""))
+        tokens += count_text_tokens(tool_call.get("name", "")) + count_text_tokens(
+            args if isinstance(args, str) else json.dumps(args, ensure_ascii=False, sort_keys=True)
+        )
+    return tokens
+
+
+def _replace_content(message, content):
+    if isinstance(message, dict):
+        return {**message, "content": content}
+    return message.model_copy(update={"content": content})
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """保留文本的开头和结尾，截断中间部分"""
+    if count_text_tokens(text) <= max_tokens:
+        return text
+    # 按平均每个字符的 token 数换算保留的字符数
+    keep_chars = max(int(len(text) * max_tokens / count_text_tokens(text)), 1)
+    head, tail = keep_chars * 2 // 3, keep_chars // 3
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n...[已截断 {omitted} 个字符]...\n{text[len(text) - tail:] if tail else ''}"
+
+
+class ContextWindow:
+    """按 token 预算组装发送给模型的历史消息
+
+    - 工具输出超过 max_tool_output_tokens 时截断中间部分
+    - 开头的系统消息总是保留，其余消息以用户消息为界划分为轮次，超出预算时从最早的轮次开始丢弃，
+      同一轮内的工具调用和工具结果总是一起保留或丢弃
+    - 最新的一轮总是保留
+    - 超出预算的轮次直接丢弃，不做摘要
+
+    Args:
+        max_tokens: 历史消息（不含系统提示词）的 token 预算，0 表示不限制
+        max_tool_output_tokens: 单条工具输出的 token 上限，0 表示不截断
+    """
+
+    def __init__(self, max_tokens: int = 0, max_tool_output_tokens: int = 0):
+        self.max_tokens = max_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+
+    @classmethod
+    def for_model(cls, context_window: int, max_output_tokens: int = 0, system_prompt: str = "", **kwargs):
+        """根据模型的上下文窗口计算历史消息的预算，为输出和系统提示词预留空间"""
+        reserved = max_output_tokens + MESSAGE_OVERHEAD_TOKENS + count_text_tokens(system_prompt)
+        return cls(max_tokens=max(context_window - reserved, 1) if context_window > 0 else 0, **kwargs)
+
+    def _truncate_tool_outputs(self, messages):
+        if self.max_tool_output_tokens <= 0:
+            return messages
+        result = []
+        for message in messages:
+            content = _message_content(message)
+            if _message_role(message) == "tool" and isinstance(content, str):
+                truncated = truncate_text(content, self.max_tool_output_tokens)
+                if truncated is not content:
+                    message = _replace_content(message, truncated)
+            result.append(message)
+        return result
+
+    @staticmethod
+    def _split_turns(messages) -> list[list]:
+        turns = []
+        for message in messages:
+            if not turns or _message_role(message) == "user":
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def fit(self, messages: list) -> list:
+        """返回满足预算的消息列表，开头的系统消息总是保留，不修改传入的消息"""
+        messages = self._truncate_tool_outputs(list(messages))
+        if self.max_tokens <= 0:
+            return messages
+
+        num_system = 0
+        while num_system < len(messages) and _message_role(messages[num_system]) == "system":
+            num_system += 1
+        system_messages, messages = messages[:num_system], messages[num_system:]
+
+        turns = self._split_turns(messages)
+        turn_tokens = [sum(count_message_tokens(message) for message in turn) for turn in turns]
+        total = sum(turn_tokens) + sum(count_message_tokens(message) for message in system_messages)
+
+        start = 0
+        while total > self.max_tokens and start < len(turns) - 1:
+            total -= turn_tokens[start]
+            start += 1
+
+        return system_messages + [message for turn in turns[start:] for message in turn]
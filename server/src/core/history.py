@@ -1,4 +1,5 @@
 from src.utils.prompts import get_system_prompt
+from src.core.context_window import ContextWindow
 
 
 class HistoryManager:
@@ -32,14 +33,19 @@ class HistoryManager:
             self.add_ai(content)
             return self.messages
 
-    def get_history_with_msg(self, msg, role="user", max_rounds=None):
-        """Get history with new message, but not append it to history."""
+    def get_history_with_msg(self, msg, role="user", max_rounds=None, max_tokens=None, max_tool_output_tokens=0):
+        """Get history with new message, but not append it to history.
+
+        max_tokens 限制包含新消息在内的总 token 数，超出时丢弃最早的对话轮次，系统提示词总是保留。
+        """
         if max_rounds is None:
             history = self.messages[:]
         else:
             history = self.messages[-(2 * max_rounds) :]
 
         history.append({"role": role, "content": msg})
+        if max_tokens or max_tool_output_tokens:
+            history = ContextWindow(max_tokens or 0, max_tool_output_tokens).fit(history)
         return history
 
     def __str__(self):
@@ -1,8 +1,8 @@
 import os
+import codecs
 import asyncio
 from pathlib import Path
 from langchain.schema.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     TextLoader,
     PyPDFLoader,
@@ -13,6 +13,113 @@ from langchain_community.document_loaders import (
     JSONLoader,
 )
 
+from src.core.text_splitter import FastTextSplitter
+
+
+# 流式切分使用的分隔符，按优先级从高到低
+STREAM_SEPARATORS = ["\n\n", "\n", "。", "！", "？", ".", "；", " "]
+
+
+def _find_chunk_end(buffer, start, chunk_size):
+    """在 [start + chunk_size // 2, start + chunk_size] 范围内寻找优先级最高的分隔符作为块的结尾"""
+    limit = start + chunk_size
+    if limit >= len(buffer):
+        return len(buffer)
+    for sep in STREAM_SEPARATORS:
+        pos = buffer.rfind(sep, start + chunk_size // 2, limit)
+        if pos != -1:
+            return pos + len(sep)
+    return limit
+
+
+def _find_next_start(buffer, start, end, chunk_overlap):
+    """下一个块从 end - chunk_overlap 之后的第一个分隔符处开始，保证重叠部分不截断词语"""
+    next_start = max(end - chunk_overlap, start + 1)
+    for sep in STREAM_SEPARATORS:
+        # 分隔符需要在 end 之前结束，否则下一个块从 end 开始，重叠部分为空
+        pos = buffer.find(sep, next_start, end - 1)
+        if pos != -1:
+            return pos + len(sep)
+    return next_start
+
+
+def iter_file_chunks(file_path, params=None, encoding="utf-8", buffer_size=1024 * 1024):
+    """
+    流式读取文本文件并切分成块，内存占用与文件大小无关
+
+    Args:
+        file_path: 文件路径
+        params: 参数，支持 chunk_size 和 chunk_overlap
+        encoding: 文件编码
+        buffer_size: 每次读取的字节数
+
+    Yields:
+        dict: {"text": 块文本, "metadata": {"chunk_idx", "start_byte", "end_byte", "source"}}
+              start_byte / end_byte 为块在文件中的字节偏移，同一文件多次切分结果一致
+    """
+    params = params or {}
+    chunk_size = int(params.get("chunk_size", 500))
+    chunk_overlap = min(int(params.get("chunk_overlap", 100)), chunk_size // 2)
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    start = 0  # 第一个尚未输出的块在 buffer 中的起始位置
+    start_byte = 0  # buffer[start] 在文件中的字节偏移
+    chunk_idx = 0
+    eof = False
+
+    def byte_len(text):
+        return len(text.encode(encoding, errors="replace"))
+
+    with open(file_path, "rb") as f:
+        while not eof:
+            data = f.read(buffer_size)
+            eof = not data
+            buffer += decoder.decode(data, final=eof)
+
+            # 剩余内容不足一个块时继续读取，保证跨缓冲区边界的切分结果与一次性读取一致
+            while start < len(buffer) and (eof or len(buffer) - start > chunk_size):
+                end = _find_chunk_end(buffer, start, chunk_size)
+                raw = buffer[start:end]
+                text = raw.strip()
+                if text:
+                    chunk_start_byte = start_byte + byte_len(raw[: len(raw) - len(raw.lstrip())])
+                    yield {
+                        "text": text,
+                        "metadata": {
+                            "chunk_idx": chunk_idx,
+                            "start_byte": chunk_start_byte,
+                            "end_byte": chunk_start_byte + byte_len(text),
+                            "source": str(file_path),
+                        },
+                    }
+                    chunk_idx += 1
+
+                if end >= len(buffer) and eof:
+                    start = end
+                    break
+                next_start = _find_next_start(buffer, start, end, chunk_overlap)
+                start_byte += byte_len(buffer[start:next_start])
+                start = next_start
+
+            # 丢弃已经输出的部分，只保留第一个未输出块（含重叠）之后的内容
+            buffer = buffer[start:]
+            start = 0
+
+
+def _get_text_splitter(params):
+    """
+    根据参数创建文本分割器
+
+    chunk_unit 为 "char" 时 chunk_size / chunk_overlap 按字符数计算（默认），
+    为 "token" 时按估算的 token 数计算。
+    """
+    return FastTextSplitter(
+        chunk_size=int(params.get("chunk_size", 500)),
+        chunk_overlap=int(params.get("chunk_overlap", 100)),
+        length_unit=params.get("chunk_unit", "char"),
+    )
+
 
 def chunk_with_parser(file_path, params=None):
     """
@@ -23,16 +130,18 @@ def chunk_with_parser(file_path, params=None):
         params: 参数
     """
     params = params or {}
-    chunk_size = int(params.get("chunk_size", 500))
-    chunk_overlap = int(params.get("chunk_overlap", 100))
 
     file_type = Path(file_path).suffix.lower()
 
-    # 选择合适的加载器
-    if file_type in [".txt"]:
-        loader = TextLoader(file_path)
+    # 纯文本文件流式切分，避免将整个文件读入内存
+    if file_type in [".txt", ".log"]:
+        return [
+            Document(page_content=node["text"], metadata=node["metadata"])
+            for node in iter_file_chunks(file_path, params=params)
+        ]
 
-    elif file_type in [".md"]:
+    # 选择合适的加载器
+    if file_type in [".md"]:
         loader = UnstructuredMarkdownLoader(file_path)
 
     elif file_type in [".docx", ".doc"]:
@@ -53,20 +162,17 @@ def chunk_with_parser(file_path, params=None):
     # 加载文档
     docs = loader.load()
 
-    # 创建文本分割器
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ".", " ", ""],
-    )
+    # 创建文本分割器，按分隔符级别和长度预算切分
+    text_splitter = _get_text_splitter(params)
 
     # 分割文档
-    nodes = text_splitter.split_documents(docs)
+    nodes = []
+    for doc in docs:
+        for text in text_splitter.split_text(doc.page_content):
+            nodes.append(Document(page_content=text, metadata=dict(doc.metadata or {})))
 
     # 添加序号信息到metadata
     for i, node in enumerate(nodes):
-        if node.metadata is None:
-            node.metadata = {}
         node.metadata["chunk_idx"] = i
 
     return nodes
@@ -77,13 +183,9 @@ def chunk_text(text, params=None):
     将文本切分成固定大小的块
     """
     params = params or {}
-    chunk_size = int(params.get("chunk_size", 500))
-    chunk_overlap = int(params.get("chunk_overlap", 100))
 
     # 创建文本分割器
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n\n", "\n", ".", " ", ""]
-    )
+    text_splitter = _get_text_splitter(params)
 
     # 分割文档
     nodes = text_splitter.split_text(text)
@@ -122,11 +224,27 @@ def plainreader(file_path):
     return text
 
 
+def _pdf_parse_mode(params):
+    """PDF 解析模式，hybrid: 文本页直接提取文本，仅对图片页执行 OCR；ocr: 整个文档都执行 OCR
+
+    未指定时 RapidOCR 默认使用 hybrid；MinerU / PaddleX 依赖整个文档的版面信息，默认仍对整个文档执行 OCR，
+    需要混合解析时显式传入 pdf_parse_mode="hybrid"。
+    """
+    if mode := params.get("pdf_parse_mode"):
+        return mode
+    return "hybrid" if params.get("enable_ocr") == "onnx_rapid_ocr" else "ocr"
+
+
 def parse_pdf(file, params=None):
     params = params or {}
     opt_ocr = params.get("enable_ocr", "disable")
 
-    if opt_ocr == "onnx_rapid_ocr":
+    if opt_ocr in ("onnx_rapid_ocr", "mineru_ocr", "paddlex_ocr") and _pdf_parse_mode(params) == "hybrid":
+        from src.plugins import ocr
+
+        return ocr.process_pdf_hybrid(file, engine=opt_ocr)
+
+    elif opt_ocr == "onnx_rapid_ocr":
         from src.plugins import ocr
 
         return ocr.process_pdf(file)
@@ -146,4 +264,13 @@ def parse_pdf(file, params=None):
 
 
 async def parse_pdf_async(file, params=None):
+    params = params or {}
+    opt_ocr = params.get("enable_ocr", "disable")
+
+    if opt_ocr in ("mineru_ocr", "paddlex_ocr"):
+        # 远程 OCR 服务使用异步客户端，不占用线程池
+        from src.plugins import ocr
+
+        return await ocr.aprocess_pdf(file, engine=opt_ocr, hybrid=_pdf_parse_mode(params) == "hybrid")
+
     return await asyncio.to_thread(parse_pdf, file, params=params)
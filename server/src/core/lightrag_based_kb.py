@@ -14,8 +14,15 @@ from lightrag.utils import EmbeddingFunc, setup_logger
 from lightrag.kg.shared_storage import initialize_pipeline_status
 
 from config import config
-from src.utils import logger, hashstr, get_docker_safe_url
+from src.utils import logger, hashstr, hashfile, get_docker_safe_url
 from src.plugins import ocr
+from src.core.retrieval_cache import RetrievalCache
+from src.core.parsing_service import ParsingService
+from src.utils.url_fetcher import AsyncURLFetcher
+
+
+# 影响解析和分块结果的参数，参与内容哈希的计算
+CONTENT_PARAM_KEYS = ("enable_ocr", "pdf_parse_mode", "chunk_size", "chunk_overlap", "chunk_unit")
 
 work_dir = os.path.join(config.storage_dir, "lightrag_data")
 log_dir = os.path.join(work_dir, "logs", "lightrag")
@@ -35,6 +42,12 @@ class LightRagBasedKB:
         # 工作目录
         self.work_dir = os.path.join(config.storage_dir, "lightrag_data")
         os.makedirs(self.work_dir, exist_ok=True)
+        # 检索结果缓存，知识库内容变更时失效
+        self.retrieval_cache = RetrievalCache(maxsize=config.retrieval_cache_size, ttl=config.retrieval_cache_ttl)
+        # 网页抓取器，共享连接池并缓存条件请求
+        self.url_fetcher = AsyncURLFetcher(cache_dir=os.path.join(self.work_dir, "url_cache"))
+        # 文档解析服务，CPU 密集的解析器在独立进程中运行
+        self.parsing_service = ParsingService(timeout=config.parsing_timeout, memory_limit_mb=config.parsing_memory_limit_mb)
 
         # 加载已有的元数据
         self._load_metadata()
@@ -163,7 +176,7 @@ class LightRagBasedKB:
         file_path_obj = Path(file_path)
         file_ext = file_path_obj.suffix.lower()
 
-        if file_ext == ".pdf":
+        if file_ext == ".pdf" and (params or {}).get("enable_ocr", "disable") != "disable":
             # 使用 OCR 处理 PDF
             from src.core.indexing import parse_pdf_async
 
@@ -172,39 +185,22 @@ class LightRagBasedKB:
 
         elif file_ext in [".txt", ".md"]:
             # 直接读取文本文件
-            with open(file_path_obj, encoding="utf-8") as f:
-                content = f.read()
+            content = await asyncio.to_thread(file_path_obj.read_text, encoding="utf-8")
             return f"# {file_path_obj.name}\n\n{content}"
 
-        elif file_ext in [".doc", ".docx"]:
-            # 处理 Word 文档
-
-            from docx import Document  # type: ignore
-
-            doc = Document(file_path_obj)
-            text = "\n".join([para.text for para in doc.paragraphs])
-            return f"# {file_path_obj.name}\n\n{text}"
-
         elif file_ext in [".jpg", ".jpeg", ".png", ".bmp"]:
             # 使用 OCR 处理图片
-            text = ocr.process_image(str(file_path_obj))
+            text = await asyncio.to_thread(ocr.process_image, str(file_path_obj))
             return f"# {file_path_obj.name}\n\n{text}"
 
         else:
-            # 尝试作为文本文件读取
-            import textract  # type: ignore
-
-            text = textract.process(file_path_obj)
+            # PDF 文本提取、Word 文档以及其他格式在解析进程中处理
+            text = await self.parsing_service.parse(str(file_path_obj), params=params)
             return f"# {file_path_obj.name}\n\n{text}"
 
     async def _process_url_to_markdown(self, url: str, params: dict | None = None) -> str:
         """将 URL 转换为 markdown 格式"""
-        import requests
-        from bs4 import BeautifulSoup
-
-        response = requests.get(url, timeout=30)
-        soup = BeautifulSoup(response.content, "html.parser")
-        text_content = soup.get_text()
+        text_content = await self.url_fetcher.fetch_text(url)
         return f"# {url}\n\n{text_content}"
 
     # =============================================================================
@@ -280,6 +276,7 @@ class LightRagBasedKB:
                 del self.instances[db_id]
 
             self._save_metadata()
+            self.retrieval_cache.invalidate(db_id)
 
         # 删除工作目录
         working_dir = os.path.join(self.work_dir, db_id)
@@ -291,8 +288,46 @@ class LightRagBasedKB:
 
         return {"message": "删除成功"}
 
+    @staticmethod
+    def _split_segments(text: str, min_chars: int = 1500, max_chars: int = 6000) -> list[str]:
+        """按内容确定的边界将文本切分为片段
+
+        片段边界只取决于段落自身内容（段落哈希）和累计长度，
+        因此文档局部修改后，未修改部分的片段保持不变，可用于增量更新。
+        """
+        segments, buffer, size = [], [], 0
+        for paragraph in text.split("\n\n"):
+            buffer.append(paragraph)
+            size += len(paragraph) + 2
+            if size >= max_chars or (size >= min_chars and int(hashstr(paragraph, 8), 16) % 4 == 0):
+                segments.append("\n\n".join(buffer))
+                buffer, size = [], 0
+        if buffer and "\n\n".join(buffer).strip():
+            segments.append("\n\n".join(buffer))
+        return segments
+
+    @staticmethod
+    def _content_hash(raw_hash: str, params: dict | None) -> str:
+        """内容哈希包含解析参数，同一文件以不同参数重新添加时会重新处理"""
+        content_params = {key: (params or {}).get(key) for key in CONTENT_PARAM_KEYS if (params or {}).get(key) is not None}
+        if not content_params:
+            return raw_hash
+        return hashstr(f"{raw_hash}:{json.dumps(content_params, sort_keys=True)}")
+
+    def _find_file(self, db_id, item_path):
+        """在知识库中按路径查找已存在的文件记录"""
+        for file_id, file_info in self.files_meta.items():
+            if file_info.get("database_id") == db_id and file_info.get("path") == item_path:
+                return file_id
+        return None
+
     async def add_content(self, db_id, items, params: dict | None = None):
-        """通用的内容添加方法 - 支持文件和URL"""
+        """通用的内容添加方法 - 支持文件和URL
+
+        以路径识别条目，以内容哈希判断变化：同一路径内容未变化的条目直接跳过；
+        内容变化的条目按片段对比，只插入新增片段并删除过期片段。
+        与其他路径内容相同的条目仍然建立自己的记录和片段，删除其中一个不影响另一个。
+        """
         if db_id not in self.databases_meta:
             raise ValueError(f"Database {db_id} not found")
 
@@ -304,62 +339,124 @@ class LightRagBasedKB:
 
         processed_items_info = []
 
-        for item in items:
-            # 根据内容类型生成不同的ID和文件名
-            if content_type == "file":
-                file_path = Path(item)
-                file_id = f"file_{hashstr(str(file_path) + str(time.time()), 6)}"
-                file_type = file_path.suffix.lower().replace(".", "")
-                filename = file_path.name
-                item_path = str(file_path)
-            else:  # URL
-                file_id = f"url_{hashstr(item + str(time.time()), 6)}"
-                file_type = "url"
-                filename = f"webpage_{hashstr(item, 6)}.md"
-                item_path = item
-
-            # 添加文件记录
-            file_record = {
-                "database_id": db_id,
-                "filename": filename,
-                "path": item_path,
-                "file_type": file_type,
-                "status": "processing",
-                "created_at": time.time(),
-            }
-            self.files_meta[file_id] = file_record
-            self._save_metadata()
+        # URL 先并发抓取（抓取器内部按域名限流），再按顺序写入 LightRAG
+        url_tasks = {}
+        if content_type == "url":
+            url_tasks = {url: asyncio.ensure_future(self._process_url_to_markdown(url, params=params)) for url in dict.fromkeys(items)}
 
-            # 添加 file_id 到返回数据
-            file_record = file_record.copy()
-            file_record["file_id"] = file_id
-
-            try:
-                # 根据内容类型处理内容
+        try:
+            for item in items:
+                # 根据内容类型生成不同的ID和文件名
                 if content_type == "file":
-                    markdown_content = await self._process_file_to_markdown(item, params=params)
-                    newline = "\n"
-                    logger.info(f"Markdown content: {markdown_content[:100].replace(newline, ' ')}...")
+                    file_path = Path(item)
+                    file_type = file_path.suffix.lower().replace(".", "")
+                    filename = file_path.name
+                    item_path = str(file_path)
                 else:  # URL
-                    markdown_content = await self._process_url_to_markdown(item, params=params)
-
-                # 使用 LightRAG 插入内容
-                await rag.ainsert(input=markdown_content, ids=file_id, file_paths=item_path)
-
-                logger.info(f"Inserted {content_type} {item} into LightRAG. Done.")
-
-                # 更新状态为完成
-                self.files_meta[file_id]["status"] = "done"
-                self._save_metadata()
-                file_record["status"] = "done"
-
-            except Exception as e:
-                logger.error(f"处理{content_type} {item} 失败: {e}, {traceback.format_exc()}")
-                self.files_meta[file_id]["status"] = "failed"
-                self._save_metadata()
-                file_record["status"] = "failed"
+                    file_type = "url"
+                    filename = f"webpage_{hashstr(item, 6)}.md"
+                    item_path = item
+
+                # 同一路径的条目复用原有的 file_id
+                file_id = self._find_file(db_id, item_path=item_path)
+                previous = self.files_meta.get(file_id, {}).copy() if file_id else {}
+                if file_id is None:
+                    prefix = "file" if content_type == "file" else "url"
+                    file_id = f"{prefix}_{hashstr(item_path + str(time.time()), 6)}"
+
+                # 添加文件记录
+                file_record = previous | {
+                    "database_id": db_id,
+                    "filename": filename,
+                    "path": item_path,
+                    "file_type": file_type,
+                    "status": "processing",
+                    "created_at": previous.get("created_at", time.time()),
+                }
 
-            processed_items_info.append(file_record)
+                try:
+                    markdown_content = None
+                    if content_type == "file":
+                        content_hash = self._content_hash(await asyncio.to_thread(hashfile, item), params)
+                    else:  # URL
+                        markdown_content = await url_tasks[item]
+                        content_hash = self._content_hash(hashstr(markdown_content), params)
+
+                    # 同一路径的内容未变化，跳过处理
+                    if previous.get("content_hash") == content_hash and previous.get("status") == "done":
+                        logger.info(f"Content of {content_type} {item} unchanged, skipped.")
+                        processed_items_info.append(previous | {"file_id": file_id, "unchanged": True})
+                        continue
+
+                    self.files_meta[file_id] = file_record
+                    self._save_metadata()
+
+                    # 根据内容类型处理内容
+                    if markdown_content is None:
+                        markdown_content = await self._process_file_to_markdown(item, params=params)
+                        newline = "\n"
+                        logger.info(f"Markdown content: {markdown_content[:100].replace(newline, ' ')}...")
+
+                    # 按片段对比新旧内容，片段 ID 由内容决定
+                    segments = {f"{file_id}-{hashstr(segment, 12)}": segment for segment in self._split_segments(markdown_content)}
+                    old_segments = previous.get("segments")
+                    if old_segments is None and previous:
+                        # 旧版本记录整篇文档作为一个 LightRAG 文档存储
+                        stale_segments = [file_id]
+                        old_segments = []
+                    elif previous.get("status") != "done":
+                        # 上次处理失败，记录的片段可能只插入了一部分，全部删除后重新插入
+                        for seg_id in old_segments or []:
+                            await rag.adelete_by_doc_id(seg_id)
+                        old_segments, stale_segments = [], []
+                    else:
+                        old_segments = old_segments or []
+                        stale_segments = [seg_id for seg_id in old_segments if seg_id not in segments]
+                    new_segments = {seg_id: seg for seg_id, seg in segments.items() if seg_id not in old_segments}
+
+                    # 插入前先记录所有可能存在于 LightRAG 中的片段，中途失败时仍可以删除
+                    self.files_meta[file_id]["segments"] = list(dict.fromkeys([*old_segments, *stale_segments, *new_segments]))
+                    self._save_metadata()
+
+                    # 使用 LightRAG 插入新增片段，并删除过期片段
+                    if new_segments:
+                        await rag.ainsert(
+                            input=list(new_segments.values()),
+                            ids=list(new_segments.keys()),
+                            file_paths=[item_path] * len(new_segments),
+                        )
+                    for seg_id in stale_segments:
+                        await rag.adelete_by_doc_id(seg_id)
+
+                    logger.info(
+                        f"Inserted {content_type} {item} into LightRAG: {len(new_segments)} new segments, "
+                        f"{len(stale_segments)} stale segments removed, {len(segments)} in total. Done."
+                    )
+
+                    # 更新状态为完成
+                    self.files_meta[file_id].update({"status": "done", "content_hash": content_hash, "segments": list(segments)})
+                    self._save_metadata()
+
+                except Exception as e:
+                    logger.error(f"处理{content_type} {item} 失败: {e}, {traceback.format_exc()}")
+                    # 保留已记录的片段，删除文件或重新添加时可以清理
+                    self.files_meta[file_id] = self.files_meta.get(file_id, file_record) | {"status": "failed"}
+                    self._save_metadata()
+
+                # 知识库内容已变化，清除该库的检索缓存
+                self.retrieval_cache.invalidate(db_id)
+
+                # 添加 file_id 到返回数据
+                file_record = self.files_meta[file_id].copy()
+                file_record["file_id"] = file_id
+                processed_items_info.append(file_record)
+
+        finally:
+            # 中途退出时取消尚未使用的抓取任务，并取回所有任务的结果，避免遗留未等待的任务
+            for task in url_tasks.values():
+                task.cancel()
+            if url_tasks:
+                await asyncio.gather(*url_tasks.values(), return_exceptions=True)
 
         return processed_items_info
 
@@ -395,10 +492,12 @@ class LightRagBasedKB:
         rag = await self._get_lightrag_instance(db_id)
         if rag:
             try:
-                # 使用 LightRAG 删除文档
-                await rag.adelete_by_doc_id(file_id)
+                # 使用 LightRAG 删除文档（按片段存储的文件需要逐个删除片段）
+                for doc_id in self.files_meta.get(file_id, {}).get("segments") or [file_id]:
+                    await rag.adelete_by_doc_id(doc_id)
             except Exception as e:
                 logger.error(f"Error deleting file {file_id} from LightRAG: {e}")
+            self.retrieval_cache.invalidate(db_id)
 
         # 删除文件记录
         if file_id in self.files_meta:
@@ -418,16 +517,17 @@ class LightRagBasedKB:
                 assert hasattr(rag.text_chunks, "get_all"), "text_chunks does not have get_all method"
                 all_chunks = await rag.text_chunks.get_all()  # type: ignore
 
-                # 筛选属于该文档的 chunks
+                # 筛选属于该文档的 chunks（文件可能按片段拆分为多个 LightRAG 文档）
+                doc_ids = {doc_id: idx for idx, doc_id in enumerate(self.files_meta[file_id].get("segments") or [file_id])}
                 doc_chunks = []
                 for chunk_id, chunk_data in all_chunks.items():
-                    if isinstance(chunk_data, dict) and chunk_data.get("full_doc_id") == file_id:
+                    if isinstance(chunk_data, dict) and chunk_data.get("full_doc_id") in doc_ids:
                         chunk_data["id"] = chunk_id
                         chunk_data["content_vector"] = []
                         doc_chunks.append(chunk_data)
 
-                # 按 chunk_order_index 排序
-                doc_chunks.sort(key=lambda x: x.get("chunk_order_index", 0))
+                # 按片段顺序和 chunk_order_index 排序
+                doc_chunks.sort(key=lambda x: (doc_ids[x["full_doc_id"]], x.get("chunk_order_index", 0)))
                 # logger.debug(f"All chunks: {doc_chunks}")
                 return {"lines": doc_chunks}
 
@@ -467,31 +567,92 @@ class LightRagBasedKB:
         logger.warning("query is deprecated, use aquery instead")
         return asyncio.run(self.aquery(query_text, db_id, **kwargs))
 
-    async def aquery(self, query_text, db_id, **kwargs):
+    async def aquery(self, query_text, db_id, use_cache=True, **kwargs):
         """查询知识库 - 用于检索器"""
+        # 设置查询参数
+        params_dict = {
+            "mode": "mix",
+            "only_need_context": True,
+            "top_k": 10,
+        } | kwargs
+
+        use_cache = use_cache and config.retrieval_cache_ttl > 0
+        # 查询期间知识库发生变化时，过期的结果不写入缓存
+        generation = self.retrieval_cache.generation(db_id)
+        if use_cache:
+            cached = self.retrieval_cache.get(db_id, query_text, params_dict)
+            if cached is not None:
+                logger.debug(f"Retrieval cache hit for {db_id}: {query_text}")
+                return cached
+
         rag = await self._get_lightrag_instance(db_id)
         if not rag:
             raise ValueError(f"Database {db_id} not found")
 
         try:
-            # 设置查询参数
-            params_dict = {
-                "mode": "mix",
-                "only_need_context": True,
-                "top_k": 10,
-            } | kwargs
             param = QueryParam(**params_dict)
 
             # 执行查询
             response = await rag.aquery(query_text, param)
             logger.debug(f"Query response: {response}")
 
+            if use_cache and response:
+                self.retrieval_cache.set(db_id, query_text, params_dict, response, generation=generation)
             return response
 
         except Exception as e:
             logger.error(f"Query error: {e}, {traceback.format_exc()}")
             return ""
 
+    async def aquery_multi(self, query_text, db_ids=None, timeout=20, rerank=None, max_chars=12000, **kwargs):
+        """并发查询多个知识库，合并去重（可选重排序）后返回一个预算内的上下文
+
+        Args:
+            query_text: 查询文本
+            db_ids: 需要查询的知识库 ID 列表，为空时查询全部知识库
+            timeout: 单个知识库的查询超时时间（秒）
+            rerank: 是否使用重排序模型，默认跟随 config.enable_reranker
+            max_chars: 返回上下文的最大字符数
+        """
+        from src.core.retrieval_merge import parse_context, interleave, dedupe_entries, render_context
+
+        db_ids = [db_id for db_id in (db_ids or self.databases_meta.keys()) if db_id in self.databases_meta]
+        if not db_ids:
+            return ""
+
+        async def query_one(db_id):
+            try:
+                return db_id, await asyncio.wait_for(self.aquery(query_text, db_id, **kwargs), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Query {db_id} timed out after {timeout}s")
+            except Exception as e:
+                logger.error(f"Query {db_id} failed: {e}")
+            return db_id, ""
+
+        results = await asyncio.gather(*[query_one(db_id) for db_id in db_ids])
+
+        groups = [parse_context(context, source=self.databases_meta[db_id]["name"]) for db_id, context in results]
+        entries = dedupe_entries(interleave(groups))
+
+        rerank = config.enable_reranker if rerank is None else rerank
+        if rerank and len(entries) > 1:
+            try:
+                from src.models.rerank_model import get_reranker
+
+                reranker = get_reranker(config.reranker)
+                texts = [entry["text"] for entry in entries]
+                scores = await asyncio.to_thread(reranker.compute_score, [query_text, texts], normalize=True)
+                ranked = sorted(zip(scores, range(len(entries))), key=lambda x: x[0], reverse=True)
+                entries = [entries[idx] for _, idx in ranked]
+            except Exception as e:
+                logger.error(f"Rerank failed, fallback to original order: {e}")
+
+        return render_context(entries, max_chars=max_chars)
+
+    def get_retrieval_cache_stats(self):
+        """获取检索缓存的命中率等统计信息"""
+        return self.retrieval_cache.stats()
+
     def get_retrievers(self):
         """获取所有检索器 - 用于工具系统"""
         retrievers = {}
@@ -0,0 +1,124 @@
+import os
+import asyncio
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from src.utils import logger
+
+# 解析进程的入口不依赖 src 包，forkserver 只预加载该模块，子进程不会创建知识库等对象
+from workers.parsing_worker import _parse_worker
+
+
+# 每种文件格式同时运行的解析进程数上限
+DEFAULT_FORMAT_LIMITS = {"pdf": 2, "word": 2, "other": 2}
+
+
+def _format_key(file_path: str) -> str:
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext == ".pdf":
+        return "pdf"
+    if file_ext in [".doc", ".docx"]:
+        return "word"
+    return "other"
+
+
+def _reap(process) -> None:
+    """等待已结束的子进程退出并释放其资源"""
+    process.join()
+    process.close()
+
+
+class ParsingError(RuntimeError):
+    pass
+
+
+class ParsingService:
+    """文档解析服务
+
+    每个解析任务在独立的子进程中运行，不占用 API 进程的 GIL：
+    - 按文件格式限制并发的解析进程数
+    - 超时后直接结束子进程，避免卡死的解析器拖住任务
+    - 通过 RLIMIT_AS 限制子进程内存
+    - 解析结果通过临时文件返回，不经过进程间管道
+
+    解析进程不复用：超时或超出内存上限时需要结束整个进程，解析器泄漏的内存也随进程释放。
+    子进程由只预加载了 workers.parsing_worker 的 forkserver 创建，启动开销为毫秒级。
+    """
+
+    def __init__(
+        self,
+        timeout: float = 600,
+        memory_limit_mb: int = 2048,
+        format_limits: dict[str, int] | None = None,
+        tmp_dir: str | None = None,
+    ):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.format_limits = DEFAULT_FORMAT_LIMITS | (format_limits or {})
+        self.tmp_dir = tmp_dir
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+        # forkserver 只在启动时启动一个服务进程，之后由它 fork 解析进程，
+        # 既避免从多线程的 API 进程直接 fork，又比 spawn 启动更快
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._mp_context = multiprocessing.get_context(method)
+        if method == "forkserver":
+            self._mp_context.set_forkserver_preload(["workers.parsing_worker"])
+
+    def _semaphore(self, format_key: str) -> asyncio.Semaphore:
+        if format_key not in self._semaphores:
+            limit = self.format_limits.get(format_key, self.format_limits["other"])
+            self._semaphores[format_key] = asyncio.Semaphore(limit)
+        return self._semaphores[format_key]
+
+    async def parse(self, file_path: str, params: dict | None = None) -> str:
+        """在子进程中解析文件并返回文本"""
+        format_key = _format_key(file_path)
+        async with self._semaphore(format_key):
+            fd, output_path = tempfile.mkstemp(prefix="parse_", suffix=".txt", dir=self.tmp_dir)
+            os.close(fd)
+            try:
+                return await self._run(file_path, params, output_path)
+            finally:
+                for path in (output_path, f"{output_path}.err"):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    async def _run(self, file_path: str, params: dict | None, output_path: str) -> str:
+        process = self._mp_context.Process(
+            target=_parse_worker,
+            args=(file_path, params, output_path, self.memory_limit_mb),
+            name=f"parse-{Path(file_path).name}",
+        )
+        process.start()
+        join_task = asyncio.ensure_future(asyncio.to_thread(process.join, self.timeout))
+        try:
+            await asyncio.shield(join_task)
+        except asyncio.CancelledError:
+            # 任务被取消时结束子进程，后台的 join 返回后再回收，避免留下僵尸进程
+            process.kill()
+            join_task.add_done_callback(lambda _: _reap(process))
+            raise
+
+        timed_out = process.is_alive()
+        if timed_out:
+            process.kill()
+            await asyncio.to_thread(process.join)
+        exitcode = process.exitcode
+        process.close()
+
+        if timed_out:
+            raise ParsingError(f"Parsing {file_path} timed out after {self.timeout}s")
+
+        if exitcode != 0:
+            error = f"exit code {exitcode}"
+            if os.path.exists(f"{output_path}.err"):
+                with open(f"{output_path}.err", encoding="utf-8") as f:
+                    error = f.read()
+            elif exitcode < 0:
+                error = f"killed by signal {-exitcode}, possibly exceeded the memory limit"
+            logger.error(f"Failed to parse {file_path}: {error}")
+            raise ParsingError(f"Failed to parse {file_path}: {error.splitlines()[0]}")
+
+        return await asyncio.to_thread(Path(output_path).read_text, encoding="utf-8")
@@ -0,0 +1,79 @@
+import re
+import json
+import threading
+
+from src.utils.cache import TTLCache
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query_text: str) -> str:
+    """规范化查询文本：去除首尾空白、合并连续空白、统一大小写"""
+    return _WHITESPACE_RE.sub(" ", str(query_text)).strip().casefold()
+
+
+def _freeze_params(params: dict) -> str:
+    """将查询参数转为稳定的字符串，作为缓存键的一部分"""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class RetrievalCache:
+    """知识库检索结果缓存
+
+    缓存键为 (db_id, 规范化后的查询, 查询参数)，知识库内容变化时按 db_id 失效，
+    并通知通过 add_invalidation_listener 注册的其他缓存（如工具调用结果缓存）。
+
+    每个知识库维护一个版本号，失效时加一。查询开始时记录版本号，写入时版本号已变化说明
+    查询期间知识库内容发生了变化，结果不再写入缓存。
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.invalidations = 0
+        self.stale_writes = 0
+        self._listeners = []
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_invalidation_listener(self, callback) -> None:
+        """注册失效回调，知识库缓存失效时以 callback(db_id) 调用"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    @staticmethod
+    def make_key(db_id: str, query_text: str, params: dict) -> tuple[str, str, str]:
+        return (db_id, normalize_query(query_text), _freeze_params(params))
+
+    def get(self, db_id: str, query_text: str, params: dict):
+        return self._cache.get(self.make_key(db_id, query_text, params))
+
+    def generation(self, db_id: str) -> int:
+        """知识库当前的缓存版本号，查询开始时获取，写入缓存时传给 set"""
+        return self._generations.get(db_id, 0)
+
+    def set(self, db_id: str, query_text: str, params: dict, response, generation: int | None = None) -> bool:
+        """写入缓存，generation 与当前版本号不一致时放弃写入并返回 False"""
+        key = self.make_key(db_id, query_text, params)
+        with self._lock:
+            if generation is not None and generation != self.generation(db_id):
+                self.stale_writes += 1
+                return False
+            self._cache.set(key, response)
+        return True
+
+    def invalidate(self, db_id: str) -> int:
+        """清除某个知识库的全部缓存"""
+        with self._lock:
+            self.invalidations += 1
+            self._generations[db_id] = self.generation(db_id) + 1
+            removed = self._cache.invalidate(lambda key: key[0] == db_id)
+        for callback in self._listeners:
+            callback(db_id)
+        return removed
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats() | {"invalidations": self.invalidations, "stale_writes": self.stale_writes}
@@ -0,0 +1,100 @@
+import re
+import json
+
+from src.utils import hashstr
+from src.core.retrieval_cache import normalize_query
+
+
+# LightRAG 上下文中以 ```json ... ``` 包裹的各个分区
+_SECTION_RE = re.compile(r"-----(?P<title>[^\n]+?)-----\s*```json\s*(?P<body>.*?)\s*```", re.S)
+# 不同知识库之间不可比较、合并时需要忽略的字段
+_VOLATILE_KEYS = {"id", "rank", "created_at", "weight"}
+_DEFAULT_SECTION = "Context"
+
+
+def _item_text(item) -> str:
+    """获取条目用于去重和重排序的文本"""
+    if not isinstance(item, dict):
+        return str(item)
+    if "content" in item:
+        return str(item["content"])
+    if "entity1" in item:
+        return f"{item.get('entity1')} -> {item.get('entity2')}: {item.get('description', '')}"
+    if "entity" in item:
+        return f"{item.get('entity')}: {item.get('description', '')}"
+    return json.dumps({k: v for k, v in item.items() if k not in _VOLATILE_KEYS}, ensure_ascii=False)
+
+
+def parse_context(context: str, source: str) -> list[dict]:
+    """将 LightRAG 返回的上下文拆分为条目
+
+    Returns:
+        list[dict]: 每个条目包含 section、text、data 和 source
+    """
+    if not context:
+        return []
+
+    entries = []
+    sections = list(_SECTION_RE.finditer(context))
+    for match in sections:
+        try:
+            items = json.loads(match.group("body"))
+        except json.JSONDecodeError:
+            items = [match.group("body")]
+
+        for item in items if isinstance(items, list) else [items]:
+            if isinstance(item, dict):
+                item = {k: v for k, v in item.items() if k not in _VOLATILE_KEYS}
+            entries.append({"section": match.group("title").strip(), "text": _item_text(item), "data": item, "source": source})
+
+    if not sections:
+        # 非结构化上下文，按段落拆分
+        for paragraph in re.split(r"\n\s*\n", context):
+            if paragraph.strip():
+                entries.append({"section": _DEFAULT_SECTION, "text": paragraph.strip(), "data": paragraph.strip(), "source": source})
+
+    return entries
+
+
+def interleave(groups: list[list[dict]]) -> list[dict]:
+    """轮流从各个知识库的结果中取条目，避免预算被第一个知识库占满"""
+    result = []
+    for idx in range(max((len(group) for group in groups), default=0)):
+        result.extend(group[idx] for group in groups if idx < len(group))
+    return result
+
+
+def dedupe_entries(entries: list[dict]) -> list[dict]:
+    """按规范化后的文本去重，保留首次出现的条目"""
+    seen = set()
+    result = []
+    for entry in entries:
+        key = (entry["section"], hashstr(normalize_query(entry["text"])))
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(entry)
+    return result
+
+
+def render_context(entries: list[dict], max_chars: int | None = None) -> str:
+    """按顺序在字符预算内选取条目，并按分区重新组装上下文"""
+    grouped: dict[str, list] = {}
+    used = 0
+    for entry in entries:
+        data = entry["data"]
+        if isinstance(data, dict):
+            data = data | {"knowledge_base": entry["source"]}
+        else:
+            data = {"content": data, "knowledge_base": entry["source"]}
+
+        size = len(json.dumps(data, ensure_ascii=False))
+        if max_chars and used + size > max_chars:
+            continue
+        used += size
+        grouped.setdefault(entry["section"], []).append(data)
+
+    blocks = []
+    for section, items in grouped.items():
+        blocks.append(f"-----{section}-----\n\n```json\n{json.dumps(items, ensure_ascii=False)}\n```")
+    return "\n\n".join(blocks)
@@ -0,0 +1,188 @@
+import re
+import bisect
+
+import numpy as np
+
+
+# 分隔符按优先级分级，级别越小越优先作为切分点
+# 0: 段落  1: 换行  2: 句末标点（含中文 。！？）  3: 分句标点  4: 空白
+_NO_SEPARATOR = 5
+_PARAGRAPH_RE = re.compile(r"\n[ \t\r\f\v]*\n")
+
+# 字符类别查找表，用一次数组索引代替多次 np.isin
+_C_OTHER, _C_SPACE, _C_CLAUSE, _C_SENTENCE, _C_CLOSING, _C_NEWLINE, _C_DOT, _C_CR = range(8)
+_CHAR_CLASSES = np.zeros(0x10000, dtype=np.uint8)
+for _chars, _cls in (
+    (" \t", _C_SPACE),
+    ("；;，,、：:", _C_CLAUSE),
+    ("。！？!?…", _C_SENTENCE),
+    ("”’」』）)", _C_CLOSING),
+    ("\n", _C_NEWLINE),
+    (".", _C_DOT),
+    ("\r", _C_CR),
+):
+    _CHAR_CLASSES[[ord(char) for char in _chars]] = _cls
+
+# CJK 字符、全角符号、日文假名和韩文的码位区间
+_CJK_RANGES = (
+    (0x2E80, 0x9FFF),
+    (0xAC00, 0xD7AF),
+    (0xF900, 0xFAFF),
+    (0xFF00, 0xFFEF),
+    (0x20000, 0x2FA1F),
+)
+
+
+def _codepoints(text: str) -> np.ndarray:
+    # surrogatepass 保留单独的代理字符（例如截断的 emoji），每个字符仍对应一个码位
+    return np.frombuffer(text.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+
+
+def _cjk_mask(codepoints: np.ndarray) -> np.ndarray:
+    mask = np.zeros(len(codepoints), dtype=bool)
+    for low, high in _CJK_RANGES:
+        mask |= (codepoints >= low) & (codepoints <= high)
+    return mask
+
+
+class TokenEstimator:
+    """按字符类别估算 token 数
+
+    CJK 字符与其他字符分别对应一个权重，可以按所用 embedding 模型的 tokenizer 调整。
+    默认权重接近常见中文 embedding 模型（一个汉字约一个 token，英文约 4 个字符一个 token）。
+    """
+
+    def __init__(self, cjk_weight: float = 1.0, other_weight: float = 0.3):
+        self.cjk_weight = cjk_weight
+        self.other_weight = other_weight
+
+    def char_weights(self, text: str) -> np.ndarray:
+        return np.where(_cjk_mask(_codepoints(text)), self.cjk_weight, self.other_weight)
+
+    def count(self, text: str) -> float:
+        return float(self.char_weights(text).sum())
+
+
+class FastTextSplitter:
+    """基于分隔符位置的快速文本切分器
+
+    一次正则扫描得到全部分隔符的位置和级别，再按长度的前缀和贪心地打包块，
+    不需要像 RecursiveCharacterTextSplitter 那样逐级递归、反复扫描文本。
+
+    Args:
+        chunk_size: 每个块的最大长度
+        chunk_overlap: 相邻块的重叠长度
+        length_unit: 长度单位，"char" 按字符数，"token" 按 token 估算
+        estimator: token 估算器，length_unit 为 "token" 时使用，未指定时使用默认权重
+    """
+
+    def __init__(
+        self,
+        chunk_size=500,
+        chunk_overlap=100,
+        length_unit="char",
+        estimator: TokenEstimator | None = None,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.estimator = estimator or TokenEstimator()
+
+    def _prefix_lengths(self, text: str) -> np.ndarray | None:
+        """prefix[i] 为 text[:i] 的 token 数，按字符计算长度时返回 None"""
+        if self.length_unit != "token":
+            return None
+        prefix = np.zeros(len(text) + 1)
+        np.cumsum(self.estimator.char_weights(text), out=prefix[1:])
+        return prefix
+
+    @staticmethod
+    def _separator_positions(text: str) -> list[list[int]]:
+        """一次向量化扫描得到所有分隔符的结束位置，按级别分组"""
+        codepoints = _codepoints(text)
+        classes = np.where(codepoints < 0x10000, _CHAR_CLASSES[codepoints & 0xFFFF], _C_OTHER)
+        next_classes = np.append(classes[1:], _C_SPACE)
+        prev_classes = np.insert(classes[:-1], 0, _C_OTHER)
+
+        is_sentence = classes == _C_SENTENCE
+        is_closing = (classes == _C_CLOSING) & ((prev_classes == _C_SENTENCE) | (prev_classes == _C_CLOSING))
+        # 连续的句末标点和后引号只在最后一个字符之后切分
+        sentence = (is_sentence | is_closing) & (next_classes != _C_SENTENCE) & (next_classes != _C_CLOSING)
+        # 英文句号后面需要跟空白，避免在小数、缩写中间切分
+        sentence |= (classes == _C_DOT) & ((next_classes == _C_SPACE) | (next_classes == _C_NEWLINE) | (next_classes == _C_CR))
+
+        levels = np.full(len(codepoints), _NO_SEPARATOR, dtype=np.int8)
+        levels[classes == _C_SPACE] = 4
+        levels[classes == _C_CLAUSE] = 3
+        levels[sentence] = 2
+        levels[classes == _C_NEWLINE] = 1
+        for match in _PARAGRAPH_RE.finditer(text):
+            levels[match.end() - 1] = 0
+
+        return [(np.flatnonzero(levels == level) + 1).tolist() for level in range(_NO_SEPARATOR)]
+
+    def _offset(self, prefix, start, length) -> int:
+        """从 start 开始、长度不超过 length 的最远位置"""
+        if prefix is None:
+            return start + int(length)
+        return int(np.searchsorted(prefix, prefix[start] + length, side="right")) - 1
+
+    def split_spans(self, text: str) -> list[tuple[int, int]]:
+        """切分文本，返回每个块在原文中的 (start, end)，已去除首尾空白"""
+        if not text:
+            return []
+
+        prefix = self._prefix_lengths(text)
+        separators = self._separator_positions(text)
+        total = len(text)
+
+        spans = []
+        start = 0
+        while start < total:
+            # 在预算内可以到达的最远位置
+            limit = max(self._offset(prefix, start, self.chunk_size), start + 1)
+
+            end = total if limit >= total else self._find_end(separators, prefix, start, limit)
+
+            chunk_start, chunk_end = start, end
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_end > chunk_start:
+                spans.append((chunk_start, chunk_end))
+
+            if end >= total:
+                break
+            start = self._next_start(separators, prefix, start, end)
+
+        return spans
+
+    def _find_end(self, separators, prefix, start, limit) -> int:
+        """在 [半个预算, 预算] 范围内选择级别最高的最后一个分隔符，没有分隔符时在预算处截断"""
+        lo = max(self._offset(prefix, start, self.chunk_size / 2), start + 1)
+        for positions in separators:
+            idx = bisect.bisect_right(positions, limit) - 1
+            if idx >= 0 and positions[idx] >= lo:
+                return positions[idx]
+        return limit
+
+    def _next_start(self, separators, prefix, start, end) -> int:
+        """下一个块的起点：重叠范围内优先从级别最高的第一个分隔符开始"""
+        if self.chunk_overlap <= 0:
+            return end
+        if prefix is None:
+            overlap_start = end - self.chunk_overlap
+        else:
+            overlap_start = int(np.searchsorted(prefix, prefix[end] - self.chunk_overlap, side="left"))
+        overlap_start = max(overlap_start, start + 1)
+        for positions in separators:
+            idx = bisect.bisect_left(positions, overlap_start)
+            if idx < len(positions) and positions[idx] < end:
+                return positions[idx]
+        return overlap_start
+
+    def split_text(self, text: str) -> list[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
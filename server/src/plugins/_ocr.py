@@ -1,18 +1,25 @@
 import os
-import uuid
-from pathlib import Path
+import asyncio
+import shutil
+import threading
+import multiprocessing
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import fitz  # fitz就是pip install PyMuPDF
-import numpy as np  # Added import for numpy
-from PIL import Image
-from tqdm import tqdm
-from rapidocr_onnxruntime import RapidOCR
+# fitz、numpy、tqdm 以及 OCR 模型均在实际执行 OCR 时才导入，避免拖慢服务启动
+from src.utils import logger, hashstr, extract_pdf_page_texts
+from src.plugins.ocr_cache import OCRCache, page_fingerprint
+from src.plugins.ocr_client import MinerUAPIClient, PaddleXClient, content_list_to_pages, pdf_page_count, write_sub_pdf
+from src.plugins.ocr_registry import ocr_models
 
-from src.utils import logger, is_text_pdf
-
-
-GOLBAL_STATE = {}
+# 进程池 worker 执行的函数不依赖 src 包，spawn 子进程只导入 workers.ocr_worker
+from workers.ocr_worker import (
+    _init_ocr_worker,
+    _iter_rendered_pages,
+    _ocr_page_range,
+    _ocr_result_to_text,
+    _prefetch,
+)
 
 
 class OCRPlugin:
@@ -22,18 +29,78 @@ class OCRPlugin:
         self.ocr = None
         self.det_box_thresh = kwargs.get("det_box_thresh", 0.3)
 
-    def load_model(self):
-        """加载 OCR 模型"""
-        logger.info("加载 OCR 模型，仅在第一次调用时加载")
-        model_dir = os.path.join(os.getenv("MODEL_DIR", ""), "SWHL/RapidOCR")
-        det_model_dir = os.path.join(model_dir, "PP-OCRv4/ch_PP-OCRv4_det_infer.onnx")
-        rec_model_dir = os.path.join(model_dir, "PP-OCRv4/ch_PP-OCRv4_rec_infer.onnx")
-        assert os.path.exists(model_dir), (
-            f"模型文件不存在，请下载 SWHL/RapidOCR 到 {model_dir}，"
-            "并确认是否在 docker-compose.dev.yml 中添加 MODEL_DIR 环境变量"
+        # 页面级并行 OCR 配置：worker 数量 * 每个 worker 的 intra-op 线程数 不应超过 CPU 核数
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = int(kwargs.get("num_workers", os.getenv("OCR_NUM_WORKERS", min(4, cpu_count))))
+        self.intra_op_num_threads = int(
+            kwargs.get("intra_op_num_threads", os.getenv("OCR_INTRA_OP_THREADS", max(1, cpu_count // max(1, self.num_workers))))
         )
-        self.ocr = RapidOCR(det_box_thresh=0.3, det_model_path=det_model_dir, rec_model_path=rec_model_dir)
-        logger.info(f"OCR Plugin for det_box_thresh = {self.det_box_thresh} loaded.")
+        self.inter_op_num_threads = int(kwargs.get("inter_op_num_threads", os.getenv("OCR_INTER_OP_THREADS", 1)))
+        self.pages_per_task = int(kwargs.get("pages_per_task", os.getenv("OCR_PAGES_PER_TASK", 2)))
+        self.render_dpi = int(kwargs.get("render_dpi", os.getenv("OCR_RENDER_DPI", 144)))
+        self._pool = None
+
+        # OCR 结果缓存，默认位于 storage_dir/ocr_cache
+        self.cache_dir = kwargs.get("cache_dir", os.getenv("OCR_CACHE_DIR"))
+        self.cache_size_mb = int(kwargs.get("cache_size_mb", os.getenv("OCR_CACHE_SIZE_MB", 2048)))
+        self._cache = None
+
+        # 远程 OCR 服务（PaddleX / MinerU API）的请求拆分与并发配置，
+        # 默认整个文档在一个请求中发送，保留跨页的版面信息；大于 0 时按页数拆分为多个请求并发发送
+        self.service_pages_per_request = int(
+            kwargs.get("service_pages_per_request", os.getenv("OCR_SERVICE_PAGES_PER_REQUEST", 0))
+        )
+        self.service_concurrency = int(kwargs.get("service_concurrency", os.getenv("OCR_SERVICE_CONCURRENCY", 4)))
+        self._service_clients = {}
+
+    def load_model(self):
+        """加载 OCR 模型，同一进程内的模型由 ocr_models 共享，只在第一次调用时加载"""
+        self.ocr = ocr_models.get("rapid_ocr", det_box_thresh=self.det_box_thresh)
+
+    def preload(self, background=True):
+        """按 OCR_PRELOAD 环境变量预加载模型（逗号分隔，例如 OCR_PRELOAD=rapid_ocr），并启动 OCR 进程池"""
+        names = [name.strip() for name in os.getenv("OCR_PRELOAD", "").split(",") if name.strip()]
+        if "rapid_ocr" not in names:
+            return ocr_models.preload(names, background=background)
+
+        def warmup():
+            try:
+                self.load_model()
+                if self.num_workers > 1:
+                    # 每个 worker 进程在初始化时加载一次模型
+                    pool = self._get_pool()
+                    for future in [pool.submit(os.getpid) for _ in range(self.num_workers)]:
+                        future.result()
+                logger.info("OCR models preloaded.")
+            except Exception as e:
+                logger.error(f"Failed to preload OCR models: {e}")
+
+        if not background:
+            return warmup()
+        thread = threading.Thread(target=warmup, name="ocr-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def _get_pool(self):
+        """获取 OCR 进程池，worker 进程常驻以复用已加载的模型"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker,
+                initargs=(self.det_box_thresh, self.intra_op_num_threads, self.inter_op_num_threads),
+            )
+            logger.info(
+                f"OCR process pool started: {self.num_workers} workers, "
+                f"intra_op_num_threads={self.intra_op_num_threads}, inter_op_num_threads={self.inter_op_num_threads}"
+            )
+        return self._pool
+
+    def shutdown(self):
+        """关闭 OCR 进程池"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
 
     def process_image(self, image):
         """
@@ -52,28 +119,13 @@ class OCRPlugin:
         if self.ocr is None:
             self.load_model()
 
-        # 处理不同类型的输入图像
         try:
-            if isinstance(image, str):
-                # 图像路径直接传递给OCR处理
-                image_path = image
-                is_temp_file = False
-            else:
-                # 创建临时文件
-                is_temp_file = True
-                image_path = self._create_temp_image_file(image)
-
-            # 执行 OCR
-            result, _ = self.ocr(image_path)
-
-            # 清理临时文件
-            if is_temp_file and os.path.exists(image_path):
-                os.remove(image_path)
+            # RapidOCR 直接支持路径、PIL 图像和 numpy 数组，无需写入临时文件
+            result, _ = self.ocr(image)
 
             # 提取文本
             if result:
-                text = "\n".join([line[1] for line in result])
-                return text
+                return _ocr_result_to_text(result)
             else:
                 logger.warning("OCR未能识别出文本内容")
                 return ""
@@ -82,79 +134,263 @@ class OCRPlugin:
             logger.error(f"OCR处理失败: {str(e)}")
             raise
 
-    def _create_temp_image_file(self, image):
+    def iter_pdf_pages(self, pdf_path, progress_callback=None, pages=None):
         """
-        将图像数据保存为临时文件
-
-        Args:
-            image: PIL.Image或numpy.ndarray格式的图像数据
-
-        Returns:
-            str: 临时文件路径
-        """
-        # 为临时文件创建目录（如果不存在）
-        tmp_dir = os.path.join(os.getcwd(), "tmp")
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        # 生成临时文件路径
-        temp_filename = f"ocr_temp_{uuid.uuid4().hex[:8]}.png"
-        image_path = os.path.join(tmp_dir, temp_filename)
-
-        # 根据图像类型保存文件
-        if isinstance(image, Image.Image):
-            # 保存PIL图像对象到临时文件
-            image.save(image_path)
-        elif isinstance(image, np.ndarray):
-            # 将numpy数组转换为PIL图像并保存
-            Image.fromarray(image).save(image_path)
-        else:
-            raise ValueError("不支持的图像类型，必须是PIL.Image或numpy数组")
+        按页并行 OCR，按页码顺序逐页返回结果
+        :param pdf_path: PDF文件路径
+        :param progress_callback: 进度回调 progress_callback(done_pages, total_pages)
+        :param pages: 需要识别的页码列表，默认识别全部页面
+        :return: 生成器，产出 (page_index, text)
+        """
+        import fitz
+        from tqdm import tqdm
 
-        return image_path
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-    def process_pdf(self, pdf_path):
+        if pages is None:
+            with fitz.open(pdf_path) as pdf_doc:
+                pages = range(pdf_doc.page_count)
+        pages = sorted(pages)
+        total_pages = len(pages)
+        if total_pages == 0:
+            return
+
+        if self.num_workers <= 1:
+            # 单进程模式，在当前进程中逐页处理
+            if self.ocr is None:
+                self.load_model()
+            with tqdm(total=total_pages, desc="to txt", ncols=100) as pbar:
+                for done, (pg, _pix, array) in enumerate(
+                    _prefetch(_iter_rendered_pages(pdf_path, pages, self.render_dpi)), start=1
+                ):
+                    result, _ = self.ocr(array)
+                    yield pg, _ocr_result_to_text(result)
+                    pbar.update(1)
+                    if progress_callback:
+                        progress_callback(done, total_pages)
+            return
+
+        pool = self._get_pool()
+        futures = [
+            pool.submit(_ocr_page_range, pdf_path, pages[start : start + self.pages_per_task], self.render_dpi)
+            for start in range(0, total_pages, self.pages_per_task)
+        ]
+
+        # 任务完成顺序不确定，先缓存结果，再按页码顺序输出
+        pending, next_idx, done_pages = {}, 0, 0
+        try:
+            with tqdm(total=total_pages, desc="to txt", ncols=100) as pbar:
+                for future in as_completed(futures):
+                    page_results = future.result()
+                    pending.update(page_results)
+                    done_pages += len(page_results)
+                    pbar.update(len(page_results))
+                    if progress_callback:
+                        progress_callback(done_pages, total_pages)
+
+                    while next_idx < total_pages and pages[next_idx] in pending:
+                        yield pages[next_idx], pending.pop(pages[next_idx])
+                        next_idx += 1
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def process_pdf(self, pdf_path, progress_callback=None):
         """
         处理PDF文件并提取文本
         :param pdf_path: PDF文件路径
+        :param progress_callback: 进度回调 progress_callback(done_pages, total_pages)
         :return: 提取的文本
         """
 
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
+        import fitz
+
         try:
-            images = []
-
-            pdfDoc = fitz.open(pdf_path)
-            totalPage = pdfDoc.page_count
-            for pg in tqdm(range(totalPage), desc="to images", ncols=100):
-                page = pdfDoc[pg]
-                rotate, zoom_x, zoom_y = 0, 2, 2
-                mat = fitz.Matrix(zoom_x, zoom_y).prerotate(rotate)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                img_pil = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                images.append(img_pil)
-
-            # 处理每个图像并合并文本
-            all_text = []
-            for img_path in tqdm(images, desc="to txt", ncols=100):
-                text = self.process_image(img_path)
-                all_text.append(text)
-
-            return "\n\n".join(all_text)
+            with fitz.open(pdf_path) as pdf_doc:
+                pages = list(range(pdf_doc.page_count))
+            page_texts = self._ocr_pages(pdf_path, pages, "onnx_rapid_ocr", progress_callback=progress_callback)
+            return "\n\n".join(page_texts[pg] for pg in pages)
 
         except Exception as e:
             logger.error(f"PDF processing error: {str(e)}")
             return ""
 
-    def process_pdf_mineru(self, pdf_path):
+    def process_pdf_hybrid(self, pdf_path, engine="onnx_rapid_ocr", min_text_chars=10, progress_callback=None):
         """
-        使用Mineru OCR处理PDF文件
+        混合解析 PDF：文本页直接使用已提取的文本，只对图片页执行 OCR，最后按页码顺序合并
+        :param pdf_path: PDF文件路径
+        :param engine: 图片页使用的 OCR 引擎，onnx_rapid_ocr / mineru_ocr / paddlex_ocr
+        :param min_text_chars: 页面文本少于该字符数时视为图片页
+        :return: 提取的文本
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        page_texts = extract_pdf_page_texts(pdf_path)
+        image_pages = [pg for pg, text in enumerate(page_texts) if len(text.strip()) < min_text_chars]
+        logger.info(
+            f"Hybrid PDF parsing: {len(page_texts) - len(image_pages)} text pages, "
+            f"{len(image_pages)} image pages to OCR with {engine}"
+        )
+
+        if image_pages:
+            ocr_texts = self._ocr_pages(pdf_path, image_pages, engine, progress_callback=progress_callback)
+            for pg in image_pages:
+                page_texts[pg] = ocr_texts.get(pg, "")
+
+        return "\n\n".join(text.strip() for text in page_texts if text.strip())
+
+    @property
+    def cache(self):
+        """OCR 结果缓存，大小上限为 0 时关闭"""
+        if self._cache is None and self.cache_size_mb > 0:
+            from config import config
+
+            cache_dir = self.cache_dir or os.path.join(config.storage_dir, "ocr_cache")
+            self._cache = OCRCache(cache_dir, max_bytes=self.cache_size_mb * 1024 * 1024)
+        return self._cache
+
+    def _engine_params(self, engine):
+        """影响识别结果的引擎参数，作为缓存键的一部分"""
+        if engine == "onnx_rapid_ocr":
+            return f"PP-OCRv4|det_box_thresh={self.det_box_thresh}|dpi={self.render_dpi}"
+        if engine == "mineru_ocr":
+            return f"api|{self._service_client(engine).parse_method}" if os.getenv("MINERU_API_URI") else "vlm-sglang-client"
+        return ""
+
+    def _lookup_cache(self, pdf_path, pages, engine):
+        """查询页面的 OCR 缓存，返回 (已命中的结果, 缓存键, 未命中的页码)"""
+        cache = self.cache
+        if cache is None:
+            return {}, {}, list(pages)
+
+        import fitz
+
+        engine_params = self._engine_params(engine)
+        with fitz.open(pdf_path) as pdf_doc:
+            keys = {pg: OCRCache.make_key(engine, engine_params, page_fingerprint(pdf_doc[pg])) for pg in pages}
+
+        results = {}
+        for pg, key in keys.items():
+            if (text := cache.get(key)) is not None:
+                results[pg] = text
+
+        missing = [pg for pg in pages if pg not in results]
+        logger.info(f"OCR cache: {len(results)} pages hit, {len(missing)} pages to OCR with {engine}")
+        return results, keys, missing
+
+    def _store_cache(self, keys, ocr_results):
+        if self.cache is None:
+            return
+        for pg, text in ocr_results.items():
+            self.cache.set(keys[pg], text)
+
+    def _ocr_pages(self, pdf_path, pages, engine="onnx_rapid_ocr", progress_callback=None):
+        """对指定页面执行 OCR，返回 {page_index: text}
+
+        已缓存的页面直接返回缓存结果，只有未命中的页面会发送给 OCR 引擎。
+        """
+        results, keys, missing = self._lookup_cache(pdf_path, pages, engine)
+        if missing:
+            ocr_results = self._run_ocr_engine(pdf_path, missing, engine, progress_callback=progress_callback)
+            self._store_cache(keys, ocr_results)
+            results.update(ocr_results)
+        return results
+
+    async def _aocr_pages(self, pdf_path, pages, engine="onnx_rapid_ocr"):
+        """_ocr_pages 的异步版本，远程 OCR 服务通过共享连接池的异步客户端访问"""
+        results, keys, missing = await asyncio.to_thread(self._lookup_cache, pdf_path, pages, engine)
+        if missing:
+            client = self._service_client(engine)
+            if client is None:
+                ocr_results = await asyncio.to_thread(self._run_ocr_engine, pdf_path, missing, engine)
+            else:
+                ocr_results = await client.analyze_pages(pdf_path, missing, max_concurrency=self.service_concurrency)
+            await asyncio.to_thread(self._store_cache, keys, ocr_results)
+            results.update(ocr_results)
+        return results
+
+    def _service_client(self, engine):
+        """获取远程 OCR 服务的异步客户端，不支持时返回 None"""
+        if engine not in self._service_clients:
+            if engine == "paddlex_ocr":
+                client = PaddleXClient(
+                    os.getenv("PADDLEX_URI", "http://localhost:8080"), pages_per_request=self.service_pages_per_request
+                )
+            elif engine == "mineru_ocr" and os.getenv("MINERU_API_URI"):
+                # MinerU 部署为 scripts/mineru-api 服务时，通过 HTTP 接口上传文件；否则使用 sglang 客户端
+                # MinerU 依赖跨页的版面信息拼接段落和表格，所有页面在一个请求中发送
+                client = MinerUAPIClient(os.getenv("MINERU_API_URI"), pages_per_request=0)
+            else:
+                client = None
+            self._service_clients[engine] = client
+        return self._service_clients[engine]
+
+    async def aprocess_pdf(self, pdf_path, engine="onnx_rapid_ocr", hybrid=True, min_text_chars=10):
+        """
+        异步处理PDF文件，hybrid 为 True 时只对图片页执行 OCR
         :param pdf_path: PDF文件路径
+        :param engine: OCR 引擎，onnx_rapid_ocr / mineru_ocr / paddlex_ocr
         :return: 提取的文本
         """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        page_texts = await asyncio.to_thread(extract_pdf_page_texts, pdf_path)
+        if hybrid:
+            pages = [pg for pg, text in enumerate(page_texts) if len(text.strip()) < min_text_chars]
+        else:
+            pages = list(range(len(page_texts)))
+
+        if pages:
+            ocr_texts = await self._aocr_pages(pdf_path, pages, engine)
+            for pg in pages:
+                page_texts[pg] = ocr_texts.get(pg, "")
+
+        return "\n\n".join(text.strip() for text in page_texts if text.strip())
+
+    def _run_ocr_engine(self, pdf_path, pages, engine="onnx_rapid_ocr", progress_callback=None):
+        """使用指定引擎识别页面，返回 {page_index: text}
+
+        远程引擎默认在一个请求中处理全部页面（整个文档时直接发送原文件），保留跨页的版面、表格和段落信息，
+        再按识别结果中的页码拆分到各页。同步与异步路径使用相同的请求拆分配置。结果与页面无法对应时抛出异常，不返回空文本。
+        """
+        if engine == "onnx_rapid_ocr":
+            return dict(self.iter_pdf_pages(pdf_path, progress_callback=progress_callback, pages=pages))
+
+        if engine not in ("mineru_ocr", "paddlex_ocr"):
+            raise ValueError(f"Unknown OCR engine: {engine}")
+
+        pages = sorted(pages)
+        client = self._service_client(engine)
+        if client is not None:
+            return client.analyze_pages_sync(pdf_path, pages, max_concurrency=self.service_concurrency)
+
+        # MinerU 未部署为 HTTP 服务时，通过 sglang 客户端解析
+        from .mineru import parse_doc_content_list
+
+        mineru_ocr_uri = self._check_mineru_health()
+        output_dir = os.path.join(os.getcwd(), "tmp", "hybrid_ocr", hashstr(f"{pdf_path}-{pages}", length=16))
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            if pages == list(range(pdf_page_count(pdf_path))):
+                doc_path = pdf_path
+            else:
+                doc_path = write_sub_pdf(pdf_path, pages, os.path.join(output_dir, "ocr_pages.pdf"))
+            content_list = parse_doc_content_list(
+                doc_path, output_dir, backend="vlm-sglang-client", server_url=mineru_ocr_uri
+            )
+            return dict(zip(pages, content_list_to_pages(content_list, len(pages))))
+        finally:
+            # 子 PDF 与中间结果仅用于本次识别
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    def _check_mineru_health(self):
         import requests
-        from .mineru import parse_doc
 
         mineru_ocr_uri = os.getenv("MINERU_OCR_URI", "http://localhost:30000")
         mineru_ocr_uri_health = f"{mineru_ocr_uri}/health"
@@ -167,12 +403,15 @@ class OCRPlugin:
             raise RuntimeError(
                 "Mineru OCR service health check failed. Please check the log use `docker logs mineru-api`"
             )
+        return mineru_ocr_uri
 
-        pdf_path_list = [pdf_path]
-        output_dir = os.path.join(os.getcwd(), "tmp", "mineru_ocr")
-
-        pdf_text = parse_doc(pdf_path_list, output_dir, backend="vlm-sglang-client", server_url=mineru_ocr_uri)[0]
-
+    def process_pdf_mineru(self, pdf_path):
+        """
+        使用Mineru OCR处理PDF文件
+        :param pdf_path: PDF文件路径
+        :return: 提取的文本
+        """
+        pdf_text = self._process_pdf_remote(pdf_path, "mineru_ocr")
         logger.debug(f"Mineru OCR result: {pdf_text[:50]}(...) total {len(pdf_text)} characters.")
         return pdf_text
 
@@ -182,27 +421,15 @@ class OCRPlugin:
         :param pdf_path: PDF文件路径
         :return: 提取的文本
         """
-        from .paddlex import analyze_document, check_paddlex_health
-
-        paddlex_uri = os.getenv("PADDLEX_URI", "http://localhost:8080")
-        health_check_response = check_paddlex_health(paddlex_uri)
-        if not health_check_response.ok:
-            logger.error(f"Paddlex OCR service health check failed with {paddlex_uri}: {health_check_response.json()}")
-            raise RuntimeError(
-                "Paddlex OCR service health check failed. Please check the log use `docker logs paddlex`"
-            )
-
-        result = analyze_document(pdf_path, base_url=paddlex_uri)
-
-        if not result["success"]:
-            logger.error(f"Paddlex OCR failed: {result['error']}")
-            return ""
-
-        return result["full_text"]
+        return self._process_pdf_remote(pdf_path, "paddlex_ocr")
 
+    def _process_pdf_remote(self, pdf_path, engine):
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-def get_state(task_id):
-    return GOLBAL_STATE.get(task_id, {})
+        pages = list(range(pdf_page_count(pdf_path)))
+        page_texts = self._ocr_pages(pdf_path, pages, engine)
+        return "\n\n".join(page_texts[pg] for pg in pages if page_texts.get(pg))
 
 
 def plainreader(file_path):
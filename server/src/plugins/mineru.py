@@ -38,7 +38,8 @@ def do_parse(
     f_make_md_mode=MakeMode.MM_MD,  # The mode for making markdown content, default is MM_MD
     start_page_id=0,  # Start page ID for parsing, default is 0
     end_page_id=None,  # End page ID for parsing, default is None (parse all pages until the end of the document)
-) -> list[str]:
+    f_return_content_list=False,  # Return content lists (with page_idx) instead of markdown strings
+) -> list:
 
     if backend == "pipeline":
         for idx, pdf_bytes in enumerate(pdf_bytes_list):
@@ -91,15 +92,19 @@ def do_parse(
                     f"{pdf_file_name}.md",
                     md_content_str,
                 )
-                md_results.append(md_content_str)
+                if not f_return_content_list:
+                    md_results.append(md_content_str)
 
-            if f_dump_content_list:
+            if f_dump_content_list or f_return_content_list:
                 image_dir = str(os.path.basename(local_image_dir))
                 content_list = pipeline_union_make(pdf_info, MakeMode.CONTENT_LIST, image_dir)
-                md_writer.write_string(
-                    f"{pdf_file_name}_content_list.json",
-                    json.dumps(content_list, ensure_ascii=False, indent=4),
-                )
+                if f_return_content_list:
+                    md_results.append(content_list)
+                if f_dump_content_list:
+                    md_writer.write_string(
+                        f"{pdf_file_name}_content_list.json",
+                        json.dumps(content_list, ensure_ascii=False, indent=4),
+                    )
 
             if f_dump_middle_json:
                 md_writer.write_string(
@@ -155,15 +160,19 @@ def do_parse(
                     f"{pdf_file_name}.md",
                     md_content_str,
                 )
-                md_results.append(md_content_str)
+                if not f_return_content_list:
+                    md_results.append(md_content_str)
 
-            if f_dump_content_list:
+            if f_dump_content_list or f_return_content_list:
                 image_dir = str(os.path.basename(local_image_dir))
                 content_list = vlm_union_make(pdf_info, MakeMode.CONTENT_LIST, image_dir)
-                md_writer.write_string(
-                    f"{pdf_file_name}_content_list.json",
-                    json.dumps(content_list, ensure_ascii=False, indent=4),
-                )
+                if f_return_content_list:
+                    md_results.append(content_list)
+                if f_dump_content_list:
+                    md_writer.write_string(
+                        f"{pdf_file_name}_content_list.json",
+                        json.dumps(content_list, ensure_ascii=False, indent=4),
+                    )
 
             if f_dump_middle_json:
                 md_writer.write_string(
@@ -183,6 +192,30 @@ def do_parse(
         return md_results
 
 
+def parse_doc_content_list(path, output_dir, backend="vlm-sglang-client", server_url=None, method="auto", lang="ch"):
+    """解析单个文档并返回 content_list，每个条目带有 page_idx，可以按页还原文本
+
+    与 parse_doc 不同，解析失败时直接抛出异常。
+    """
+    return do_parse(
+        output_dir=output_dir,
+        pdf_file_names=[str(Path(path).stem)],
+        pdf_bytes_list=[read_fn(path)],
+        p_lang_list=[lang],
+        backend=backend,
+        parse_method=method,
+        server_url=server_url,
+        f_draw_layout_bbox=False,
+        f_draw_span_bbox=False,
+        f_dump_md=False,
+        f_dump_middle_json=False,
+        f_dump_model_output=False,
+        f_dump_orig_pdf=False,
+        f_dump_content_list=False,
+        f_return_content_list=True,
+    )[0]
+
+
 def parse_doc(
     path_list: list[Path],
     output_dir,
@@ -0,0 +1,128 @@
+import os
+import hashlib
+import threading
+
+from src.utils import logger
+
+
+def page_fingerprint(page) -> str:
+    """计算 PDF 页面内容的指纹
+
+    基于页面尺寸、内容流以及页面引用的图片原始数据，不需要渲染页面。
+    同一页面在不同版本的 PDF 中位置变化时，指纹保持不变。
+    """
+    doc = page.parent
+    hasher = hashlib.sha256()
+    hasher.update(f"{tuple(page.rect)}-{page.rotation}".encode())
+    hasher.update(page.read_contents() or b"")
+    for image in page.get_images(full=True):
+        hasher.update(doc.xref_stream_raw(image[0]) or b"")
+    for xobject in page.get_xobjects():
+        hasher.update(doc.xref_stream_raw(xobject[0]) or b"")
+    return hasher.hexdigest()
+
+
+class OCRCache:
+    """OCR 结果磁盘缓存
+
+    缓存键为 (引擎, 引擎参数, 页面指纹)，每条结果一个文本文件。
+    总大小超过上限时，按最近访问时间淘汰最旧的条目。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(engine: str, engine_params: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{engine}|{engine_params}|{fingerprint}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read OCR cache {path}: {e}")
+            self.misses += 1
+            return None
+
+        # 更新访问时间，用于 LRU 淘汰
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = text.encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            # 覆盖已有条目时只计入大小的变化
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(data) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """遍历缓存文件，产出 (path, size, mtime)"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """淘汰最久未访问的条目，直到总大小降到上限的 90%"""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self._total_bytes = total
+        logger.info(f"OCR cache evicted {evicted} entries, current size {total / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cache_dir": self.cache_dir,
+            "max_bytes": self.max_bytes,
+            "total_bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import tempfile
+import weakref
+from abc import ABC, abstractmethod
+
+import httpx
+
+from src.utils import logger
+
+
+# base64 编码的分块大小需要是 3 的倍数，保证分块编码结果可以直接拼接
+_B64_CHUNK_SIZE = 3 * 256 * 1024
+
+
+def write_sub_pdf(pdf_path, pages, output_path):
+    """将指定页面导出为新的 PDF 文件，用于发送给远程 OCR 服务"""
+    import fitz
+
+    with fitz.open(pdf_path) as src_doc, fitz.open() as sub_doc:
+        for pg in pages:
+            sub_doc.insert_pdf(src_doc, from_page=pg, to_page=pg)
+        sub_doc.save(output_path)
+    return output_path
+
+
+def pdf_page_count(pdf_path) -> int:
+    import fitz
+
+    with fitz.open(pdf_path) as pdf_doc:
+        return pdf_doc.page_count
+
+
+class OCRServiceClient(ABC):
+    """远程 OCR 服务的异步客户端
+
+    - 共享连接池，复用 HTTP 连接
+    - 健康检查结果缓存 health_ttl 秒，请求失败时失效
+    - 设置 pages_per_request 时，大文件按页拆分为多个请求并发发送；默认整个文档在一个请求中发送
+    - 同步代码通过 analyze_pages_sync 使用同一套请求逻辑
+    """
+
+    health_path = "/health"
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 300,
+        max_connections: int = 8,
+        pages_per_request: int = 0,
+        health_ttl: float = 30,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.pages_per_request = pages_per_request
+        self.health_ttl = health_ttl
+        # httpx.AsyncClient 绑定创建时的事件循环，每个循环使用各自的客户端，循环结束后自动释放
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._healthy_until = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+            self._clients[loop] = client
+        return client
+
+    def mark_unhealthy(self):
+        self._healthy_until = 0.0
+
+    async def check_health(self):
+        """检查服务健康状态，结果在 health_ttl 秒内有效"""
+        if time.monotonic() < self._healthy_until:
+            return
+
+        try:
+            response = await self.client.get(self.health_path, timeout=5)
+            healthy = response.status_code == 200
+            detail = response.text
+        except httpx.HTTPError as e:
+            healthy, detail = False, str(e)
+
+        if not healthy:
+            logger.error(f"OCR service health check failed with {self.base_url}{self.health_path}: {detail}")
+            raise RuntimeError(f"OCR service {self.base_url} health check failed. Please check the service log")
+
+        self._healthy_until = time.monotonic() + self.health_ttl
+
+    async def analyze_pages(self, pdf_path, pages, max_concurrency=4, pages_per_request=None) -> dict[int, str]:
+        """识别指定页面，按 pages_per_request 拆分请求并发发送，返回 {page_index: text}
+
+        pages_per_request 为 0 时所有页面在一个请求中发送；请求的是整个文档时直接上传原文件。
+        """
+        await self.check_health()
+
+        total_pages = await asyncio.to_thread(pdf_page_count, pdf_path)
+        pages = sorted(pages)
+        batch_size = self.pages_per_request if pages_per_request is None else pages_per_request
+        batch_size = batch_size or len(pages)
+        batches = [pages[i : i + batch_size] for i in range(0, len(pages), batch_size)]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        with tempfile.TemporaryDirectory(prefix="ocr_pages_") as tmp_dir:
+
+            async def run_batch(batch_idx, batch):
+                async with semaphore:
+                    if batch == list(range(total_pages)):
+                        sub_pdf = pdf_path
+                    else:
+                        sub_pdf = os.path.join(tmp_dir, f"pages_{batch_idx}.pdf")
+                        await asyncio.to_thread(write_sub_pdf, pdf_path, batch, sub_pdf)
+                    try:
+                        page_texts = await self.parse_pdf_pages(sub_pdf)
+                    except Exception:
+                        self.mark_unhealthy()
+                        raise
+                    if len(page_texts) != len(batch):
+                        raise RuntimeError(f"OCR service returned {len(page_texts)} pages for {len(batch)} pages")
+                    return dict(zip(batch, page_texts))
+
+            results = await asyncio.gather(*(run_batch(idx, batch) for idx, batch in enumerate(batches)))
+
+        return {pg: text for batch_result in results for pg, text in batch_result.items()}
+
+    def analyze_pages_sync(self, pdf_path, pages, max_concurrency=4, pages_per_request=None) -> dict[int, str]:
+        """analyze_pages 的同步版本，在新的事件循环中执行，结束后关闭该循环的连接"""
+
+        async def run():
+            try:
+                return await self.analyze_pages(
+                    pdf_path, pages, max_concurrency=max_concurrency, pages_per_request=pages_per_request
+                )
+            finally:
+                await self.aclose()
+
+        return asyncio.run(run())
+
+    @abstractmethod
+    async def parse_pdf_pages(self, pdf_path) -> list[str]:
+        """识别 PDF 文件，返回每一页的文本"""
+
+    async def aclose(self):
+        """关闭当前事件循环的客户端"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class PaddleXClient(OCRServiceClient):
+    """PaddleX 版面解析服务客户端
+
+    PaddleX serving 只接受 JSON 请求体，这里以流的方式边读文件边进行 base64 编码，
+    不在内存中同时保留原始文件、base64 字符串和 JSON 字符串。
+    """
+
+    endpoint = "/layout-parsing"
+
+    @staticmethod
+    def _json_body_parts(params) -> tuple[bytes, bytes]:
+        """拆分 JSON 请求体，file 字段的 base64 内容插入在 prefix 和 suffix 之间"""
+        prefix = b'{"file": "'
+        suffix = ('"' + (", " + json.dumps(params, ensure_ascii=False)[1:] if params else "}")).encode()
+        return prefix, suffix
+
+    @staticmethod
+    async def _iter_json_body(file_path, prefix, suffix):
+        yield prefix
+        with open(file_path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, _B64_CHUNK_SIZE):
+                yield base64.b64encode(chunk)
+        yield suffix
+
+    async def layout_parsing(self, file_path, file_type=0, **params) -> dict:
+        params = {"fileType": file_type, "useDocOrientationClassify": True, "useWiredTableCellsTransToHtml": True} | {
+            key: value for key, value in params.items() if value is not None
+        }
+        prefix, suffix = self._json_body_parts(params)
+        body_size = len(prefix) + 4 * -(-os.path.getsize(file_path) // 3) + len(suffix)
+        response = await self.client.post(
+            self.endpoint,
+            content=self._iter_json_body(file_path, prefix, suffix),
+            headers={"Content-Type": "application/json", "Content-Length": str(body_size)},
+        )
+        result = response.json()
+        if response.status_code != 200 or result.get("errorCode") != 0:
+            raise RuntimeError(f"Paddlex OCR failed: {result.get('errorMsg', response.text)}")
+        return result
+
+    async def parse_pdf_pages(self, pdf_path) -> list[str]:
+        result = await self.layout_parsing(pdf_path, file_type=0)
+        layout_results = result.get("result", {}).get("layoutParsingResults", [])
+        return [page.get("markdown", {}).get("text", "") for page in layout_results]
+
+
+class MinerUAPIClient(OCRServiceClient):
+    """MinerU API 服务（scripts/mineru-api）客户端，以 multipart 流式上传文件"""
+
+    endpoint = "/file_parse"
+
+    def __init__(self, base_url: str, parse_method: str = "auto", **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.parse_method = parse_method
+
+    async def file_parse(self, file_path, **form) -> dict:
+        data = {"parse_method": self.parse_method} | {key: str(value).lower() for key, value in form.items()}
+        with open(file_path, "rb") as f:
+            response = await self.client.post(
+                self.endpoint,
+                data=data,
+                files={"file": (os.path.basename(file_path), f, "application/pdf")},
+            )
+        result = response.json()
+        if response.status_code != 200 or "error" in result:
+            raise RuntimeError(f"Mineru OCR failed: {result.get('error', response.text)}")
+        return result
+
+    async def parse_pdf_pages(self, pdf_path) -> list[str]:
+        total_pages = await asyncio.to_thread(pdf_page_count, pdf_path)
+        result = await self.file_parse(pdf_path, return_content_list=True)
+        return content_list_to_pages(result.get("content_list", []), total_pages)
+
+
+def content_list_to_pages(content_list, total_pages) -> list[str]:
+    """将 MinerU 的 content_list 按 page_idx 还原为每页的 Markdown 文本
+
+    page_idx 超出页数范围时说明结果与文档不对应，直接报错而不是丢弃内容。
+    """
+    pages = [[] for _ in range(total_pages)]
+    for item in content_list:
+        page_idx = item.get("page_idx", 0)
+        if not 0 <= page_idx < total_pages:
+            raise ValueError(f"MinerU content page_idx {page_idx} out of range for {total_pages} pages")
+
+        if item.get("type") == "table":
+            text = item.get("table_body", "")
+        elif item.get("type") == "image":
+            text = "\n".join(item.get("img_caption", []))
+        else:
+            text = item.get("text", "")
+            if text and item.get("text_level"):
+                text = f"{'#' * item['text_level']} {text}"
+
+        if text:
+            pages[page_idx].append(text)
+
+    return ["\n\n".join(blocks) for blocks in pages]
@@ -0,0 +1,82 @@
+import os
+import inspect
+import threading
+
+from src.utils import logger
+from workers.ocr_worker import _load_rapid_ocr
+
+
+class OCRModelRegistry:
+    """进程级 OCR 模型注册表
+
+    同一组参数的模型在进程内只加载一次，加载后在线程之间只读共享。
+    onnxruntime 的 InferenceSession.run 是线程安全的。
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+
+    def _key(self, name, params):
+        """补全加载函数的默认参数，使显式传入默认值与不传参数得到同一个模型"""
+        if name not in self._loaders:
+            raise ValueError(f"Unknown OCR model: {name}")
+        bound = inspect.signature(self._loaders[name]).bind(**params)
+        bound.apply_defaults()
+        return (name, tuple(sorted(bound.arguments.items())))
+
+    def get(self, name="rapid_ocr", **params):
+        """获取模型，首次调用时加载，并发调用只会触发一次加载"""
+        key = self._key(name, params)
+        if (model := self._models.get(key)) is not None:
+            return model
+
+        with self._registry_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if (model := self._models.get(key)) is None:
+                logger.info(f"Loading OCR model {name} with {params}")
+                model = self._loaders[name](**params)
+                self._models[key] = model
+                logger.info(f"OCR model {name} loaded.")
+        return model
+
+    def is_loaded(self, name="rapid_ocr", **params):
+        return self._key(name, params) in self._models
+
+    def preload(self, names=None, background=True):
+        """预加载模型，默认读取 OCR_PRELOAD 环境变量（逗号分隔的模型名称）"""
+        if names is None:
+            names = [name.strip() for name in os.getenv("OCR_PRELOAD", "").split(",") if name.strip()]
+        if not names:
+            return None
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"Failed to preload OCR model {name}: {e}")
+
+        if not background:
+            load_all()
+            return None
+
+        thread = threading.Thread(target=load_all, name="ocr-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self._registry_lock:
+            self._models.clear()
+            self._locks.clear()
+
+
+ocr_models = OCRModelRegistry()
+ocr_models.register("rapid_ocr", _load_rapid_ocr)
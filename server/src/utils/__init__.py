@@ -4,20 +4,22 @@ import os
 from src.utils.logging_config import logger
 
 
-def is_text_pdf(pdf_path):
+def extract_pdf_page_texts(pdf_path):
+    """一次遍历提取 PDF 每一页的文本，图片页返回空字符串"""
     import fitz
 
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def is_text_pdf(pdf_path, page_texts=None):
+    page_texts = extract_pdf_page_texts(pdf_path) if page_texts is None else page_texts
+    total_pages = len(page_texts)
     if total_pages == 0:
         return False
 
-    text_pages = 0
-    for page_num in range(total_pages):
-        page = doc.load_page(page_num)
-        text = page.get_text()
-        if text.strip():  # 检查是否有文本内容
-            text_pages += 1
+    # 检查是否有文本内容
+    text_pages = sum(1 for text in page_texts if text.strip())
 
     # 计算有文本内容的页面比例
     text_ratio = text_pages / total_pages
@@ -49,6 +51,15 @@ def hashstr(input_string, length=None, with_salt=False):
     return hash
 
 
+def hashfile(file_path, chunk_size=1024 * 1024):
+    """流式计算文件内容的 sha256 哈希值"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(chunk_size):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
 def get_docker_safe_url(base_url):
     if os.getenv("RUNNING_IN_DOCKER") == "true":
         # 替换所有可能的本地地址形式
@@ -0,0 +1,130 @@
+import json
+import time
+import asyncio
+
+from langchain_core.messages import AIMessageChunk
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+STREAM_FORMATS = ("legacy", "delta")
+
+
+def dumps(obj) -> bytes:
+    """序列化为 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class StreamEncoder:
+    """将智能体的流式消息编码为 NDJSON，每行一个 JSON 对象
+
+    - legacy: 每个 token 都输出完整的消息和 metadata，与原有格式一致
+    - delta: 每条消息的第一行与 legacy 相同，之后同一条消息的 token 只输出 {"delta": 内容}，
+      工具调用片段、response_metadata 等非空字段也会附带在 delta 行中
+    - coalesce_ms 大于 0 时，同一条消息在该时间窗口内的 token 合并为一行输出
+
+    默认使用 legacy：前端（web/）按完整消息逐行渲染，尚不支持 delta 行，需要客户端显式选择 delta。
+
+    Args:
+        request_id: 请求 ID，写入 legacy 格式的每一行
+        format: 输出格式，legacy 或 delta
+        coalesce_ms: token 合并的时间窗口（毫秒），0 表示不合并
+    """
+
+    def __init__(self, request_id=None, format: str = "legacy", coalesce_ms: float = 0):
+        if format not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format: {format}, should be one of {STREAM_FORMATS}")
+        self.request_id = request_id
+        self.format = format
+        self.coalesce_window = max(float(coalesce_ms or 0), 0) / 1000
+        self._buffer: AIMessageChunk | None = None
+        self._buffer_metadata = None
+        self._flush_deadline = 0.0
+        self._current_id = None  # delta 格式下最近一条已输出完整内容的消息
+
+    def chunk(self, content=None, **kwargs) -> bytes:
+        """编码一行完整的消息"""
+        return dumps({"request_id": self.request_id, "response": content, **kwargs}) + b"\n"
+
+    def encode(self, msg, metadata) -> bytes:
+        """编码一条消息，合并 token 时可能返回空字节串"""
+        if self.coalesce_window <= 0 or not isinstance(msg, AIMessageChunk):
+            return self.flush() + self._encode(msg, metadata)
+
+        data = b""
+        if self._buffer is not None and (self._buffer.id != msg.id or time.monotonic() >= self._flush_deadline):
+            data = self.flush()
+        if self._buffer is None:
+            self._buffer, self._buffer_metadata = msg, metadata
+            self._flush_deadline = time.monotonic() + self.coalesce_window
+        else:
+            self._buffer = self._buffer + msg
+        return data
+
+    def flush(self) -> bytes:
+        """输出合并中的 token"""
+        if self._buffer is None:
+            return b""
+        msg, metadata = self._buffer, self._buffer_metadata
+        self._buffer = self._buffer_metadata = None
+        return self._encode(msg, metadata)
+
+    def _encode(self, msg, metadata) -> bytes:
+        is_chunk = isinstance(msg, AIMessageChunk)
+        if self.format == "delta" and is_chunk and msg.id is not None and msg.id == self._current_id:
+            return dumps(self._delta(msg)) + b"\n"
+
+        self._current_id = msg.id if is_chunk else None
+        content = msg.content if is_chunk else None
+        return self.chunk(content=content, msg=msg.model_dump(), metadata=metadata, status="loading")
+
+    @staticmethod
+    def _delta(msg: AIMessageChunk) -> dict:
+        delta = {"delta": msg.content}
+        if msg.tool_call_chunks:
+            delta["tool_call_chunks"] = msg.tool_call_chunks
+        if msg.additional_kwargs:
+            delta["additional_kwargs"] = msg.additional_kwargs
+        if msg.response_metadata:
+            delta["response_metadata"] = msg.response_metadata
+        if msg.usage_metadata:
+            delta["usage_metadata"] = msg.usage_metadata
+        return delta
+
+    async def encode_messages(self, messages):
+        """编码 (msg, metadata) 异步迭代器，合并 token 时即使没有新消息也会按时间窗口输出"""
+        if self.coalesce_window <= 0:
+            async for msg, metadata in messages:
+                yield self._encode(msg, metadata)
+            return
+
+        iterator = aiter(messages)
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(iterator))
+                timeout = max(self._flush_deadline - time.monotonic(), 0) if self._buffer is not None else None
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    yield self.flush()
+                    continue
+
+                task, pending = pending, None
+                try:
+                    msg, metadata = task.result()
+                except StopAsyncIteration:
+                    break
+                if data := self.encode(msg, metadata):
+                    yield data
+
+            if data := self.flush():
+                yield data
+        finally:
+            if pending is not None:
+                pending.cancel()
@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import asyncio
+import weakref
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.utils import hashstr
+from src.utils.logging_config import logger
+
+
+_BLOCK_TAGS = ("p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "section", "article", "table")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    content: bytes
+    content_type: str = ""
+    encoding: str | None = None
+    from_cache: bool = False
+
+
+class AsyncURLFetcher:
+    """异步网页抓取器
+
+    - 共享连接池，按域名限制并发（连接池和信号量绑定事件循环，每个循环各自创建）
+    - 流式下载，超过大小上限时中止
+    - 基于 ETag / Last-Modified 的条件请求缓存
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        max_connections: int = 64,
+        per_host_limit: int = 4,
+        max_bytes: int = 20 * 1024 * 1024,
+        timeout: float = 30,
+    ):
+        self.cache_dir = cache_dir
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._host_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _drop_closed_loops(self):
+        """连接和信号量会引用所在的循环，已关闭循环的条目不会被自动回收，这里主动清理"""
+        for mapping in (self._clients, self._host_semaphores):
+            for loop in [item for item in mapping.keys() if item.is_closed()]:
+                mapping.pop(loop, None)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            self._drop_closed_loops()
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections // 2),
+                headers={"User-Agent": "Mozilla/5.0 (compatible; Yuxi-Know/0.2)"},
+            )
+        return client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._host_semaphores.get(loop)
+        if semaphores is None:
+            self._drop_closed_loops()
+            semaphores = self._host_semaphores[loop] = {}
+        host = urlsplit(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphores[host]
+
+    def _cache_paths(self, url: str) -> tuple[str, str]:
+        key = hashstr(url)
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _load_cache(self, url: str) -> tuple[dict, bytes] | None:
+        if not self.cache_dir:
+            return None
+        meta_path, body_path = self._cache_paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except Exception as e:
+            logger.warning(f"Failed to load url cache for {url}: {e}")
+            return None
+
+    def _save_cache(self, url: str, meta: dict, content: bytes) -> None:
+        meta_path, body_path = self._cache_paths(url)
+        with open(body_path, "wb") as f:
+            f.write(content)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    async def fetch(self, url: str) -> FetchResult:
+        """抓取 URL 内容，命中条件请求缓存时返回缓存内容"""
+        cached = await asyncio.to_thread(self._load_cache, url) if self.cache_dir else None
+        headers = {}
+        if cached:
+            meta, _ = cached
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with self._host_semaphore(url):
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    meta, content = cached
+                    logger.debug(f"URL not modified, using cache: {url}")
+                    return FetchResult(url, content, meta.get("content_type", ""), meta.get("encoding"), from_cache=True)
+
+                response.raise_for_status()
+
+                content_length = int(response.headers.get("Content-Length") or 0)
+                if content_length > self.max_bytes:
+                    raise ValueError(f"URL content too large: {content_length} bytes > {self.max_bytes} bytes")
+
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffer.extend(chunk)
+                    if len(buffer) > self.max_bytes:
+                        raise ValueError(f"URL content exceeds {self.max_bytes} bytes: {url}")
+
+                result = FetchResult(
+                    url,
+                    bytes(buffer),
+                    content_type=response.headers.get("Content-Type", ""),
+                    encoding=response.charset_encoding,
+                )
+
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                if self.cache_dir and (etag or last_modified):
+                    meta = {
+                        "url": url,
+                        "etag": etag,
+                        "last_modified": last_modified,
+                        "content_type": result.content_type,
+                        "encoding": result.encoding,
+                    }
+                    await asyncio.to_thread(self._save_cache, url, meta, result.content)
+
+                return result
+
+    async def fetch_text(self, url: str) -> str:
+        """抓取 URL 并提取正文文本"""
+        result = await self.fetch(url)
+        if "html" in result.content_type or not result.content_type:
+            return await asyncio.to_thread(html_to_text, result.content, result.encoding)
+        return result.content.decode(result.encoding or "utf-8", errors="replace")
+
+    async def aclose(self):
+        """关闭当前事件循环的客户端"""
+        loop = asyncio.get_running_loop()
+        self._host_semaphores.pop(loop, None)
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+def html_to_text(content: bytes, encoding: str | None = None) -> str:
+    """从 HTML 中提取文本，优先使用 lxml，未安装时回退到 BeautifulSoup"""
+    try:
+        import lxml.html
+        from lxml import etree
+
+        parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+        try:
+            doc = lxml.html.document_fromstring(content, parser=parser)
+        except etree.ParserError:  # 空白页面
+            return ""
+        etree.strip_elements(doc, "script", "style", "noscript", "template", etree.Comment, with_tail=False)
+        # 块级元素之后补充换行，避免相邻段落粘连
+        for element in doc.iter(*_BLOCK_TAGS):
+            element.tail = "\n" + (element.tail or "")
+        text = doc.text_content()
+
+    except ImportError:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, "html.parser", from_encoding=encoding)
+        for element in soup(["script", "style", "noscript", "template"]):
+            element.decompose()
+        text = soup.get_text("\n")
+
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
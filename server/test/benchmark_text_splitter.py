@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter  # noqa: E402
+
+from src.core.text_splitter import FastTextSplitter  # noqa: E402
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "A_Dream_of_Red_Mansions.txt")
+SENTENCE_ENDS = ("。", "！", "？", "”", ".", "!", "?")
+
+
+def benchmark(name, split, text, repeat=5):
+    """多次切分取最短耗时，并统计块的长度和在句子边界结束的比例"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        chunks = split(text)
+        timings.append(time.perf_counter() - start_time)
+
+    lengths = [len(chunk) for chunk in chunks]
+    sentence_end_ratio = sum(chunk.rstrip().endswith(SENTENCE_ENDS) for chunk in chunks) / len(chunks)
+    print(
+        f"{name:<32} 耗时: {min(timings) * 1000:8.1f} ms  块数: {len(chunks):5d}  "
+        f"平均长度: {statistics.mean(lengths):6.1f}  最大长度: {max(lengths):5d}  "
+        f"句子边界结尾: {sentence_end_ratio:.1%}"
+    )
+
+
+if __name__ == "__main__":
+    with open(DATA_PATH, encoding="utf-8") as f:
+        text = f.read()
+    print(f"语料: {os.path.basename(DATA_PATH)}，{len(text)} 字符")
+
+    for chunk_size, chunk_overlap in [(500, 100), (1000, 200)]:
+        print(f"\nchunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        recursive_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n\n", "\n", ".", " ", ""]
+        )
+        fast_splitter = FastTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        benchmark("RecursiveCharacterTextSplitter", recursive_splitter.split_text, text)
+        benchmark("FastTextSplitter", fast_splitter.split_text, text)
+
+    token_splitter = FastTextSplitter(chunk_size=512, chunk_overlap=64, length_unit="token")
+    print("\nchunk_size=512 tokens, chunk_overlap=64 tokens（估算）")
+    benchmark("FastTextSplitter(token)", token_splitter.split_text, text)
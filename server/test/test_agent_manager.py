@@ -0,0 +1,169 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents import agent_manager as agent_manager_module
+from src.agents.agent_manager import AgentManager
+
+
+# 数据库中的智能体记录，agent_id -> name
+RECORDS = {"id1": "agent-1", "id2": "agent-2", "id3": "agent-3"}
+
+
+class FakeAgent:
+    """代替 ChatbotAgent，记录创建、编译图和关闭"""
+
+    created = []
+    closed = []
+
+    def __init__(self, agent_id=None, config=None):
+        self.agent_id = agent_id
+        self.name = config["name"]
+        self.config = config
+        self.graph_built = False
+
+    @classmethod
+    async def create(cls, agent_id=None, config=None):
+        cls.created.append(agent_id)
+        await asyncio.sleep(0.02)
+        return cls(agent_id=agent_id, config=config)
+
+    async def get_graph(self):
+        self.graph_built = True
+
+    async def aclose(self):
+        FakeAgent.closed.append(self.agent_id)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeAgent.created, FakeAgent.closed = [], []
+    monkeypatch.setattr(agent_manager_module, "ChatbotAgent", FakeAgent)
+    manager = AgentManager(max_size=2, idle_timeout=0)
+
+    def query_record(identifier, match_name=False):
+        for agent_id, name in RECORDS.items():
+            if identifier == agent_id or (match_name and identifier == name):
+                return agent_id, name, {"name": name}
+        return None
+
+    monkeypatch.setattr(manager, "_query_record", query_record)
+    return manager
+
+
+def test_concurrent_first_requests_create_once(manager):
+    async def run():
+        requests = [manager.aget_agent_by_identifier("agent-1") for _ in range(5)] + [manager.aget_agent("id1")]
+        agents = await asyncio.gather(*requests)
+        # 名称作为 agent_id 的别名，之后按名称查找直接命中缓存
+        return agents, await manager.aget_agent_by_identifier("agent-1")
+
+    agents, by_name = asyncio.run(run())
+
+    assert FakeAgent.created == ["id1"]
+    assert all(agent is agents[0] for agent in agents) and by_name is agents[0]
+    assert manager.get_cache_stats()["pending"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_creation(manager):
+    async def run():
+        first = asyncio.create_task(manager.aget_agent("id1"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(manager.aget_agent("id1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    agent = asyncio.run(run())
+
+    assert FakeAgent.created == ["id1"] and manager._lookup("id1") is agent
+
+
+def test_lru_eviction_closes_agent(manager):
+    async def run():
+        for agent_id in ("id1", "id2"):
+            await manager.aget_agent(agent_id)
+        await manager.aget_agent("id1")
+        await manager.aget_agent("id3")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    # id2 最久未使用，被淘汰并关闭，别名也一并删除
+    assert list(manager._instances) == ["id1", "id3"]
+    assert FakeAgent.closed == ["id2"]
+    assert "agent-2" not in manager._aliases
+
+
+def test_idle_eviction(manager, monkeypatch):
+    now = [1000.0]
+    # 只替换 agent_manager 中的时钟，事件循环仍使用真实时间
+    monkeypatch.setattr(agent_manager_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    manager.idle_timeout = 60
+
+    async def run():
+        await manager.aget_agent("id1")
+        now[0] += 120
+        await manager.aget_agent("id2")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert list(manager._instances) == ["id2"] and FakeAgent.closed == ["id1"]
+
+
+def test_invalidate_during_creation_is_not_cached(manager):
+    async def run():
+        task = asyncio.create_task(manager.aget_agent("id1"))
+        await asyncio.sleep(0.005)
+        manager.invalidate("id1")
+        stale = await task
+        return stale, await manager.aget_agent("id1")
+
+    stale, fresh = asyncio.run(run())
+
+    assert stale is not fresh
+    assert FakeAgent.created == ["id1", "id1"]
+    assert manager._lookup("id1") is fresh
+
+
+def test_missing_agent(manager):
+    assert asyncio.run(manager.aget_agent_by_identifier("missing")) is None
+    with pytest.raises(ValueError):
+        asyncio.run(manager.aget_agent("missing"))
+
+
+def test_warm_up_builds_popular_agents(manager, monkeypatch):
+    requested = []
+
+    def popular(limit):
+        requested.append(limit)
+        return ["id1", "missing", "id2"][:limit]
+
+    monkeypatch.setattr(manager, "get_popular_agent_ids", popular)
+
+    warmed = asyncio.run(manager.warm_up(limit=5))
+
+    # 数量不超过缓存容量，不存在的智能体跳过，不影响其他智能体
+    assert requested == [2]
+    assert warmed == ["id1"]
+    assert manager._lookup("id1").graph_built
+    assert asyncio.run(manager.warm_up(limit=0)) == []
+
+
+def test_invalidate_rewarms_in_background(manager):
+    async def run():
+        old = await manager.aget_agent("id1")
+        assert manager.invalidate("id1")
+        assert manager._lookup("id1") is None and "id1" in manager._warming
+        await manager._warming["id1"]
+        return old
+
+    old = asyncio.run(run())
+
+    new = manager._lookup("id1")
+    assert new is not old and new.graph_built
+    assert FakeAgent.closed == ["id1"] and not manager._warming
+    # 未缓存的智能体失效时不预热
+    assert not manager.invalidate("id3") and not manager._warming
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.agents import utils
+from src.agents.utils import LoopLocalAsyncClient
+
+
+def handler(request: httpx.Request):
+    return httpx.Response(200, text=request.url.path)
+
+
+def test_loop_local_client_per_event_loop():
+    client = LoopLocalAsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        response = await client.get("http://llm/v1/models")
+        return response.text, client._current_client()
+
+    # 每次 asyncio.run 都是新的事件循环，连接池不能跨循环复用
+    (text1, inner1), (text2, inner2) = asyncio.run(run()), asyncio.run(run())
+
+    assert text1 == text2 == "/v1/models"
+    assert inner1 is not inner2
+    assert inner1 not in client._loop_clients.values()
+
+
+def test_loop_local_client_aclose():
+    client = LoopLocalAsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        await client.get("http://llm/")
+        inner = client._current_client()
+        await client.aclose()
+        return inner
+
+    inner = asyncio.run(run())
+
+    assert inner.is_closed and client.is_closed
+    assert not client._loop_clients
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    monkeypatch.setattr(utils, "_http_clients", {})
+    monkeypatch.setattr(utils, "_model_pool", type(utils._model_pool)())
+    return utils
+
+
+def test_http_clients_shared_per_base_url(pools):
+    clients = pools.get_http_clients("http://llm-a/v1")
+
+    assert pools.get_http_clients("http://llm-a/v1") is clients
+    assert pools.get_http_clients("http://llm-b/v1") is not clients
+    assert isinstance(clients[1], LoopLocalAsyncClient)
+
+    asyncio.run(pools.aclose_http_clients())
+    assert not pools._http_clients and clients[0].is_closed
+
+
+def test_model_pool_reuse_and_eviction(pools, monkeypatch):
+    created = []
+    monkeypatch.setattr(pools, "LLM_MODEL_POOL_SIZE", 2)
+    monkeypatch.setattr(pools, "_resolve_model", lambda provider, model: (model, "key", "http://llm/v1"))
+    monkeypatch.setattr(
+        pools, "_create_chat_model", lambda provider, model, api_key, base_url, params: created.append(model) or object()
+    )
+
+    model_a = pools.load_chat_model("openai", "a", model_parameters={"temperature": 0})
+    assert pools.load_chat_model("openai", "a", model_parameters={"temperature": 0}) is model_a
+    assert pools.load_chat_model("openai", "a", model_parameters={"temperature": 1}) is not model_a
+
+    # 超出池大小时淘汰最久未使用的模型
+    pools.load_chat_model("openai", "a", model_parameters={"temperature": 0})
+    pools.load_chat_model("openai", "b")
+    assert pools.load_chat_model("openai", "a", model_parameters={"temperature": 0}) is model_a
+    assert created == ["a", "a", "b"]
+    pools.load_chat_model("openai", "a", model_parameters={"temperature": 1})
+    assert created == ["a", "a", "b", "a"]
+
+
+def test_chat_models_share_http_clients(pools):
+    pytest.importorskip("langchain_openai")
+    model_a = pools._create_chat_model("openai", "a", "key", "http://llm/v1", {})
+    model_b = pools._create_chat_model("openai", "b", "key", "http://llm/v1", {"temperature": 0})
+
+    sync_client, async_client = pools.get_http_clients("http://llm/v1")
+    assert model_a.http_client is model_b.http_client is sync_client
+    assert model_a.http_async_client is model_b.http_async_client is async_client
@@ -0,0 +1,70 @@
+from config.agent_config import AgentConfig, ModelConfig
+from src.agents.chatbot_agent import ChatbotConfiguration
+
+
+def make_config(**kwargs):
+    return ChatbotConfiguration(AgentConfig(system_prompt="你是助手", **kwargs))
+
+
+def test_compile_is_cached():
+    config = make_config()
+
+    runtime = config.compile()
+
+    assert config.compile() is runtime and config.compile({"thread_id": "t1"}) is runtime
+    assert runtime.format_system_prompt().startswith("你是助手 Now is ")
+
+
+def test_system_prompt_override_cached_separately():
+    config = make_config()
+    default = config.compile()
+
+    override = config.compile({"system_prompt": "你是翻译"})
+
+    assert override is not default and override.system_prompt == "你是翻译"
+    assert config.compile({"system_prompt": "你是翻译"}) is override
+    assert config.compile() is default
+
+
+def test_nested_config_edited_in_place():
+    config = make_config(llm_config=ModelConfig(context_window=10000, config={"max_tokens": 1000}))
+    runtime = config.compile()
+
+    config.llm_config.config["max_tokens"] = 4000
+    budget = config.compile()
+    config.llm_config.context_window = 20000
+    larger = config.compile()
+
+    # 预留给输出的 token 增加，历史消息的预算相应减少
+    assert budget is not runtime
+    assert budget.context_window.max_tokens == runtime.context_window.max_tokens - 3000
+    assert larger.context_window.max_tokens == budget.context_window.max_tokens + 10000
+
+
+def test_assignment_invalidates():
+    config = make_config()
+    runtime = config.compile()
+
+    config.system_prompt = "新的提示词"
+
+    assert config.compile() is not runtime and config.compile().system_prompt == "新的提示词"
+
+
+def test_nested_dict_converted_once():
+    config = make_config()
+    config.llm_config = {"context_window": 5000, "config": {}}
+
+    llm_config = config.llm_config
+
+    assert isinstance(llm_config, ModelConfig) and config.llm_config is llm_config
+    assert config.agent_config.llm_config is llm_config
+    assert 0 < config.compile().context_window.max_tokens < 5000
+
+
+def test_runtime_cache_is_bounded():
+    config = make_config()
+
+    for i in range(ChatbotConfiguration.RUNTIME_CACHE_SIZE * 2):
+        config.compile({"system_prompt": f"提示词 {i}"})
+
+    assert len(config._runtimes) == ChatbotConfiguration.RUNTIME_CACHE_SIZE
@@ -0,0 +1,128 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from src.agents import checkpoint_maintenance as maintenance_module
+from src.agents.checkpoint_maintenance import CheckpointMaintenance, checkpoint_timestamp
+from src.agents.checkpointer import CheckpointerManager
+
+
+def thread_config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+@pytest.fixture
+def checkpointer_manager(tmp_path, monkeypatch):
+    manager = CheckpointerManager(backend="sqlite")
+    manager.sqlite_path = str(tmp_path / "agents" / "checkpoints.db")
+    monkeypatch.setattr(maintenance_module, "checkpointer_manager", manager)
+    return manager
+
+
+@pytest.fixture
+def maintenance(tmp_path, checkpointer_manager):
+    return CheckpointMaintenance(keep_latest=2, archive_after_days=0, interval=0, archive_dir=str(tmp_path / "archive"))
+
+
+def write_thread(manager, thread_id, count):
+    """写入 count 个依次相连的检查点，每个检查点带一条中间写入，返回检查点 ID"""
+
+    async def run():
+        saver = await manager.get()
+        ids, config = [], thread_config(thread_id)
+        try:
+            for step in range(count):
+                checkpoint = empty_checkpoint()
+                config = await saver.aput(config, checkpoint, {"step": step}, {})
+                await saver.aput_writes(config, [("messages", f"{thread_id}-{step}")], task_id="task")
+                ids.append(checkpoint["id"])
+        finally:
+            await manager.aclose()
+        return ids
+
+    return asyncio.run(run())
+
+
+def rows(manager, table, thread_id):
+    with sqlite3.connect(manager.sqlite_path) as conn:
+        return [row[0] for row in conn.execute(
+            f"SELECT checkpoint_id FROM {table} WHERE thread_id = ? ORDER BY checkpoint_id", (thread_id,)
+        )]
+
+
+def test_checkpoint_timestamp():
+    assert abs(checkpoint_timestamp(empty_checkpoint()["id"]) - time.time()) < 5
+
+
+def test_prune_keeps_latest(maintenance, checkpointer_manager):
+    ids = write_thread(checkpointer_manager, "t1", 5)
+    other = write_thread(checkpointer_manager, "t2", 2)
+
+    assert asyncio.run(maintenance.prune()) == 3
+
+    # 只保留最新的两个检查点，被删除检查点的中间写入一并删除
+    assert rows(checkpointer_manager, "checkpoints", "t1") == ids[-2:]
+    assert rows(checkpointer_manager, "writes", "t1") == ids[-2:]
+    assert rows(checkpointer_manager, "checkpoints", "t2") == other
+
+
+def test_archive_and_restore(maintenance, checkpointer_manager):
+    ids = write_thread(checkpointer_manager, "t1", 3)
+    other = write_thread(checkpointer_manager, "t2", 1)
+
+    asyncio.run(maintenance.archive_thread("t1"))
+
+    assert maintenance.is_archived("t1")
+    assert rows(checkpointer_manager, "checkpoints", "t1") == [] and rows(checkpointer_manager, "writes", "t1") == []
+    assert rows(checkpointer_manager, "checkpoints", "t2") == other
+
+    # 并发恢复同一个线程，结果相同
+    assert asyncio.run(restore_twice(maintenance, "t1")) == [True, True]
+    assert not maintenance.is_archived("t1")
+    assert rows(checkpointer_manager, "checkpoints", "t1") == ids
+    assert rows(checkpointer_manager, "writes", "t1") == ids
+    assert asyncio.run(latest_step(checkpointer_manager, "t1")) == 2
+
+
+def test_checkpoint_written_during_archive_is_kept(maintenance, checkpointer_manager, monkeypatch):
+    ids = write_thread(checkpointer_manager, "t1", 2)
+    write_archive = CheckpointMaintenance._write_archive
+    new_ids = []
+
+    def write_during_archive(path, table_rows):
+        # 读取线程之后、删除之前，对话继续写入了新的检查点
+        new_ids.extend(write_thread(checkpointer_manager, "t1", 1))
+        write_archive(path, table_rows)
+
+    monkeypatch.setattr(CheckpointMaintenance, "_write_archive", staticmethod(write_during_archive))
+    asyncio.run(maintenance.archive_thread("t1"))
+
+    assert rows(checkpointer_manager, "checkpoints", "t1") == new_ids
+    assert rows(checkpointer_manager, "writes", "t1") == new_ids
+
+    # 再次归档时合并已有的归档，不覆盖旧的检查点
+    monkeypatch.setattr(CheckpointMaintenance, "_write_archive", staticmethod(write_archive))
+    asyncio.run(maintenance.archive_thread("t1"))
+    asyncio.run(maintenance.restore_thread("t1"))
+    assert rows(checkpointer_manager, "checkpoints", "t1") == sorted(ids + new_ids)
+
+
+async def restore_twice(maintenance, thread_id):
+    return await asyncio.gather(maintenance.restore_thread(thread_id), maintenance.restore_thread(thread_id))
+
+
+async def latest_step(manager, thread_id):
+    try:
+        saver = await manager.get()
+        return (await saver.aget_tuple(thread_config(thread_id))).metadata["step"]
+    finally:
+        await manager.aclose()
@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver, aiosqlite
+
+from src.agents.checkpointer import CheckpointerManager
+
+
+def thread_config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+async def write_checkpoint(saver, thread_id, agent_id):
+    checkpoint = empty_checkpoint()
+    await saver.aput(thread_config(thread_id), checkpoint, {"agent_id": agent_id}, {})
+    return checkpoint["id"]
+
+
+async def write_legacy_db(path, thread_id):
+    """按旧版本的方式，在智能体目录下单独的数据库中写入检查点"""
+    path.parent.mkdir(parents=True)
+    async with aiosqlite.connect(str(path)) as conn:
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        return await write_checkpoint(saver, thread_id, path.parent.name)
+
+
+@pytest.fixture
+def manager_factory(tmp_path):
+    def factory():
+        manager = CheckpointerManager(backend="sqlite")
+        manager.sqlite_path = str(tmp_path / "agents" / "checkpoints.db")
+        return manager
+
+    return factory
+
+
+def test_agents_share_one_checkpointer(manager_factory):
+    manager = manager_factory()
+
+    async def run():
+        try:
+            first, second = await asyncio.gather(manager.get(), manager.get())
+            await write_checkpoint(first, "t1", "agent-1")
+            await write_checkpoint(second, "t2", "agent-2")
+            return first, second, await second.aget_tuple(thread_config("t1"))
+        finally:
+            await manager.aclose()
+
+    first, second, saved = asyncio.run(run())
+
+    assert first is second
+    assert saved.metadata["agent_id"] == "agent-1"
+    with sqlite3.connect(manager.sqlite_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_legacy_checkpoints_imported_once(manager_factory, tmp_path):
+    legacy_path = tmp_path / "agents" / "agent-1" / "checkpoint.db"
+    checkpoint_id = asyncio.run(write_legacy_db(legacy_path, "old-thread"))
+
+    async def open_and_read():
+        manager = manager_factory()
+        try:
+            checkpointer = await manager.get()
+            return await checkpointer.aget_tuple(thread_config("old-thread"))
+        finally:
+            await manager.aclose()
+
+    saved = asyncio.run(open_and_read())
+    assert saved.checkpoint["id"] == checkpoint_id
+
+    # 每个文件只导入一次：共享库中删除的检查点在重新打开后不会再从旧库导入
+    shared_path = manager_factory().sqlite_path
+    with sqlite3.connect(shared_path) as conn:
+        conn.execute("DELETE FROM checkpoints WHERE thread_id = 'old-thread'")
+    assert asyncio.run(open_and_read()) is None
+    with sqlite3.connect(shared_path) as conn:
+        assert conn.execute("SELECT count(*) FROM legacy_checkpoint_imports").fetchone()[0] == 1
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        asyncio.run(CheckpointerManager(backend="redis").get())
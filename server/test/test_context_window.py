@@ -0,0 +1,96 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.core import context_window as context_window_module
+from src.core.context_window import ContextWindow, count_message_tokens, count_text_tokens
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def assistant(text, tool_calls=None):
+    return {"role": "assistant", "content": text, "tool_calls": tool_calls or []}
+
+
+def tool(text):
+    return {"role": "tool", "content": text, "tool_call_id": "call-1"}
+
+
+def conversation():
+    """系统消息 + 三轮对话，第二轮包含工具调用和工具结果"""
+    return [
+        {"role": "system", "content": "你是助手"},
+        user("第一轮问题 " * 20),
+        assistant("第一轮回答 " * 20),
+        user("第二轮问题 " * 20),
+        assistant("", [{"name": "search", "args": {"query": "天气"}, "id": "call-1"}]),
+        tool("工具结果 " * 20),
+        assistant("第二轮回答 " * 20),
+        user("第三轮问题"),
+    ]
+
+
+def tokens(messages):
+    return sum(count_message_tokens(message) for message in messages)
+
+
+def test_zero_context_window_keeps_everything():
+    messages = conversation()
+
+    window = ContextWindow.for_model(context_window=0, max_output_tokens=1000, system_prompt="很长的提示词")
+
+    assert window.max_tokens == 0
+    assert window.fit(messages) == messages
+
+
+def test_drops_oldest_turns_with_tool_messages():
+    messages = conversation()
+    last_two_turns = messages[3:]
+
+    fitted = ContextWindow(max_tokens=tokens(messages[:1] + last_two_turns)).fit(messages)
+
+    # 系统消息保留，第一轮整体丢弃，第二轮的工具调用和工具结果一起保留
+    assert fitted == messages[:1] + last_two_turns
+
+    fitted = ContextWindow(max_tokens=tokens(messages[:1] + last_two_turns) - 1).fit(messages)
+    assert fitted == [messages[0], messages[-1]]
+
+
+def test_latest_turn_always_kept():
+    messages = [user("很长的问题 " * 200)]
+
+    assert ContextWindow(max_tokens=1).fit(messages) == messages
+
+
+def test_truncate_tool_output():
+    long_output = "开头" + "中间内容 " * 2000 + "结尾"
+    messages = [
+        SystemMessage("你是助手"),
+        HumanMessage("问题"),
+        AIMessage("", tool_calls=[{"name": "search", "args": {}, "id": "call-1"}]),
+        ToolMessage(long_output, tool_call_id="call-1"),
+    ]
+
+    fitted = ContextWindow(max_tool_output_tokens=100).fit(messages)
+
+    truncated = fitted[-1].content
+    assert truncated.startswith("开头") and truncated.endswith("结尾") and "已截断" in truncated
+    assert count_text_tokens(truncated) < count_text_tokens(long_output) // 10
+    # 不修改传入的消息，其他消息保持原对象
+    assert messages[-1].content == long_output
+    assert fitted[:3] == messages[:3] and fitted[1] is messages[1]
+
+
+def test_token_count_cache(monkeypatch):
+    calls = []
+    count = context_window_module._estimator.count
+    monkeypatch.setattr(context_window_module._estimator, "count", lambda text: calls.append(text) or count(text))
+
+    text = "缓存的长文本 " * 100
+    first = count_text_tokens(text)
+
+    assert count_text_tokens(text) == first and len(calls) == 1
+    # 短文本不缓存
+    count_text_tokens("短文本")
+    count_text_tokens("短文本")
+    assert len(calls) == 3
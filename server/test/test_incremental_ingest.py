@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from src.core.lightrag_based_kb import LightRagBasedKB
+from src.core.retrieval_cache import RetrievalCache
+
+
+DB_ID = "kb_test"
+
+
+class FakeRAG:
+    """记录插入和删除的文档 ID，代替 LightRAG 实例"""
+
+    def __init__(self):
+        self.docs = {}
+        self.inserted = []
+        self.deleted = []
+
+    async def ainsert(self, input, ids, file_paths):
+        self.inserted.extend(ids)
+        self.docs.update(zip(ids, input))
+
+    async def adelete_by_doc_id(self, doc_id):
+        self.deleted.append(doc_id)
+        self.docs.pop(doc_id, None)
+
+
+@pytest.fixture
+def kb(tmp_path):
+    kb = LightRagBasedKB.__new__(LightRagBasedKB)
+    kb.work_dir = str(tmp_path / "kb")
+    kb.instances, kb.files_meta = {}, {}
+    kb.databases_meta = {DB_ID: {"name": "test", "description": ""}}
+    kb.retrieval_cache = RetrievalCache()
+    kb.rag = FakeRAG()
+
+    async def get_instance(db_id):
+        return kb.rag
+
+    kb._get_lightrag_instance = get_instance
+    return kb
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def add(kb, *paths, **params):
+    return asyncio.run(kb.add_content(DB_ID, list(paths), params={"content_type": "file", **params}))
+
+
+def record_of(kb, path):
+    return next(record for record in kb.files_meta.values() if record["path"] == path)
+
+
+def segments_of(kb, path):
+    return record_of(kb, path)["segments"]
+
+
+def test_unchanged_file_is_skipped(kb, tmp_path):
+    path = write(tmp_path, "a.txt", "内容 X")
+    first = add(kb, path)[0]
+    inserted = list(kb.rag.inserted)
+
+    second = add(kb, path)[0]
+
+    assert second["unchanged"] and second["file_id"] == first["file_id"]
+    assert kb.rag.inserted == inserted
+    # 解析参数变化时重新处理
+    assert not add(kb, path, chunk_size=100)[0].get("unchanged")
+
+
+def test_changed_file_replaces_segments(kb, tmp_path):
+    path = write(tmp_path, "a.txt", "内容 X")
+    file_id = add(kb, path)[0]["file_id"]
+    old_segments = segments_of(kb, path)
+
+    write(tmp_path, "a.txt", "内容 Y")
+    record = add(kb, path)[0]
+
+    assert record["file_id"] == file_id and record["status"] == "done"
+    assert set(kb.rag.deleted) == set(old_segments)
+    assert set(kb.rag.docs) == set(segments_of(kb, path))
+    assert "内容 Y" in "".join(kb.rag.docs.values())
+
+
+def test_path_changed_to_content_of_other_file(kb, tmp_path):
+    # A 原来是 X，重新同步后与 B 的内容相同：A 不能因为库中已有相同内容而被跳过
+    path_a = write(tmp_path, "a.txt", "内容 X")
+    path_b = write(tmp_path, "b.txt", "内容 B")
+    add(kb, path_a, path_b)
+    segments_a = segments_of(kb, path_a)
+
+    write(tmp_path, "a.txt", "内容 B")
+    record = add(kb, path_a)[0]
+
+    assert not record.get("unchanged")
+    assert record_of(kb, path_a)["content_hash"] == record_of(kb, path_b)["content_hash"]
+    # A 的旧片段已删除，B 的片段保持不变
+    assert set(segments_a) <= set(kb.rag.deleted)
+    assert not any(seg in kb.rag.docs for seg in segments_a)
+    assert set(segments_of(kb, path_b)) <= set(kb.rag.docs)
+
+
+def test_new_path_with_duplicate_content_gets_own_record(kb, tmp_path):
+    path_a = write(tmp_path, "a.txt", "相同的内容")
+    path_b = write(tmp_path, "b.txt", "相同的内容")
+    record_a = add(kb, path_a)[0]
+
+    record_b = add(kb, path_b)[0]
+
+    assert not record_b.get("unchanged")
+    assert record_b["file_id"] != record_a["file_id"]
+    assert {record["path"] for record in kb.files_meta.values()} == {path_a, path_b}
+    assert kb.files_meta[record_b["file_id"]]["status"] == "done"
+    # 删除其中一个文件不影响另一个文件的片段
+    asyncio.run(kb.delete_file(DB_ID, record_a["file_id"]))
+    assert set(segments_of(kb, path_b)) <= set(kb.rag.docs)
@@ -0,0 +1,53 @@
+from src.core.indexing import iter_file_chunks
+
+
+TEXT = "".join(
+    f"第{i}回 甄士隐梦幻识通灵，贾雨村风尘怀闺秀。Chapter {i} begins here. 此开卷第一回也！\n" + ("\n" if i % 3 == 0 else "")
+    for i in range(200)
+)
+
+
+def _write(tmp_path, text=TEXT):
+    path = tmp_path / "sample.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+
+def test_chunk_byte_offsets(tmp_path):
+    path = _write(tmp_path)
+    data = path.read_bytes()
+    chunks = list(iter_file_chunks(path, {"chunk_size": 120, "chunk_overlap": 20}))
+
+    assert len(chunks) > 1
+    for idx, chunk in enumerate(chunks):
+        meta = chunk["metadata"]
+        assert meta["chunk_idx"] == idx
+        assert meta["source"] == str(path)
+        assert data[meta["start_byte"] : meta["end_byte"]].decode("utf-8") == chunk["text"]
+        assert len(chunk["text"]) <= 120
+
+
+def test_chunks_cover_file_with_overlap(tmp_path):
+    path = _write(tmp_path)
+    data = path.read_bytes()
+    chunks = list(iter_file_chunks(path, {"chunk_size": 120, "chunk_overlap": 50}))
+
+    starts = [chunk["metadata"]["start_byte"] for chunk in chunks]
+    ends = [chunk["metadata"]["end_byte"] for chunk in chunks]
+    assert starts == sorted(starts)
+    # 相邻块之间只可能跳过空白，不会遗漏内容
+    assert all(not data[prev_end:start].strip() for start, prev_end in zip(starts[1:], ends))
+    assert any(start < prev_end for start, prev_end in zip(starts[1:], ends))
+    assert ends[-1] == len(TEXT.rstrip().encode("utf-8"))
+
+
+def test_buffer_size_does_not_change_chunks(tmp_path):
+    path = _write(tmp_path)
+    params = {"chunk_size": 100, "chunk_overlap": 30}
+
+    # 很小的缓冲区会在多字节字符中间截断，结果仍与一次性读取一致
+    assert list(iter_file_chunks(path, params, buffer_size=7)) == list(iter_file_chunks(path, params))
+
+
+def test_empty_file(tmp_path):
+    assert list(iter_file_chunks(_write(tmp_path, ""))) == []
@@ -0,0 +1,70 @@
+import os
+import json
+import importlib.util
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parents[1] / "scripts" / "mineru-api"
+# magic_pdf 在导入时读取配置文件，使用服务镜像中的同一份配置
+os.environ.setdefault("MINERU_TOOLS_CONFIG_JSON", str(APP_DIR / "magic-pdf.json"))
+
+pytest.importorskip("magic_pdf")
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """加载 scripts/mineru-api/app.py，用线程池和假的解析函数代替模型推理进程"""
+    spec = importlib.util.spec_from_file_location("mineru_api_app", APP_DIR / "app.py")
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+
+    groups = []
+
+    def parse_worker(documents, parse_method):
+        groups.append([name for name, _, _ in documents])
+        return [
+            {"file_name": name, "error": "bad file"} if data == b"bad" else {"file_name": name, "md_content": f"{parse_method}:{data.decode()}"}
+            for name, data, _ in documents
+        ]
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app, "_batch_parse_worker", parse_worker)
+    monkeypatch.setattr(app, "get_batch_pool", lambda: pool)
+    monkeypatch.setattr(app, "BATCH_SIZE", 2)
+    app.groups = groups
+    yield app
+    pool.shutdown()
+
+
+def upload(*names_and_data):
+    return [("files", (name, data, "application/pdf")) for name, data in names_and_data]
+
+
+def test_streams_one_line_per_document(api):
+    files = upload(("a.pdf", b"A"), ("b.pdf", b"bad"), ("c.pdf", b"C"))
+    response = TestClient(api.app).post("/batch_parse", files=files, data={"parse_method": "ocr"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(lines, key=lambda line: line["file_name"]) == [
+        {"file_name": "a", "md_content": "ocr:A"},
+        {"file_name": "b", "error": "bad file"},
+        {"file_name": "c", "md_content": "ocr:C"},
+    ]
+    # 按 MINERU_BATCH_SIZE 分组推理
+    assert sorted(api.groups) == [["a", "b"], ["c"]]
+    # 全部完成后释放排队名额
+    assert api._queued_documents == 0
+
+
+def test_rejects_when_queue_is_full(api, monkeypatch):
+    monkeypatch.setattr(api, "MAX_QUEUED_DOCUMENTS", 2)
+    response = TestClient(api.app).post("/batch_parse", files=upload(("a.pdf", b"A"), ("b.pdf", b"B"), ("c.pdf", b"C")))
+
+    assert response.status_code == 429 and response.headers["Retry-After"]
+    assert api.groups == [] and api._queued_documents == 0
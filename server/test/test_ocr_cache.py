@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from src.plugins._ocr import OCRPlugin
+from src.plugins.ocr_cache import OCRCache, page_fingerprint
+
+
+def test_get_set_and_stats(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    key = OCRCache.make_key("onnx_rapid_ocr", "dpi=144", "fp")
+
+    assert cache.get(key) is None
+    cache.set(key, "识别结果")
+
+    assert cache.get(key) == "识别结果"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    # 引擎或参数不同时缓存键不同
+    assert key != OCRCache.make_key("onnx_rapid_ocr", "dpi=200", "fp")
+    assert key != OCRCache.make_key("paddlex_ocr", "dpi=144", "fp")
+
+
+def test_overwrite_counts_size_once(tmp_path):
+    cache = OCRCache(str(tmp_path))
+    cache.set("a" * 64, "x" * 10)
+    cache.set("a" * 64, "x" * 30)
+
+    assert cache.stats()["total_bytes"] == 30
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = OCRCache(str(tmp_path), max_bytes=250)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.set(key, "x" * 100)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    # 访问第一个条目后，第二个条目成为最久未访问的条目
+    assert cache.get(keys[0]) is not None
+
+    cache.set(keys[2], "x" * 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()["total_bytes"] <= 250 * 0.9
+
+
+def make_pdf(path, texts):
+    fitz = pytest.importorskip("fitz")
+    with fitz.open() as doc:
+        for text in texts:
+            doc.new_page(width=200, height=100).insert_text((10, 50), text)
+        doc.save(str(path))
+    return str(path)
+
+
+def test_page_fingerprint_follows_page_content(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    old = make_pdf(tmp_path / "v1.pdf", ["page a", "page b"])
+    new = make_pdf(tmp_path / "v2.pdf", ["page new", "page a", "page b changed"])
+
+    with fitz.open(old) as v1, fitz.open(new) as v2:
+        # 页面位置变化不影响指纹，内容变化时指纹不同
+        assert page_fingerprint(v1[0]) == page_fingerprint(v2[1])
+        assert page_fingerprint(v1[1]) != page_fingerprint(v2[2])
+
+
+def test_only_missing_pages_are_sent_to_engine(tmp_path, monkeypatch):
+    pytest.importorskip("fitz")
+    pdf_path = make_pdf(tmp_path / "doc.pdf", ["p0", "p1", "p2"])
+    plugin = OCRPlugin(cache_dir=str(tmp_path / "cache"))
+    sent = []
+
+    def run_engine(pdf_path, pages, engine="onnx_rapid_ocr", progress_callback=None):
+        sent.append(list(pages))
+        return {pg: f"{engine}-{pg}" for pg in pages}
+
+    monkeypatch.setattr(plugin, "_run_ocr_engine", run_engine)
+
+    assert plugin._ocr_pages(pdf_path, [0, 1], "paddlex_ocr") == {0: "paddlex_ocr-0", 1: "paddlex_ocr-1"}
+    assert plugin._ocr_pages(pdf_path, [0, 1, 2], "paddlex_ocr") == {pg: f"paddlex_ocr-{pg}" for pg in range(3)}
+    # 不同引擎的缓存互不影响
+    plugin._ocr_pages(pdf_path, [0], "onnx_rapid_ocr")
+
+    assert sent == [[0, 1], [2], [0]]
@@ -0,0 +1,166 @@
+import json
+import base64
+import asyncio
+import functools
+
+import httpx
+import pytest
+
+from src.plugins import ocr_client
+from src.plugins._ocr import OCRPlugin
+from src.plugins.ocr_client import MinerUAPIClient, OCRServiceClient, PaddleXClient, content_list_to_pages
+
+fitz = pytest.importorskip("fitz")
+
+
+def make_pdf(path, pages):
+    with fitz.open() as doc:
+        for i in range(pages):
+            doc.new_page(width=100, height=100).insert_text((10, 50), f"page {i}")
+        doc.save(str(path))
+    return str(path)
+
+
+class PaddleXService:
+    """模拟 PaddleX serving，每页返回 "p{页码}"，记录收到的请求"""
+
+    def __init__(self, healthy=True, drop_pages=0):
+        self.healthy = healthy
+        self.drop_pages = drop_pages
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        if request.url.path == "/health":
+            self.requests.append(("health", None))
+            return httpx.Response(200 if self.healthy else 503, text="ok")
+
+        body = json.loads(request.read())
+        pdf = base64.b64decode(body["file"])
+        with fitz.open(stream=pdf, filetype="pdf") as doc:
+            texts = [page.get_text().strip() for page in doc]
+        self.requests.append(("parse", texts, body, request.headers["Content-Length"], len(request.content)))
+        pages = [{"markdown": {"text": text}} for text in texts[: len(texts) - self.drop_pages]]
+        return httpx.Response(200, json={"errorCode": 0, "result": {"layoutParsingResults": pages}})
+
+    @property
+    def parses(self):
+        return [request[1] for request in self.requests if request[0] == "parse"]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = PaddleXService()
+    monkeypatch.setattr(
+        ocr_client.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(service))
+    )
+    return service
+
+
+def test_client_is_abstract():
+    with pytest.raises(TypeError):
+        OCRServiceClient("http://ocr")
+
+
+def test_paddlex_streams_json_body(service, tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 3)
+    client = PaddleXClient("http://paddlex")
+
+    result = client.analyze_pages_sync(pdf_path, [0, 1, 2])
+
+    assert result == {0: "page 0", 1: "page 1", 2: "page 2"}
+    _, texts, body, content_length, received = service.requests[1]
+    # 整个文档直接上传原文件，Content-Length 与流式生成的请求体一致
+    assert base64.b64decode(body["file"]) == open(pdf_path, "rb").read()
+    assert body["fileType"] == 0 and int(content_length) == received
+
+
+def test_default_sends_pages_in_one_request(service, tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 5)
+    client = PaddleXClient("http://paddlex")
+
+    async def run():
+        return await client.analyze_pages(pdf_path, [4, 1, 3])
+
+    assert asyncio.run(run()) == {1: "page 1", 3: "page 3", 4: "page 4"}
+    assert service.parses == [["page 1", "page 3", "page 4"]]
+
+
+def test_pages_per_request_splits(service, tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 5)
+    client = PaddleXClient("http://paddlex", pages_per_request=2)
+
+    result = client.analyze_pages_sync(pdf_path, range(5))
+
+    assert result == {pg: f"page {pg}" for pg in range(5)}
+    assert sorted(service.parses) == [["page 0", "page 1"], ["page 2", "page 3"], ["page 4"]]
+
+
+def test_health_check_is_cached(service, tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 1)
+    client = PaddleXClient("http://paddlex")
+    client.analyze_pages_sync(pdf_path, [0])
+    client.analyze_pages_sync(pdf_path, [0])
+
+    assert [request[0] for request in service.requests] == ["health", "parse", "parse"]
+
+
+def test_unhealthy_service(service, tmp_path):
+    service.healthy = False
+    with pytest.raises(RuntimeError):
+        PaddleXClient("http://paddlex").analyze_pages_sync(make_pdf(tmp_path / "doc.pdf", 1), [0])
+
+
+def test_page_count_mismatch_raises(service, tmp_path):
+    service.drop_pages = 1
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 3)
+    client = PaddleXClient("http://paddlex")
+
+    # 返回的页数与请求不一致时报错，不返回错位或空白的页面
+    with pytest.raises(RuntimeError):
+        client.analyze_pages_sync(pdf_path, [0, 1, 2])
+
+
+def test_plugin_sync_and_async_send_same_requests(service, tmp_path, monkeypatch):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 12)
+    monkeypatch.delenv("OCR_SERVICE_PAGES_PER_REQUEST", raising=False)
+    plugin = OCRPlugin(cache_size_mb=0)
+
+    sync_result = plugin._ocr_pages(pdf_path, list(range(12)), "paddlex_ocr")
+    async_result = asyncio.run(plugin._aocr_pages(pdf_path, list(range(12)), "paddlex_ocr"))
+
+    # 同步和异步路径都在一个请求中发送整个文档
+    assert sync_result == async_result == {pg: f"page {pg}" for pg in range(12)}
+    assert len(service.parses) == 2
+
+
+def test_mineru_content_list(monkeypatch, tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 2)
+    forms = []
+
+    def handler(request: httpx.Request):
+        if request.url.path == "/health":
+            return httpx.Response(200)
+        forms.append(request.read())
+        content_list = [
+            {"page_idx": 0, "type": "text", "text": "标题", "text_level": 1},
+            {"page_idx": 1, "type": "table", "table_body": "<table></table>"},
+            {"page_idx": 0, "type": "text", "text": "正文"},
+        ]
+        return httpx.Response(200, json={"content_list": content_list})
+
+    monkeypatch.setattr(
+        ocr_client.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(handler))
+    )
+
+    result = MinerUAPIClient("http://mineru").analyze_pages_sync(pdf_path, [0, 1])
+
+    assert result == {0: "# 标题\n\n正文", 1: "<table></table>"}
+    assert b'name="return_content_list"' in forms[0] and b'filename="doc.pdf"' in forms[0]
+
+
+def test_content_list_to_pages():
+    content_list = [{"page_idx": 1, "type": "image", "img_caption": ["图 1"]}, {"page_idx": 0, "text": "a"}]
+    assert content_list_to_pages(content_list, 3) == ["a", "图 1", ""]
+
+    with pytest.raises(ValueError):
+        content_list_to_pages([{"page_idx": 3, "text": "a"}], 2)
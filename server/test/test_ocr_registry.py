@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from src.plugins.ocr_registry import OCRModelRegistry
+
+
+@pytest.fixture
+def registry():
+    loads = []
+    started = threading.Event()
+
+    def loader(det_box_thresh=0.3, intra_op_num_threads=-1):
+        started.wait(timeout=1)
+        loads.append((det_box_thresh, intra_op_num_threads))
+        return object()
+
+    registry = OCRModelRegistry()
+    registry.register("fake_ocr", loader)
+    registry.loads, registry.started = loads, started
+    return registry
+
+
+def test_concurrent_get_loads_once(registry):
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get("fake_ocr"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    registry.started.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(registry.loads) == 1
+    assert len({id(model) for model in models}) == 1
+
+
+def test_default_params_share_model(registry):
+    registry.started.set()
+    # 显式传入默认值与不传参数使用同一个模型，参数不同时单独加载
+    assert registry.get("fake_ocr") is registry.get("fake_ocr", det_box_thresh=0.3)
+    assert registry.get("fake_ocr", det_box_thresh=0.5) is not registry.get("fake_ocr")
+    assert registry.loads == [(0.3, -1), (0.5, -1)]
+    assert registry.is_loaded("fake_ocr", intra_op_num_threads=-1)
+
+
+def test_unknown_model_and_params(registry):
+    with pytest.raises(ValueError):
+        registry.get("missing")
+    with pytest.raises(TypeError):
+        registry.get("fake_ocr", unknown=1)
+
+
+def test_preload(registry, monkeypatch):
+    registry.started.set()
+    monkeypatch.setenv("OCR_PRELOAD", "fake_ocr, missing")
+
+    # 加载失败的模型只记录日志，不影响其他模型
+    registry.preload(background=False)
+    assert registry.is_loaded("fake_ocr")
+
+    registry.clear()
+    registry.preload(["fake_ocr"], background=True).join()
+    assert len(registry.loads) == 2
+
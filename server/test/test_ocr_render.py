@@ -0,0 +1,61 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+np = pytest.importorskip("numpy")
+
+from src.plugins._ocr import OCRPlugin
+from workers.ocr_worker import render_page_array
+
+
+def make_pdf(path, pages=3, color=(1, 0, 0)):
+    with fitz.open() as doc:
+        for _ in range(pages):
+            page = doc.new_page(width=72, height=36)
+            page.draw_rect(page.rect, color=color, fill=color)
+        doc.save(path)
+    return str(path)
+
+
+class FakeEngine:
+    """记录传入的图片，代替 RapidOCR"""
+
+    def __init__(self):
+        self.images = []
+
+    def __call__(self, image):
+        self.images.append(image)
+        return [[None, f"text-{len(self.images)}", 0.9]], None
+
+
+def test_render_page_array_is_bgr(tmp_path):
+    pdf_path = make_pdf(tmp_path / "red.pdf", pages=1)
+    with fitz.open(pdf_path) as doc:
+        pix, array = render_page_array(doc[0], dpi=144)
+
+    assert array.shape == (pix.height, pix.width, 3) == (72, 144, 3)
+    assert array.dtype == np.uint8 and array.flags["C_CONTIGUOUS"]
+    # RapidOCR 使用 OpenCV 的 BGR 通道顺序，红色页面的最后一个通道为 255
+    assert tuple(array[36, 72]) == (0, 0, 255)
+
+
+def test_render_dpi(tmp_path):
+    pdf_path = make_pdf(tmp_path / "doc.pdf", pages=1)
+    with fitz.open(pdf_path) as doc:
+        _, array = render_page_array(doc[0], dpi=72)
+    assert array.shape == (36, 72, 3)
+
+
+def test_single_process_pages_are_arrays(tmp_path):
+    pytest.importorskip("tqdm")
+    pdf_path = make_pdf(tmp_path / "doc.pdf", pages=3)
+    plugin = OCRPlugin(num_workers=1, render_dpi=72, cache_size_mb=0)
+    plugin.ocr = FakeEngine()
+    progress = []
+
+    results = list(plugin.iter_pdf_pages(pdf_path, progress_callback=lambda *args: progress.append(args), pages=[2, 0]))
+
+    # 按页码顺序输出，页面以 ndarray 直接传给 OCR 引擎，不经过临时图片文件
+    assert results == [(0, "text-1"), (2, "text-2")]
+    assert all(isinstance(image, np.ndarray) for image in plugin.ocr.images)
+    assert progress == [(1, 2), (2, 2)]
+    assert list(tmp_path.iterdir()) == [tmp_path / "doc.pdf"]
@@ -0,0 +1,84 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from workers import ocr_worker
+
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_worker_module_does_not_import_src():
+    # OCR 进程池使用 spawn 启动 worker，worker 只应导入 workers.ocr_worker，不能执行 src/__init__.py
+    code = "import sys, workers.ocr_worker; print(sorted(m for m in sys.modules if m.split('.')[0] == 'src'))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_init_worker_loads_model_once(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(ocr_worker, "_load_rapid_ocr", lambda **params: loaded.append(params) or "model")
+    monkeypatch.setattr(ocr_worker, "_worker_ocr", None)
+
+    ocr_worker._init_ocr_worker(0.5, 2, 1)
+
+    assert ocr_worker._worker_ocr == "model"
+    assert loaded == [{"det_box_thresh": 0.5, "intra_op_num_threads": 2, "inter_op_num_threads": 1}]
+
+
+def test_ocr_page_range_requires_model(monkeypatch):
+    monkeypatch.setattr(ocr_worker, "_worker_ocr", None)
+    with pytest.raises(RuntimeError):
+        ocr_worker._ocr_page_range("missing.pdf", [0])
+
+
+def test_prefetch_keeps_order_and_raises():
+    assert list(ocr_worker._prefetch(iter(range(10)), depth=2)) == list(range(10))
+
+    def failing():
+        yield 1
+        raise ValueError("render failed")
+
+    items = ocr_worker._prefetch(failing())
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def test_prefetch_stops_producer_when_consumer_exits():
+    produced = []
+
+    def pages():
+        for pg in range(100):
+            produced.append(pg)
+            yield pg
+
+    items = ocr_worker._prefetch(pages(), depth=2)
+    assert next(items) == 0
+    items.close()
+
+    # 消费者提前退出后生产者线程结束，不会渲染全部页面
+    assert len(produced) < 100
+
+
+def test_ocr_page_range_with_engine(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("numpy")
+    pdf_path = str(tmp_path / "doc.pdf")
+    with fitz.open() as doc:
+        for _ in range(3):
+            doc.new_page(width=72, height=72)
+        doc.save(pdf_path)
+
+    shapes = []
+
+    def engine(array):
+        shapes.append(array.shape)
+        return [[None, f"page-{len(shapes)}", 0.9]], None
+
+    results = ocr_worker._ocr_page_range(pdf_path, [2, 0], dpi=144, ocr_engine=engine)
+
+    assert results == [(2, "page-1"), (0, "page-2")]
+    assert shapes == [(144, 144, 3)] * 2
@@ -0,0 +1,116 @@
+import os
+import sys
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from src.core.parsing_service import ParsingError, ParsingService
+
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+
+
+class ProcessRecorder:
+    """记录解析服务创建的子进程"""
+
+    def __init__(self, context):
+        self.context = context
+        self.processes = []
+
+    def Process(self, **kwargs):
+        process = self.context.Process(**kwargs)
+        self.processes.append(process)
+        return process
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ParsingService(timeout=30, tmp_dir=str(tmp_path))
+    service._mp_context = ProcessRecorder(service._mp_context)
+    return service
+
+
+def hanging_file(tmp_path):
+    # 没有写入端的命名管道，打开时会一直阻塞，模拟卡死的解析器
+    pytest.importorskip("docx")
+    path = tmp_path / "hang.docx"
+    os.mkfifo(path)
+    return str(path)
+
+
+def test_worker_module_does_not_import_src():
+    code = "import sys, workers.parsing_worker; print(sorted(m for m in sys.modules if m.split('.')[0] == 'src'))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_parse_pdf(service, tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("langchain_community")
+    pdf_path = str(tmp_path / "doc.pdf")
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "hello parser")
+        doc.save(pdf_path)
+
+    assert "hello parser" in asyncio.run(service.parse(pdf_path))
+    # 临时结果文件已删除，子进程资源已释放
+    assert sorted(os.listdir(tmp_path)) == ["doc.pdf"]
+    assert service._mp_context.processes[0]._closed
+
+
+def test_parser_error(service, tmp_path):
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"not a docx")
+
+    with pytest.raises(ParsingError, match="Failed to parse"):
+        asyncio.run(service.parse(str(path)))
+    assert sorted(os.listdir(tmp_path)) == ["broken.docx"]
+
+
+def test_timeout_kills_worker(service, tmp_path):
+    service.timeout = 0.5
+
+    with pytest.raises(ParsingError, match="timed out"):
+        asyncio.run(service.parse(hanging_file(tmp_path)))
+    assert service._mp_context.processes[0]._closed
+
+
+def test_cancel_kills_and_reaps_worker(service, tmp_path):
+    path = hanging_file(tmp_path)
+
+    async def run():
+        task = asyncio.create_task(service.parse(path))
+        while not service._mp_context.processes or service._mp_context.processes[0].pid is None:
+            await asyncio.sleep(0.01)
+        pid = service._mp_context.processes[0].pid
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 子进程在后台 join 返回后回收
+        for _ in range(100):
+            if service._mp_context.processes[0]._closed:
+                break
+            await asyncio.sleep(0.01)
+        return pid
+
+    pid = asyncio.run(run())
+
+    assert service._mp_context.processes[0]._closed
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_memory_limit():
+    code = (
+        "from workers.parsing_worker import _limit_memory\n"
+        "_limit_memory(256)\n"
+        "try:\n"
+        "    bytearray(512 * 1024 * 1024)\n"
+        "except MemoryError:\n"
+        "    print('MemoryError')\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, capture_output=True, text=True)
+    assert output.stdout.strip() == "MemoryError"
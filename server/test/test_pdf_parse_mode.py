@@ -0,0 +1,49 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.core import indexing
+from src.core.lightrag_based_kb import LightRagBasedKB
+from src.plugins import ocr
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """记录 parse_pdf 选择的解析方式，不实际执行 OCR"""
+    seen = []
+    monkeypatch.setattr(ocr, "process_pdf_hybrid", lambda file, engine: seen.append(("hybrid", engine)))
+    monkeypatch.setattr(ocr, "process_pdf", lambda file: seen.append(("ocr", "onnx_rapid_ocr")))
+    monkeypatch.setattr(ocr, "process_pdf_mineru", lambda file: seen.append(("ocr", "mineru_ocr")))
+    monkeypatch.setattr(ocr, "process_pdf_paddlex", lambda file: seen.append(("ocr", "paddlex_ocr")))
+
+    async def aprocess_pdf(file, engine, hybrid):
+        seen.append(("hybrid" if hybrid else "ocr", engine))
+
+    monkeypatch.setattr(ocr, "aprocess_pdf", aprocess_pdf)
+    return seen
+
+
+@pytest.mark.parametrize(
+    "params, expected",
+    [
+        ({"enable_ocr": "onnx_rapid_ocr"}, ("hybrid", "onnx_rapid_ocr")),
+        # 远程引擎默认对整个文档执行 OCR，与之前的解析结果保持一致
+        ({"enable_ocr": "mineru_ocr"}, ("ocr", "mineru_ocr")),
+        ({"enable_ocr": "paddlex_ocr"}, ("ocr", "paddlex_ocr")),
+        ({"enable_ocr": "mineru_ocr", "pdf_parse_mode": "hybrid"}, ("hybrid", "mineru_ocr")),
+        ({"enable_ocr": "onnx_rapid_ocr", "pdf_parse_mode": "ocr"}, ("ocr", "onnx_rapid_ocr")),
+    ],
+)
+def test_default_parse_mode(calls, params, expected):
+    indexing.parse_pdf(Path("doc.pdf"), params=params)
+    asyncio.run(indexing.parse_pdf_async(Path("doc.pdf"), params=params))
+
+    assert calls == [expected, expected]
+
+
+def test_default_mode_keeps_content_hash():
+    # 未显式指定 pdf_parse_mode 时内容哈希与之前相同，已入库的文件不会被重新处理
+    params = {"enable_ocr": "mineru_ocr", "chunk_size": 500}
+    assert LightRagBasedKB._content_hash("raw", params) == LightRagBasedKB._content_hash("raw", params | {"pdf_parse_mode": None})
+    assert LightRagBasedKB._content_hash("raw", params) != LightRagBasedKB._content_hash("raw", params | {"pdf_parse_mode": "hybrid"})
@@ -0,0 +1,79 @@
+from src.core.retrieval_cache import RetrievalCache, normalize_query
+from src.utils import cache as cache_module
+
+
+PARAMS = {"mode": "mix", "top_k": 10}
+
+
+def test_key_normalizes_query_and_params():
+    cache = RetrievalCache()
+    cache.set("kb_a", "  Hello\n  World ", PARAMS, "context")
+
+    assert normalize_query("  Hello\n  World ") == "hello world"
+    assert cache.get("kb_a", "hello world", {"top_k": 10, "mode": "mix"}) == "context"
+    assert cache.get("kb_a", "hello world", {"mode": "mix", "top_k": 5}) is None
+    assert cache.get("kb_b", "hello world", PARAMS) is None
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = RetrievalCache(ttl=10)
+    cache.set("kb_a", "q", PARAMS, "context")
+
+    now[0] += 5
+    assert cache.get("kb_a", "q", PARAMS) == "context"
+    now[0] += 10
+    assert cache.get("kb_a", "q", PARAMS) is None
+
+
+def test_maxsize_eviction():
+    cache = RetrievalCache(maxsize=2)
+    for query in ("q1", "q2", "q3"):
+        cache.set("kb_a", query, PARAMS, query)
+
+    assert cache.get("kb_a", "q1", PARAMS) is None
+    assert cache.get("kb_a", "q3", PARAMS) == "q3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_only_affects_one_kb():
+    cache = RetrievalCache()
+    notified = []
+    cache.add_invalidation_listener(notified.append)
+    cache.set("kb_a", "q", PARAMS, "a")
+    cache.set("kb_b", "q", PARAMS, "b")
+
+    assert cache.invalidate("kb_a") == 1
+    assert cache.get("kb_a", "q", PARAMS) is None
+    assert cache.get("kb_b", "q", PARAMS) == "b"
+    assert notified == ["kb_a"]
+
+
+def test_stale_write_after_invalidation_is_dropped():
+    cache = RetrievalCache()
+    # 查询开始时的版本号
+    generation = cache.generation("kb_a")
+    other_generation = cache.generation("kb_b")
+    cache.invalidate("kb_a")
+
+    assert cache.set("kb_a", "q", PARAMS, "stale", generation=generation) is False
+    assert cache.get("kb_a", "q", PARAMS) is None
+    # 其他知识库的版本号不受影响
+    assert cache.set("kb_b", "q", PARAMS, "fresh", generation=other_generation) is True
+    assert cache.set("kb_a", "q", PARAMS, "fresh", generation=cache.generation("kb_a")) is True
+    assert cache.get("kb_a", "q", PARAMS) == "fresh"
+
+
+def test_stats():
+    cache = RetrievalCache()
+    cache.set("kb_a", "q", PARAMS, "context")
+    cache.get("kb_a", "q", PARAMS)
+    cache.get("kb_a", "missing", PARAMS)
+    generation = cache.generation("kb_a")
+    cache.invalidate("kb_a")
+    cache.set("kb_a", "q", PARAMS, "stale", generation=generation)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["invalidations"] == 1 and stats["stale_writes"] == 1 and stats["size"] == 0
@@ -0,0 +1,60 @@
+from src.core.retrieval_merge import dedupe_entries, interleave, parse_context
+
+
+CONTEXT = """-----Entities(KG)-----
+
+```json
+[{"id": 1, "entity": "贾宝玉", "description": "荣国府公子", "rank": 3}]
+```
+
+-----Document Chunks(DC)-----
+
+```json
+[{"id": 1, "content": "宝玉摔玉", "created_at": "2024-01-01"}, {"id": 2, "content": "黛玉进府"}]
+```
+"""
+
+
+def test_parse_context_sections():
+    entries = parse_context(CONTEXT, "kb_a")
+
+    assert [entry["section"] for entry in entries] == ["Entities(KG)", "Document Chunks(DC)", "Document Chunks(DC)"]
+    assert [entry["text"] for entry in entries] == ["贾宝玉: 荣国府公子", "宝玉摔玉", "黛玉进府"]
+    assert all(entry["source"] == "kb_a" for entry in entries)
+    # 不同知识库之间不可比较的字段会被去掉
+    assert entries[0]["data"] == {"entity": "贾宝玉", "description": "荣国府公子"}
+    assert entries[1]["data"] == {"content": "宝玉摔玉"}
+
+
+def test_parse_context_plain_text():
+    entries = parse_context("第一段\n\n  \n第二段\n", "kb_a")
+
+    assert [(entry["section"], entry["text"]) for entry in entries] == [("Context", "第一段"), ("Context", "第二段")]
+    assert parse_context("", "kb_a") == []
+
+
+def test_parse_context_invalid_json():
+    entries = parse_context("-----Sources-----\n```json\nnot json\n```", "kb_a")
+
+    assert [(entry["section"], entry["text"]) for entry in entries] == [("Sources", "not json")]
+
+
+def test_interleave():
+    groups = [["a1", "a2", "a3"], [], ["c1"], ["d1", "d2"]]
+
+    assert interleave(groups) == ["a1", "c1", "d1", "a2", "d2", "a3"]
+    assert interleave([]) == []
+
+
+def test_dedupe_entries():
+    entries = [
+        {"section": "DC", "text": "Hello  World", "source": "kb_a"},
+        {"section": "DC", "text": " hello world ", "source": "kb_b"},
+        {"section": "KG", "text": "hello world", "source": "kb_b"},
+        {"section": "DC", "text": "another", "source": "kb_b"},
+    ]
+
+    result = dedupe_entries(entries)
+
+    # 规范化后相同的文本只保留首次出现的条目，不同分区分别去重
+    assert [(entry["section"], entry["source"]) for entry in result] == [("DC", "kb_a"), ("KG", "kb_b"), ("DC", "kb_b")]
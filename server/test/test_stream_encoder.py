@@ -0,0 +1,88 @@
+import json
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+from src.utils.stream_encoder import StreamEncoder
+
+
+METADATA = {"langgraph_node": "llm"}
+
+
+def _lines(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+def _chunks(msg_id, *contents):
+    return [AIMessageChunk(id=msg_id, content=content) for content in contents]
+
+
+def test_legacy_format():
+    encoder = StreamEncoder(request_id="req", format="legacy")
+    lines = _lines(b"".join(encoder.encode(msg, METADATA) for msg in _chunks("m1", "你", "好")))
+
+    assert [line["response"] for line in lines] == ["你", "好"]
+    assert all(line["request_id"] == "req" and line["status"] == "loading" for line in lines)
+    assert all(line["msg"]["id"] == "m1" and line["metadata"] == METADATA for line in lines)
+
+
+def test_delta_format():
+    encoder = StreamEncoder(request_id="req", format="delta")
+    messages = _chunks("m1", "你", "好") + _chunks("m2", "再见")
+    messages.append(AIMessageChunk(id="m2", content="", tool_call_chunks=[{"name": "search", "args": "{", "id": "c1", "index": 0}]))
+    lines = _lines(b"".join(encoder.encode(msg, METADATA) for msg in messages))
+
+    # 每条消息的第一行是完整格式，之后只输出增量
+    assert lines[0]["response"] == "你" and lines[0]["msg"]["id"] == "m1"
+    assert lines[1] == {"delta": "好"}
+    assert lines[2]["response"] == "再见" and lines[2]["msg"]["id"] == "m2"
+    assert lines[3]["delta"] == "" and lines[3]["tool_call_chunks"][0]["name"] == "search"
+
+
+def test_delta_format_non_chunk_messages():
+    encoder = StreamEncoder(format="delta")
+    tool_message = ToolMessage(content="结果", tool_call_id="c1", id="t1")
+    data = encoder.encode(AIMessageChunk(id="m1", content="a"), METADATA) + encoder.encode(tool_message, METADATA)
+    data += encoder.encode(AIMessageChunk(id="m1", content="b"), METADATA)
+    lines = _lines(data)
+
+    assert lines[1]["response"] is None and lines[1]["msg"]["content"] == "结果"
+    # 中间插入了其他消息，同一 id 的后续 token 重新输出完整格式
+    assert lines[2]["response"] == "b"
+
+
+def test_coalesce_merges_tokens():
+    encoder = StreamEncoder(format="delta", coalesce_ms=60_000)
+    data = b"".join(encoder.encode(msg, METADATA) for msg in _chunks("m1", "你", "好", "吗"))
+    assert data == b""
+
+    # 消息 id 变化时先输出合并中的 token
+    data = encoder.encode(AIMessageChunk(id="m2", content="新"), METADATA)
+    assert [line["response"] for line in _lines(data)] == ["你好吗"]
+    assert [line["response"] for line in _lines(encoder.flush())] == ["新"]
+    assert encoder.flush() == b""
+
+
+def test_encode_messages_coalesce():
+    async def messages():
+        for msg in _chunks("m1", "a", "b", "c"):
+            yield msg, METADATA
+        await asyncio.sleep(0.05)
+        for msg in _chunks("m1", "d", "e"):
+            yield msg, METADATA
+
+    async def collect():
+        encoder = StreamEncoder(format="delta", coalesce_ms=20)
+        return [data async for data in encoder.encode_messages(messages())]
+
+    lines = [line for data in asyncio.run(collect()) for line in _lines(data)]
+
+    # 时间窗口到期后即使没有新消息也会输出，之后的 token 以增量格式输出
+    assert lines[0]["response"] == "abc"
+    assert lines[1:] == [{"delta": "de"}]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        StreamEncoder(format="sse")
@@ -0,0 +1,62 @@
+import pytest
+
+from src.core.text_splitter import FastTextSplitter, TokenEstimator
+
+
+CJK_TEXT = "".join(f"第{i}句，贾宝玉与林黛玉在大观园中读书。“你看这诗如何？”她问道。\n" for i in range(60))
+
+
+def _check_spans(text, spans, max_length, length=len):
+    previous_start = -1
+    for start, end in spans:
+        assert 0 <= start < end <= len(text)
+        assert start > previous_start
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert length(chunk) <= max_length
+        previous_start = start
+
+
+def test_cjk_split_at_sentence_end():
+    splitter = FastTextSplitter(chunk_size=100, chunk_overlap=20)
+    spans = splitter.split_spans(CJK_TEXT)
+
+    _check_spans(CJK_TEXT, spans, 100)
+    # 块在句末标点（含后引号）或换行处结束，不截断句子
+    assert all(CJK_TEXT[end - 1] in "。！？”" for _, end in spans)
+    assert splitter.split_text(CJK_TEXT) == [CJK_TEXT[start:end] for start, end in spans]
+
+
+def test_chunks_cover_text():
+    splitter = FastTextSplitter(chunk_size=80, chunk_overlap=10)
+    spans = splitter.split_spans(CJK_TEXT)
+
+    # 相邻块之间只可能跳过空白
+    assert all(not CJK_TEXT[prev_end:start].strip() for (_, prev_end), (start, _) in zip(spans, spans[1:]))
+    assert spans[0][0] == 0 and spans[-1][1] == len(CJK_TEXT.rstrip())
+
+
+def test_token_unit():
+    estimator = TokenEstimator(cjk_weight=1.0, other_weight=0.25)
+    splitter = FastTextSplitter(chunk_size=50, chunk_overlap=10, length_unit="token", estimator=estimator)
+    text = CJK_TEXT + "The quick brown fox jumps over the lazy dog. " * 40
+
+    for chunk in splitter.split_text(text):
+        assert estimator.count(chunk) <= 50
+
+
+def test_lone_surrogates():
+    # 截断的 emoji 会留下单独的代理字符，不能导致编码失败或块偏移错位
+    text = "前半句\ud83d后半句。" * 30 + "结尾\udc00"
+    for length_unit, length in (("char", len), ("token", TokenEstimator().count)):
+        splitter = FastTextSplitter(chunk_size=30, chunk_overlap=5, length_unit=length_unit)
+        spans = splitter.split_spans(text)
+        _check_spans(text, spans, 30, length)
+        assert spans[-1][1] == len(text)
+
+    assert TokenEstimator().count("\ud83d") > 0
+
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        FastTextSplitter(chunk_size=10, chunk_overlap=10)
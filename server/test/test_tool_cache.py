@@ -0,0 +1,133 @@
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool, ToolException
+
+from config.app_config import AppConfig
+from src import knowledge_base
+from src.agents import tools_factory
+from src.agents.tool_cache import CachedTool, ToolResultCache
+from src.agents.tools_factory import MULTI_RETRIEVER_TOOL_NAME
+
+
+def counting_tool(name, fail=False):
+    """返回调用次数的工具，fail 为 True 时返回错误结果"""
+    calls = []
+
+    def run(query: str) -> str:
+        calls.append(query)
+        if fail:
+            raise ToolException("出错了")
+        return f"{name}:{query}:{len(calls)}"
+
+    return StructuredTool.from_function(run, name=name, description=name, handle_tool_error=True), calls
+
+
+def config(thread_id=None, user_id=None):
+    return {"configurable": {"thread_id": thread_id, "user_id": user_id}}
+
+
+def tool_call(query, call_id="call-1"):
+    return {"type": "tool_call", "name": "search", "args": {"query": query}, "id": call_id}
+
+
+def test_policy_lookup():
+    cache = ToolResultCache(
+        policies={
+            "search": {"ttl": 60, "scope": "user"},
+            "retrieve_*": {"ttl": 60},
+            "mcp:math": {"ttl": 60, "scope": "global"},
+            "disabled": {"ttl": 0},
+            "odd": {"ttl": 60, "scope": "session"},
+        }
+    )
+    tools = {name: counting_tool(name)[0] for name in ("search", "retrieve_kb", "add", "disabled", "odd", "other")}
+
+    wrapped = cache.wrap_tools(tools)
+    assert wrapped["search"].scope == "user"
+    assert wrapped["retrieve_kb"].scope == "thread"
+    assert cache.wrap(tools["add"], server_name="math").scope == "global"
+    # 未配置、ttl 为 0 的工具原样返回，未知的 scope 按 thread 处理
+    assert wrapped["other"] is tools["other"] and wrapped["disabled"] is tools["disabled"]
+    assert wrapped["odd"].scope == "thread"
+    assert cache.wrap(wrapped["search"]) is wrapped["search"]
+
+
+def test_scopes():
+    policies = {name: {"ttl": 60, "scope": name} for name in ("thread", "user", "global")}
+    cache = ToolResultCache(policies=policies)
+    tools = {}
+    for name in policies:
+        tool, calls = counting_tool(name)
+        tools[name] = (cache.wrap(tool), calls)
+
+    for tool, _ in tools.values():
+        tool.invoke({"query": "q"}, config("t1", "u1"))
+        tool.invoke({"query": " q "}, config("t1", "u1"))  # 参数规范化后命中
+        tool.invoke({"query": "q"}, config("t2", "u1"))
+        tool.invoke({"query": "q"}, config("t3", "u2"))
+
+    assert len(tools["thread"][1]) == 3
+    assert len(tools["user"][1]) == 2
+    assert len(tools["global"][1]) == 1
+
+
+def test_without_scope_id_not_cached():
+    cache = ToolResultCache(policies={"search": {"ttl": 60, "scope": "thread"}})
+    tool, calls = counting_tool("search")
+    tool = cache.wrap(tool)
+
+    tool.invoke({"query": "q"})
+    tool.invoke({"query": "q"}, config(user_id="u1"))
+
+    assert len(calls) == 2 and cache.stats()["hits"] == 0
+
+
+def test_tool_call_hit_returns_tool_message():
+    cache = ToolResultCache(policies={"search": {"ttl": 60, "scope": "thread"}})
+    tool, calls = counting_tool("search")
+    tool = cache.wrap(tool)
+
+    first = tool.invoke(tool_call("q", "call-1"), config("t1"))
+    second = tool.invoke(tool_call("q", "call-2"), config("t1"))
+
+    assert isinstance(second, ToolMessage) and len(calls) == 1
+    assert second.content == first.content and second.tool_call_id == "call-2"
+    assert second.response_metadata == {"cache_hit": True, "cache_scope": "thread"}
+    assert "cache_hit" not in first.response_metadata
+
+
+def test_error_results_not_cached():
+    cache = ToolResultCache(policies={"search": {"ttl": 60, "scope": "thread"}})
+    tool, calls = counting_tool("search", fail=True)
+    tool = cache.wrap(tool)
+
+    results = [tool.invoke(tool_call("q"), config("t1")) for _ in range(2)]
+
+    assert [result.status for result in results] == ["error", "error"] and len(calls) == 2
+
+
+def test_kb_change_invalidates_retriever_results(monkeypatch):
+    cache = ToolResultCache(policies={"retrieve_*": {"ttl": 60, "scope": "thread"}})
+    monkeypatch.setattr(tools_factory, "tool_result_cache", cache)
+    tools = {}
+    for name in ("retrieve_kb_aaaaa", "retrieve_kb_bbbbb", MULTI_RETRIEVER_TOOL_NAME):
+        tool, calls = counting_tool(name)
+        tools[name] = (cache.wrap(tool), calls)
+        tools[name][0].invoke({"query": "q"}, config("t1"))
+
+    # 知识库内容变化时清除该知识库和多知识库检索工具的结果，其他知识库的结果保留
+    knowledge_base.retrieval_cache.invalidate("kb_aaaaaaaa1")
+    for tool, _ in tools.values():
+        tool.invoke({"query": "q"}, config("t1"))
+
+    assert len(tools["retrieve_kb_aaaaa"][1]) == 2
+    assert len(tools[MULTI_RETRIEVER_TOOL_NAME][1]) == 2
+    assert len(tools["retrieve_kb_bbbbb"][1]) == 1
+
+
+def test_knowledge_graph_not_cached_by_default():
+    # 知识图谱更新时不会清除工具缓存，默认不缓存其结果
+    cache = ToolResultCache(policies=AppConfig.model_fields["tool_cache_policies"].default_factory())
+    tool, _ = counting_tool("QueryKnowledgeGraph")
+
+    assert not isinstance(cache.wrap(tool), CachedTool)
+    assert cache.get_policy("retrieve_kb_aaaaa")["scope"] == "thread"
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from src.agents.tool_node import ParallelToolNode
+
+
+class Tracker:
+    """记录同时执行的调用数"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    async def run(self, seconds):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.active -= 1
+
+
+def make_tools(tracker, slow_tracker=None):
+    slow_tracker = slow_tracker or Tracker()
+    cancelled = []
+
+    @tool
+    async def slow(seconds: float) -> str:
+        """等待指定的秒数"""
+        try:
+            await asyncio.gather(tracker.run(seconds), slow_tracker.run(seconds))
+        except asyncio.CancelledError:
+            cancelled.append(seconds)
+            raise
+        return f"slept {seconds}"
+
+    @tool
+    async def fast(x: int) -> str:
+        """返回输入"""
+        await tracker.run(0.01)
+        return str(x)
+
+    @tool
+    def blocking(seconds: float) -> str:
+        """同步工具，返回执行所在的线程名"""
+        time.sleep(seconds)
+        return threading.current_thread().name
+
+    @tool
+    def broken(x: int) -> str:
+        """总是出错"""
+        raise ValueError("坏输入")
+
+    return [slow, fast, blocking, broken], cancelled
+
+
+def calls(*items):
+    return [{"name": name, "args": args, "id": f"call-{i}"} for i, (name, args) in enumerate(items)]
+
+
+def run(node, tool_calls):
+    state = {"messages": [AIMessage("", tool_calls=tool_calls)]}
+    return asyncio.run(node(state, {}))["messages"]
+
+
+def test_runs_calls_concurrently_in_order():
+    tracker = Tracker()
+    tools, _ = make_tools(tracker)
+    node = ParallelToolNode(tools, max_concurrency=8, per_tool_concurrency=8, timeout=0)
+
+    start = time.monotonic()
+    messages = run(node, calls(("slow", {"seconds": 0.2}), ("slow", {"seconds": 0.1}), ("fast", {"x": 1})))
+
+    assert time.monotonic() - start < 0.3
+    assert [message.tool_call_id for message in messages] == ["call-0", "call-1", "call-2"]
+    assert [message.content for message in messages] == ["slept 0.2", "slept 0.1", "1"]
+    assert all(message.id for message in messages)
+
+
+def test_global_and_per_tool_limits():
+    tracker, slow_tracker = Tracker(), Tracker()
+    tools, _ = make_tools(tracker, slow_tracker)
+    node = ParallelToolNode(tools, max_concurrency=2, per_tool_concurrency={"slow": 1}, timeout=0)
+
+    run(node, calls(*[("slow", {"seconds": 0.03})] * 3, *[("fast", {"x": i}) for i in range(4)]))
+
+    assert slow_tracker.max_active == 1
+    assert tracker.max_active == 2
+
+
+def test_timeout_cancels_async_tool():
+    tools, cancelled = make_tools(Tracker())
+    node = ParallelToolNode(tools, timeout=0.05)
+
+    timed_out, done = run(node, calls(("slow", {"seconds": 5}), ("fast", {"x": 1})))
+
+    assert timed_out.status == "error" and "超时" in timed_out.content
+    assert cancelled == [5]
+    assert done.status == "success" and done.content == "1"
+
+
+def test_sync_tools_and_errors():
+    tools, _ = make_tools(Tracker())
+    node = ParallelToolNode(tools, timeout=0.5)
+
+    blocking, broken, missing, timed_out = run(
+        node,
+        calls(("blocking", {"seconds": 0}), ("broken", {"x": 1}), ("missing", {}), ("blocking", {"seconds": 1})),
+    )
+
+    # 同步工具在独立线程池中执行，出错和超时都作为错误消息返回给模型
+    assert blocking.content.startswith("sync-tool")
+    assert broken.status == "error" and "坏输入" in broken.content
+    assert missing.status == "error" and "missing" in missing.content
+    assert timed_out.status == "error" and "超时" in timed_out.content
+
+
+def test_separate_event_loops():
+    tools, _ = make_tools(Tracker())
+    node = ParallelToolNode(tools, per_tool_concurrency={"slow": 1}, timeout=0)
+    tool_calls = calls(("slow", {"seconds": 0.01}), ("slow", {"seconds": 0.01}))
+
+    # 等待过的信号量绑定所在的事件循环，每个循环使用各自的信号量
+    for _ in range(3):
+        assert [message.status for message in run(node, tool_calls)] == ["success", "success"]
+    assert len(node._semaphores) <= 1
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from langchain_core.tools import tool
+
+from src.agents import tools_factory
+from src.agents.tools_factory import MULTI_RETRIEVER_TOOL_NAME, ToolRegistry
+
+
+class FakeKB:
+    """只提供工具注册表用到的知识库接口"""
+
+    def __init__(self):
+        self.databases_meta = {
+            "kb_aaaaaaaa1": {"name": "A", "description": "知识库 A"},
+            "kb_bbbbbbbb2": {"name": "B", "description": "知识库 B"},
+        }
+        self.retriever_builds = 0
+
+    def get_retrievers(self):
+        self.retriever_builds += 1
+
+        def make(db_id):
+            async def retriever(query_text):
+                return f"{db_id}:{query_text}"
+
+            return retriever
+
+        return {db_id: meta | {"retriever": make(db_id)} for db_id, meta in self.databases_meta.items()}
+
+    async def aquery_multi(self, query_text, db_ids):
+        return f"{sorted(db_ids)}:{query_text}"
+
+
+@tool
+def calc(expression: str) -> str:
+    """计算表达式"""
+    return expression
+
+
+@tool
+def search(query: str) -> str:
+    """网页搜索"""
+    return query
+
+
+@pytest.fixture
+def kb(monkeypatch):
+    kb = FakeKB()
+    monkeypatch.setattr(tools_factory, "knowledge_base", kb)
+    monkeypatch.setattr(tools_factory, "_TOOLS_REGISTRY", {"calc": calc})
+    return kb
+
+
+def test_unchanged_metadata_reuses_tools(kb):
+    registry = ToolRegistry()
+    tools = registry.refresh()
+
+    assert registry.refresh() is tools
+    assert registry.version == 1 and kb.retriever_builds == 1
+    assert set(tools) == {"calc", "retrieve_kb_aaaaa", "retrieve_kb_bbbbb", MULTI_RETRIEVER_TOOL_NAME}
+    with pytest.raises(TypeError):
+        tools["other"] = None
+
+
+def test_each_tool_queries_its_own_kb(kb):
+    tools = ToolRegistry().refresh()
+
+    assert asyncio.run(tools["retrieve_kb_aaaaa"].ainvoke({"query_text": "q"})) == "kb_aaaaaaaa1:q"
+    assert asyncio.run(tools["retrieve_kb_bbbbb"].ainvoke({"query_text": "q"})) == "kb_bbbbbbbb2:q"
+
+
+def test_only_changed_kb_tools_are_rebuilt(kb):
+    registry = ToolRegistry()
+    tools = registry.refresh()
+
+    kb.databases_meta["kb_bbbbbbbb2"]["description"] = "新的描述"
+    updated = registry.refresh()
+
+    assert registry.version == 2
+    assert updated["retrieve_kb_aaaaa"] is tools["retrieve_kb_aaaaa"]
+    assert updated["retrieve_kb_bbbbb"] is not tools["retrieve_kb_bbbbb"]
+    assert "新的描述" in updated["retrieve_kb_bbbbb"].description
+    # 知识库变化后多知识库检索工具的描述也随之更新
+    assert updated[MULTI_RETRIEVER_TOOL_NAME] is not tools[MULTI_RETRIEVER_TOOL_NAME]
+
+
+def test_removed_kb(kb):
+    registry = ToolRegistry()
+    registry.refresh()
+
+    del kb.databases_meta["kb_bbbbbbbb2"]
+    tools = registry.refresh()
+
+    assert set(tools) == {"calc", "retrieve_kb_aaaaa"}
+    assert registry.version == 2
+
+
+def test_builtin_tool_change_bumps_version(kb, monkeypatch):
+    registry = ToolRegistry()
+    registry.refresh()
+
+    monkeypatch.setitem(tools_factory._TOOLS_REGISTRY, "search", search)
+
+    assert "search" in registry.refresh() and registry.version == 2
+
+
+def test_multi_tool_is_shared_per_scope(kb):
+    registry = ToolRegistry()
+
+    tool = registry.get_multi_tool(["kb_aaaaaaaa1", "missing"])
+
+    assert registry.get_multi_tool(["kb_aaaaaaaa1"]) is tool
+    assert registry.get_multi_tool() is not tool
+    # 超出工具范围的知识库会被忽略
+    result = asyncio.run(tool.ainvoke({"query_text": "q", "db_ids": ["kb_bbbbbbbb2"]}))
+    assert result == "['kb_aaaaaaaa1']:q"
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+
+import httpx
+import pytest
+
+from src.utils import url_fetcher
+from src.utils.url_fetcher import AsyncURLFetcher
+
+
+PAGE = b"<html><body><h1>Title</h1><p>First</p><script>var x;</script><p>Second</p></body></html>"
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """用 MockTransport 代替网络请求，记录每次请求的头"""
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=PAGE, headers={"Content-Type": "text/html; charset=utf-8", "ETag": '"v1"'})
+
+    monkeypatch.setattr(
+        url_fetcher.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(handler))
+    )
+    return seen
+
+
+def test_fetch_from_separate_event_loops(requests):
+    fetcher = AsyncURLFetcher()
+
+    async def run():
+        result = await fetcher.fetch("https://example.com/page")
+        assert result.content == PAGE and result.encoding == "utf-8"
+        return fetcher.client, fetcher._host_semaphore("https://example.com/other")
+
+    # 每次 asyncio.run 都是新的事件循环，不能复用上一个循环中创建的连接池和信号量
+    (client1, semaphore1), (client2, semaphore2) = asyncio.run(run()), asyncio.run(run())
+
+    assert client1 is not client2 and semaphore1 is not semaphore2
+    assert len(requests) == 2
+
+
+def test_conditional_request_uses_cache(requests, tmp_path):
+    fetcher = AsyncURLFetcher(cache_dir=str(tmp_path))
+
+    async def run():
+        try:
+            return await fetcher.fetch("https://example.com/page"), await fetcher.fetch("https://example.com/page")
+        finally:
+            await fetcher.aclose()
+
+    first, second = asyncio.run(run())
+
+    assert not first.from_cache and second.from_cache
+    assert second.content == first.content == PAGE
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert not fetcher._clients
+
+
+def test_max_bytes(requests):
+    fetcher = AsyncURLFetcher(max_bytes=10)
+
+    with pytest.raises(ValueError):
+        asyncio.run(fetcher.fetch("https://example.com/page"))
+
+
+def test_html_to_text():
+    pytest.importorskip("lxml")
+    assert url_fetcher.html_to_text(PAGE, "utf-8").split() == ["Title", "First", "Second"]
+    assert url_fetcher.html_to_text(b"   ") == ""
@@ -0,0 +1,5 @@
+"""子进程入口
+
+进程池和解析进程中执行的函数放在这里，不依赖 src 包：
+导入 src 会执行 src/__init__.py，创建知识库和各个插件单例，子进程不需要这些对象。
+"""
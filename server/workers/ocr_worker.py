@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+
+# 该模块由 OCR 进程池的 spawn 子进程导入，不能依赖 src 包；fitz、numpy 与 OCR 模型在使用时才导入
+
+
+def _load_rapid_ocr(det_box_thresh=0.3, intra_op_num_threads=-1, inter_op_num_threads=-1):
+    """创建 RapidOCR 实例，intra/inter op 线程数为 -1 时由 onnxruntime 自行决定"""
+    from rapidocr_onnxruntime import RapidOCR
+
+    model_dir = os.path.join(os.getenv("MODEL_DIR", ""), "SWHL/RapidOCR")
+    det_model_dir = os.path.join(model_dir, "PP-OCRv4/ch_PP-OCRv4_det_infer.onnx")
+    rec_model_dir = os.path.join(model_dir, "PP-OCRv4/ch_PP-OCRv4_rec_infer.onnx")
+    assert os.path.exists(model_dir), (
+        f"模型文件不存在，请下载 SWHL/RapidOCR 到 {model_dir}，"
+        "并确认是否在 docker-compose.dev.yml 中添加 MODEL_DIR 环境变量"
+    )
+    return RapidOCR(
+        det_box_thresh=det_box_thresh,
+        det_model_path=det_model_dir,
+        rec_model_path=rec_model_dir,
+        intra_op_num_threads=intra_op_num_threads,
+        inter_op_num_threads=inter_op_num_threads,
+    )
+
+
+# 进程池 worker 中使用的 OCR 模型，由 _init_ocr_worker 在每个 worker 进程中加载一次
+_worker_ocr = None
+
+
+def _init_ocr_worker(det_box_thresh, intra_op_num_threads, inter_op_num_threads):
+    """进程池 worker 初始化：每个进程只加载一次 ONNX 模型"""
+    global _worker_ocr
+    _worker_ocr = _load_rapid_ocr(
+        det_box_thresh=det_box_thresh,
+        intra_op_num_threads=intra_op_num_threads,
+        inter_op_num_threads=inter_op_num_threads,
+    )
+
+
+def _ocr_result_to_text(result):
+    return "\n".join([line[1] for line in result]) if result else ""
+
+
+def render_page_array(page, dpi=144):
+    """将 PDF 页面渲染为 BGR 彩色图，返回 (pixmap, ndarray)
+
+    与原先保存为图片再由 OCR 读取得到的输入一致，但不经过图片编码和临时文件。
+    """
+    import fitz
+    import numpy as np
+
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    rgb = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, : pix.width * 3]
+    # RapidOCR 按 OpenCV 的 BGR 通道顺序处理图片
+    array = np.ascontiguousarray(rgb.reshape(pix.height, pix.width, 3)[:, :, ::-1])
+    return pix, array
+
+
+def _prefetch(iterable, depth=2):
+    """在后台线程中提前消费迭代器，使页面渲染与 OCR 推理重叠进行"""
+    buffer = queue.Queue(maxsize=depth)
+    sentinel = object()
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                buffer.put(item)
+        except BaseException as e:  # 将异常传递给消费者
+            buffer.put(e)
+        finally:
+            buffer.put(sentinel)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while (item := buffer.get()) is not sentinel:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # 释放可能阻塞在 put 上的生产者
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+def _iter_rendered_pages(pdf_path, pages, dpi):
+    import fitz
+
+    with fitz.open(pdf_path) as pdf_doc:
+        for pg in pages:
+            pix, array = render_page_array(pdf_doc[pg], dpi=dpi)
+            yield pg, pix, array
+
+
+def _ocr_page_range(pdf_path, pages, dpi=144, ocr_engine=None):
+    """渲染并识别指定页面，默认使用 worker 进程中加载的模型
+
+    页面 N+1 的渲染在后台线程中进行，与页面 N 的 OCR 推理重叠。
+    """
+    ocr_engine = ocr_engine or _worker_ocr
+    if ocr_engine is None:
+        raise RuntimeError("OCR model is not loaded, the worker must be initialized with _init_ocr_worker")
+    results = []
+    for pg, _pix, array in _prefetch(_iter_rendered_pages(pdf_path, pages, dpi)):
+        result, _ = ocr_engine(array)
+        results.append((pg, _ocr_result_to_text(result)))
+    return results
@@ -0,0 +1,66 @@
+import sys
+import traceback
+from pathlib import Path
+
+# 该模块由 forkserver 预加载，并作为解析子进程的入口，不能依赖 src 包；各格式的解析库在使用时才导入
+
+
+def parse_file_to_text(file_path: str, params: dict | None = None) -> str:
+    """使用 CPU 密集的本地解析器提取文件文本，在解析进程中执行"""
+    file_ext = Path(file_path).suffix.lower()
+
+    if file_ext == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+
+        docs = PyPDFLoader(file_path).load()
+        return "\n\n".join([d.page_content for d in docs])
+
+    elif file_ext in [".doc", ".docx"]:
+        from docx import Document  # type: ignore
+
+        doc = Document(file_path)
+        return "\n".join([para.text for para in doc.paragraphs])
+
+    else:
+        import textract  # type: ignore
+
+        text = textract.process(file_path)
+        return text.decode("utf-8", errors="replace") if isinstance(text, bytes) else text
+
+
+def virtual_memory_mb() -> float | None:
+    """当前进程的虚拟内存大小（MB），RLIMIT_AS 限制的就是这个值；无法读取时返回 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _limit_memory(memory_limit_mb: int) -> None:
+    """限制当前进程的虚拟内存，超过时解析器会抛出 MemoryError"""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Failed to set memory limit: {e}", file=sys.stderr)
+
+
+def _parse_worker(file_path: str, params: dict | None, output_path: str, memory_limit_mb: int) -> None:
+    """解析进程入口：结果写入临时文件，失败时写入 .err 文件并以非零状态退出"""
+    _limit_memory(memory_limit_mb)
+    try:
+        text = parse_file_to_text(file_path, params)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    except BaseException as e:
+        with open(f"{output_path}.err", "w", encoding="utf-8") as f:
+            f.write(f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+        sys.exit(1)